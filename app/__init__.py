@@ -8,6 +8,13 @@ from flask import Flask, render_template, session, redirect, url_for
 from config import config
 from app.extensions import db
 from app.api import register_blueprints
+from app.services.leaderboard import Leaderboard
+from app.services.lobby_events import EventHub
+from app.services.lobby_store import create_lobby_store
+from app.services.match_writer import MatchWriter
+from app.services.scheduler import Scheduler
+from app.services.settlement import SettlementCache
+from app.utils.room_codes import RoomCodeAllocator
 
 
 def create_app(config_name=None):
@@ -33,6 +40,30 @@ def create_app(config_name=None):
     # Initialize extensions
     db.init_app(app)
 
+    # Shared lobby state (presence, invites, rooms)
+    app.extensions['lobby_store'] = create_lobby_store(app)
+    # Fan-out of lobby events to this process's /events streams
+    app.extensions['lobby_events'] = EventHub(app.extensions['lobby_store'],
+                                              app.config['LOBBY_EVENTS_MAX_STREAMS'])
+
+    # Background persistence of finished lobby matches
+    app.extensions['match_writer'] = MatchWriter(app)
+
+    # In-memory player ranking, loaded once the tables exist (below)
+    app.extensions['leaderboard'] = Leaderboard(app.config['LEADERBOARD_RESYNC'])
+
+    # Latest settlement plan, recomputed when the expenses change
+    app.extensions['settlement_cache'] = SettlementCache()
+
+    # Room code allocators: a keyed permutation of a counter, no lookups.
+    # Game rooms count in the database, lobby rooms in the lobby store
+    from app.models import Counter
+    code_key = app.config.get('ROOM_CODE_KEY') or app.config['SECRET_KEY']
+    app.extensions['room_codes'] = RoomCodeAllocator(
+        code_key + ':game_room', lambda count: Counter.reserve('game_room_code', count))
+    app.extensions['lobby_room_codes'] = RoomCodeAllocator(
+        code_key + ':lobby', lambda count: app.extensions['lobby_store'].reserve_ids(count))
+
     # Register blueprints
     register_blueprints(app)
 
@@ -49,10 +80,47 @@ def create_app(config_name=None):
             db.session.commit()
         except Exception:
             db.session.rollback()
+        # create_all only indexes new tables; migrate.py (the release step)
+        # adds indexes introduced later without locking out writes
+        # Move participant lists of existing expenses into expense_participant once
+        from app.models import ExpenseParticipant
+        from app.services import BalanceService, ExpenseService
+        try:
+            if db.session.query(ExpenseParticipant.expense_id).first() is None:
+                ExpenseService.backfill_participants()
+        except Exception:
+            db.session.rollback()  # Another worker is filling it
+        # Materialize the per-person balances of existing expenses once
+        try:
+            BalanceService.ensure_built()
+        except Exception:
+            db.session.rollback()  # Another worker is building them
+
+        try:
+            app.extensions['leaderboard'].load()
+        except Exception:
+            db.session.rollback()  # game_user.rating not migrated yet (migrate.py)
+
+    # Periodic maintenance jobs
+    app.extensions['scheduler'] = create_scheduler(app)
 
     return app
 
 
+def create_scheduler(app):
+    """Register the maintenance jobs and start the scheduler thread (SCHEDULER_ENABLED)."""
+    from app.services import GameRoomService
+
+    scheduler = Scheduler(app)
+    scheduler.add_job('reap_game_rooms', app.config['ROOM_REAP_INTERVAL'], lambda: GameRoomService.reap_stale_rooms(
+        app.config['ROOM_REAP_AGE'], app.config['ROOM_REAP_BATCH'], app.config['ROOM_REAP_MAX_BATCHES']))
+    leaderboard = app.extensions['leaderboard']
+    scheduler.add_job('resync_leaderboard', leaderboard.resync_interval, leaderboard.resync, per_worker=True)
+    if app.config['SCHEDULER_ENABLED']:
+        scheduler.start()
+    return scheduler
+
+
 def register_views(app):
     """Register view routes (HTML pages)."""
 
@@ -77,9 +145,9 @@ def register_views(app):
 
         room_code = room_code.upper()
 
-        # Check in lobby API's in-memory storage
-        from app.api.lobby import game_rooms
-        if room_code in game_rooms:
+        # Check in the lobby store
+        from app.api.lobby import get_store
+        if get_store().has_room(room_code):
             return render_template('game_room.html', room={'room_code': room_code})
 
         # Fallback: room not found
@@ -2,8 +2,9 @@
 Admin API routes.
 """
 
-from flask import Blueprint
-from app.utils import success_response, password_required
+from flask import Blueprint, current_app, request
+from app.services import UserService
+from app.utils import success_response, data_response, password_required, admin_required
 
 bp = Blueprint('admin', __name__)
 
@@ -13,3 +14,49 @@ bp = Blueprint('admin', __name__)
 def toggle_lock():
     """Toggle lock state (client-side feature)."""
     return success_response(message='Lock state toggled')
+
+
+@bp.route('/admin/cache', methods=['GET'])
+@admin_required
+def get_cache_stats():
+    """Hit/miss counters of in-process caches (for the worker serving this request)."""
+    return data_response({
+        'user_profiles': UserService.profile_cache_stats()
+    })
+
+
+@bp.route('/admin/match-writer', methods=['GET'])
+@admin_required
+def get_match_writer_metrics():
+    """Queue depth and flush latency of the background match writer (this worker)."""
+    return data_response(current_app.extensions['match_writer'].metrics())
+
+
+@bp.route('/admin/leaderboard', methods=['GET'])
+@admin_required
+def get_leaderboard_stats():
+    """Size, reload time and update count of the in-memory leaderboard (this worker)."""
+    return data_response(current_app.extensions['leaderboard'].stats())
+
+
+@bp.route('/admin/jobs', methods=['GET'])
+@admin_required
+def get_job_stats():
+    """Schedule and latest run (duration, rows affected, error) of each maintenance job."""
+    return data_response(current_app.extensions['scheduler'].stats())
+
+
+@bp.route('/admin/lobby/memory', methods=['GET'])
+@admin_required
+def get_lobby_memory():
+    """
+    Lobby store usage plus approximate bytes per room, online user and
+    invite (sys.getsizeof of ?samples=N live entries, default 20, max 100).
+    benchmarks/lobby_memory.py measures them with tracemalloc.
+    """
+    samples = min(max(request.args.get('samples', 20, type=int), 1), 100)
+    store = current_app.extensions['lobby_store']
+    return data_response({
+        'store': store.stats(),
+        'per_entry': store.entry_sizes(samples)
+    })
@@ -65,6 +65,7 @@ def get_current_user():
     if not user_id:
         return error_response('Chưa đăng nhập', 401)
 
+    # Read live: stats and rating are not part of the cached profile
     user = UserService.get_by_id(user_id)
     if not user:
         session.clear()
@@ -2,36 +2,101 @@
 Game statistics API routes.
 """
 
-from flask import Blueprint, session
-from app.services import UserService, GameRoomService
+from datetime import datetime
+from flask import Blueprint, request, session
+from app.services import UserService, GameRoomService, GameStatsService
+from app.services.leaderboard import DEFAULT_ORDER, ORDERS
 from app.utils import data_response, error_response
 
 bp = Blueprint('game_stats', __name__)
 
+HISTORY_PAGE_SIZE = 20
+HISTORY_PAGE_MAX = 100
+LEADERBOARD_PAGE_SIZE = 20
+LEADERBOARD_PAGE_MAX = 100
+
 
 @bp.route('/leaderboard', methods=['GET'])
 def get_leaderboard():
-    """Get the game leaderboard."""
-    users = UserService.get_leaderboard(20)
-    return data_response([u.to_public_dict() for u in users])
+    """
+    Get the game leaderboard, each entry with its rank.
+
+    Query params:
+        limit: Page size (default 20, max 100)
+        offset: Number of players ranked above the page (default 0)
+        around: User id (or "me") to center the page on instead of offset
+        sort: "wins" (default) or "rating"
+    """
+    order = request.args.get('sort', DEFAULT_ORDER)
+    if order not in ORDERS:
+        return error_response('Tham số sort không hợp lệ', 400)
+    limit = min(max(request.args.get('limit', LEADERBOARD_PAGE_SIZE, type=int), 1), LEADERBOARD_PAGE_MAX)
+    around = request.args.get('around')
+    if around:
+        user_id = session.get('user_id') if around == 'me' else request.args.get('around', type=int)
+        if not user_id:
+            return error_response('Không tìm thấy người dùng', 404)
+        ranked = UserService.get_leaderboard_around(user_id, limit, order)
+    else:
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        ranked = UserService.get_leaderboard(limit, offset, order)
+
+    return data_response([dict(u.to_public_dict(), rank=rank) for rank, u in ranked])
 
 
 @bp.route('/history', methods=['GET'])
 def get_match_history():
-    """Get match history for current user."""
+    """
+    Get match history for current user, newest first.
+
+    Query params:
+        limit: Page size (default 20, max 100)
+        before: next_before of the previous page ("<ended_at>,<id>")
+        include: "rounds" to add each match's round details
+    """
     user_id = session.get('user_id')
     if not user_id:
         return error_response('Chưa đăng nhập', 401)
 
-    matches = GameRoomService.get_user_match_history(user_id, 20)
-    return data_response([m.to_dict() for m in matches])
+    limit = min(max(request.args.get('limit', HISTORY_PAGE_SIZE, type=int), 1), HISTORY_PAGE_MAX)
+    before = None
+    if request.args.get('before'):
+        try:
+            ended_at, match_id = request.args['before'].rsplit(',', 1)
+            before = (datetime.fromisoformat(ended_at), int(match_id))
+        except ValueError:
+            return error_response('Tham số before không hợp lệ', 400)
+    include_rounds = 'rounds' in request.args.get('include', '').split(',')
+
+    matches = GameRoomService.get_user_match_history(user_id, limit, before)
+    next_before = None
+    if len(matches) == limit:
+        last = matches[-1]
+        next_before = f'{last.ended_at.isoformat()},{last.id}'
+
+    return data_response({
+        'matches': [m.to_dict(include_rounds=include_rounds) for m in matches],
+        'next_before': next_before
+    })
 
 
 @bp.route('/user/<int:user_id>', methods=['GET'])
 def get_user_stats(user_id):
-    """Get stats for a specific user."""
+    """
+    Get stats for a specific user: totals, ranks, streaks, choice counts
+    and most frequent opponents.
+
+    Query params:
+        opponent: User id to add the head-to-head record against ('versus')
+    """
     user = UserService.get_by_id(user_id)
     if not user:
         return error_response('Không tìm thấy người dùng', 404)
 
-    return data_response(user.to_public_dict())
+    return data_response(dict(
+        user.to_public_dict(),
+        rank=UserService.get_rank(user_id),
+        rating_rank=UserService.get_rank(user_id, 'rating'),
+        ranked_players=UserService.count_ranked(),
+        **GameStatsService.get_user_stats(user_id, request.args.get('opponent', type=int))
+    ))
@@ -1,65 +1,158 @@
 """
 Lobby API - Polling-based multiplayer lobby (no WebSocket needed).
 Lightweight solution for low-RAM environments like Koyeb.
+
+Lobby state lives in a LobbyStore (see app.services.lobby_store) so that all
+gunicorn workers see the same presence, invites and rooms. Expired entries
+are swept by the store's background thread, not on the request path.
 """
 
+import json
 import time
 import random
 import string
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, Response, jsonify, request, session, current_app
 from app.services import UserService
+from app.services.lobby_store import (
+    LONGPOLL_MAX_WAIT, MAX_INVITES_PER_SENDER, LobbyFull, TooManyInvites
+)
 
 bp = Blueprint('lobby', __name__)
 
-# ============ IN-MEMORY STORAGE ============
-# Online users: {user_id: {username, avatar_url, last_seen}}
-online_users = {}
+VALID_CHOICES = {'rock', 'paper', 'scissors'}
+CHOICE_BEATS = {'rock': 'scissors', 'paper': 'rock', 'scissors': 'paper'}
 
-# Game rooms: {room_code: {host_id, guest_id, host_username, guest_username,
-#              best_of, host_score, guest_score, current_round, status, ...}}
-game_rooms = {}
+EVENTS_KEEPALIVE = 15  # seconds between keep-alive comments on /events
+EVENTS_MAX_AGE = 300  # seconds before a stream closes; EventSource reconnects
+ROOM_CHANGE_HISTORY = 32  # room changes kept for ?after_seq= deltas
+ONLINE_PAGE_MAX = 200  # largest ?limit= accepted by /online
 
-# Pending invites: {invite_id: {from_user_id, to_user_id, best_of, timestamp}}
-pending_invites = {}
 
-# Pending redirects for invite senders: {user_id: {room_code, timestamp}}
-pending_redirects = {}
+class LobbyError(Exception):
+    """Raised inside a room update to abort it with an API error."""
 
-# Constants
-ONLINE_TIMEOUT = 30  # seconds - user considered offline after this
-INVITE_TIMEOUT = 60  # seconds
-ROOM_TIMEOUT = 3600  # 1 hour
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
 
-VALID_CHOICES = {'rock', 'paper', 'scissors'}
-CHOICE_BEATS = {'rock': 'scissors', 'paper': 'rock', 'scissors': 'paper'}
 
+def get_store():
+    """Get the lobby store of the current app."""
+    return current_app.extensions['lobby_store']
 
-def cleanup():
-    """Remove stale data."""
-    now = time.time()
 
-    # Remove offline users
-    offline = [uid for uid, data in online_users.items()
-               if now - data.get('last_seen', 0) > ONLINE_TIMEOUT]
-    for uid in offline:
-        del online_users[uid]
+def generate_code(length=8):
+    """Generate random invite id (room codes come from the app's allocator)."""
+    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
 
-    # Remove expired invites
-    expired_invites = [iid for iid, data in pending_invites.items()
-                       if now - data.get('timestamp', 0) > INVITE_TIMEOUT]
-    for iid in expired_invites:
-        del pending_invites[iid]
 
-    # Remove old rooms
-    expired_rooms = [code for code, data in game_rooms.items()
-                     if now - data.get('created_at', 0) > ROOM_TIMEOUT]
-    for code in expired_rooms:
-        del game_rooms[code]
+def invite_to_dict(invite_id, data):
+    """Invite as sent to its recipient."""
+    return {
+        'invite_id': invite_id,
+        'from_user': {
+            'id': data['from_user_id'],
+            'username': data['from_username'],
+            'avatar_url': data.get('from_avatar')
+        },
+        'best_of': data['best_of']
+    }
 
 
-def generate_code(length=6):
-    """Generate random room/invite code."""
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
+def room_view(room):
+    """Public fields of a room, as sent by /state (rounds excluded)."""
+    return {
+        'status': room['status'],
+        'best_of': room['best_of'],
+        'current_round': room['current_round'],
+        # Don't reveal choices until both have chosen
+        'host': {
+            'id': room['host_id'],
+            'username': room['host_username'],
+            'score': room['host_score'],
+            'ready': room['host_choice'] is not None
+        },
+        'guest': {
+            'id': room['guest_id'],
+            'username': room['guest_username'],
+            'score': room['guest_score'],
+            'ready': room['guest_choice'] is not None
+        } if room['guest_id'] else None,
+        'last_update': room['last_update']
+    }
+
+
+def update_room(room_code, mutate):
+    """
+    Update a room through the store and publish a 'room' event to its players.
+
+    Every visible change bumps the room's seq and is recorded in
+    room['changes'] (names of the changed fields plus where the new rounds
+    start), so /state?after_seq=N can answer with a delta.
+    """
+    changed = {}
+
+    def apply(room):
+        before = room_view(room)
+        rounds_from = len(room['rounds'])
+        result = mutate(room)
+
+        fields = [k for k, v in room_view(room).items() if before[k] != v]
+        if fields or len(room['rounds']) != rounds_from:
+            room['seq'] += 1
+            room['changes'].append({'seq': room['seq'], 'fields': fields, 'rounds_from': rounds_from})
+            del room['changes'][:-ROOM_CHANGE_HISTORY]
+
+        changed.update(room)
+        return result
+
+    result = get_store().update_room(room_code, apply)
+
+    players = [uid for uid in (changed['host_id'], changed['guest_id']) if uid]
+    get_store().publish('room', {
+        'room_code': room_code,
+        'status': changed['status'],
+        'seq': changed['seq'],
+        'last_update': changed['last_update']
+    }, players)
+
+    return result
+
+
+def room_delta(room, after_seq):
+    """
+    Changes of a room since after_seq, or None if the client is too far
+    behind (or ahead) of the kept history and needs a full snapshot.
+    """
+    changes = [c for c in room['changes'] if c['seq'] > after_seq]
+    if after_seq > room['seq'] or not changes or changes[0]['seq'] != after_seq + 1:
+        return None
+
+    # Changed fields are sent with their current values
+    view = room_view(room)
+    fields = {name for change in changes for name in change['fields']}
+
+    return {
+        'room_code': room['room_code'],
+        'seq': room['seq'],
+        'delta': True,
+        'changes': {name: view[name] for name in fields},
+        'rounds': room['rounds'][changes[0]['rounds_from']:]
+    }
+
+
+def add_room(room):
+    """Store a new room under a fresh code and return the code."""
+    store = get_store()
+    codes = current_app.extensions['lobby_room_codes']
+    room['seq'] = 0
+    room['changes'] = []
+    room['room_code'] = codes.next_code()
+    # Codes don't repeat; the retry only covers a wrapped counter or new key
+    while not store.add_room(room['room_code'], room):
+        room['room_code'] = codes.next_code()
+    return room['room_code']
 
 
 # ============ HEARTBEAT & ONLINE STATUS ============
@@ -71,19 +164,16 @@ def heartbeat():
     if not user_id:
         return jsonify({'error': 'Not logged in'}), 401
 
-    user = UserService.get_by_id(user_id)
+    user = UserService.get_profile(user_id)
     if not user:
         return jsonify({'error': 'User not found'}), 404
 
-    online_users[user_id] = {
-        'username': user.username,
-        'avatar_url': user.avatar_url,
-        'last_seen': time.time()
-    }
+    store = get_store()
+    store.touch_user(user_id, user['username'], user['avatar_url'])
 
     # Check if there's a pending redirect (invite was accepted)
-    if user_id in pending_redirects:
-        redirect_data = pending_redirects.pop(user_id)
+    redirect_data = store.pop_redirect(user_id)
+    if redirect_data:
         return jsonify({
             'ok': True,
             'redirect': f"/game/room/{redirect_data['room_code']}",
@@ -91,19 +181,7 @@ def heartbeat():
         })
 
     # Check for pending invites for this user
-    my_invites = [
-        {
-            'invite_id': iid,
-            'from_user': {
-                'id': data['from_user_id'],
-                'username': data['from_username'],
-                'avatar_url': data.get('from_avatar')
-            },
-            'best_of': data['best_of']
-        }
-        for iid, data in pending_invites.items()
-        if data['to_user_id'] == user_id
-    ]
+    my_invites = [invite_to_dict(iid, data) for iid, data in store.get_invites_for(user_id)]
 
     return jsonify({
         'ok': True,
@@ -115,22 +193,116 @@ def heartbeat():
 def leave():
     """User leaves lobby."""
     user_id = session.get('user_id')
-    if user_id and user_id in online_users:
-        del online_users[user_id]
+    if user_id:
+        get_store().remove_user(user_id)
     return jsonify({'ok': True})
 
 
 @bp.route('/online', methods=['GET'])
 def get_online_users():
-    """Get list of online users."""
-    cleanup()
+    """
+    Get list of online users.
+
+    With ?since_version=<version> only the users added and removed since
+    that presence version are sent (304 if nothing changed); clients whose
+    version is older than the change log get the full list (delta=false).
+    ?limit=<n>&cursor=<id> pages the full list by user id; next_cursor is
+    set while there are more users.
+    """
+    store = get_store()
+
+    since_version = request.args.get('since_version', type=int)
+    if since_version is not None:
+        version, changes = store.get_presence_changes(since_version)
+        if changes is not None:
+            if not changes:
+                return '', 304
+
+            # Only the last change of each user counts
+            latest = dict(changes)
+            return jsonify({
+                'version': version,
+                'delta': True,
+                'added': [user for user in latest.values() if user],
+                'removed': [uid for uid, user in latest.items() if user is None],
+                'count': store.count_online()
+            })
+
+    # Read the version first: a change racing with the listing is then
+    # re-sent in the next diff instead of being lost
+    version = store.presence_version()
+
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor', type=int)
+    if limit is not None:
+        limit = min(max(limit, 1), ONLINE_PAGE_MAX)
+        users = store.get_online_users(cursor, limit + 1)
+        next_cursor = users[limit - 1]['id'] if len(users) > limit else None
+        users = users[:limit]
+        count = store.count_online()
+    else:
+        users = store.get_online_users(cursor)
+        next_cursor = None
+        count = len(users) if cursor is None else store.count_online()
 
-    users = [
-        {'id': uid, 'username': data['username'], 'avatar_url': data.get('avatar_url')}
-        for uid, data in online_users.items()
-    ]
+    return jsonify({
+        'users': users,
+        'count': count,
+        'version': version,
+        'delta': False,
+        'next_cursor': next_cursor
+    })
+
+
+@bp.route('/events', methods=['GET'])
+def events():
+    """
+    Server-Sent Events stream of lobby changes for the current user.
+
+    Events: online, offline, invite, redirect, room. Clients still send
+    heartbeats to stay online; /heartbeat and /online remain as a polling
+    fallback (also used when the process has no free stream slot, 503).
+    Events reach the stream through the app's EventHub, so an idle stream
+    only waits on its own queue.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'Not logged in'}), 401
 
-    return jsonify({'users': users, 'count': len(users)})
+    store = get_store()
+    after_seq = request.headers.get('Last-Event-ID', type=int)
+    if after_seq is None:
+        after_seq = store.last_event_seq()
+
+    hub = current_app.extensions['lobby_events']
+    events_stream = hub.subscribe(user_id, after_seq)
+    if events_stream is None:
+        return jsonify({'error': 'Too many open streams'}), 503
+
+    def stream():
+        yield 'retry: 3000\n\n'
+        deadline = time.monotonic() + EVENTS_MAX_AGE
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            pending = events_stream.wait(min(EVENTS_KEEPALIVE, remaining))
+            if not pending:
+                yield ': keep-alive\n\n'
+                continue
+            for seq, event_type, data in pending:
+                if event_type == 'redirect':
+                    # Delivered here, so the next heartbeat must not repeat it
+                    store.pop_redirect(user_id)
+                yield f'id: {seq}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n'
+
+    response = Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Runs on disconnect too, and even if the body was never iterated
+    response.call_on_close(lambda: hub.unsubscribe(events_stream))
+    return response
 
 
 # ============ INVITES ============
@@ -152,22 +324,32 @@ def send_invite():
     if to_user_id == user_id:
         return jsonify({'error': 'Cannot invite yourself'}), 400
 
-    if to_user_id not in online_users:
+    store = get_store()
+    if not store.is_online(to_user_id):
         return jsonify({'error': 'User is offline'}), 400
 
-    user = UserService.get_by_id(user_id)
+    user = UserService.get_profile(user_id)
     if not user:
         return jsonify({'error': 'User not found'}), 404
 
-    invite_id = generate_code(8)
-    pending_invites[invite_id] = {
+    invite = {
         'from_user_id': user_id,
-        'from_username': user.username,
-        'from_avatar': user.avatar_url,
+        'from_username': user['username'],
+        'from_avatar': user['avatar_url'],
         'to_user_id': to_user_id,
         'best_of': best_of,
         'timestamp': time.time()
     }
+    invite_id = generate_code()
+    try:
+        while not store.add_invite(invite_id, invite, MAX_INVITES_PER_SENDER):
+            invite_id = generate_code()
+    except TooManyInvites as e:
+        return jsonify({'error': str(e)}), 429
+    except LobbyFull as e:
+        return jsonify({'error': str(e)}), 503
+
+    store.publish('invite', invite_to_dict(invite_id, invite), [to_user_id])
 
     return jsonify({'ok': True, 'invite_id': invite_id})
 
@@ -179,51 +361,51 @@ def accept_invite(invite_id):
     if not user_id:
         return jsonify({'error': 'Not logged in'}), 401
 
-    if invite_id not in pending_invites:
+    store = get_store()
+    invite = store.get_invite(invite_id)
+    if not invite:
         return jsonify({'error': 'Invite not found or expired'}), 404
 
-    invite = pending_invites[invite_id]
-
     if invite['to_user_id'] != user_id:
         return jsonify({'error': 'This invite is not for you'}), 403
 
     # Get both users
-    guest = UserService.get_by_id(user_id)
+    guest = UserService.get_profile(user_id)
     host_id = invite['from_user_id']
 
     if not guest:
         return jsonify({'error': 'User not found'}), 404
 
-    # Create game room
-    room_code = generate_code()
-    while room_code in game_rooms:
-        room_code = generate_code()
-
-    game_rooms[room_code] = {
-        'host_id': host_id,
-        'host_username': invite['from_username'],
-        'guest_id': user_id,
-        'guest_username': guest.username,
-        'best_of': invite['best_of'],
-        'host_score': 0,
-        'guest_score': 0,
-        'current_round': 1,
-        'host_choice': None,
-        'guest_choice': None,
-        'status': 'playing',
-        'created_at': time.time(),
-        'rounds': [],
-        'last_update': time.time()
-    }
+    # Claim the invite; only one accept can win it
+    if not store.take_invite(invite_id):
+        return jsonify({'error': 'Invite not found or expired'}), 404
 
-    # Remove invite
-    del pending_invites[invite_id]
+    # Create game room
+    try:
+        room_code = add_room({
+            'host_id': host_id,
+            'host_username': invite['from_username'],
+            'guest_id': user_id,
+            'guest_username': guest['username'],
+            'best_of': invite['best_of'],
+            'host_score': 0,
+            'guest_score': 0,
+            'current_round': 1,
+            'host_choice': None,
+            'guest_choice': None,
+            'status': 'playing',
+            'created_at': time.time(),
+            'rounds': [],
+            'last_update': time.time()
+        })
+    except LobbyFull as e:
+        # Give the invite back so it can be accepted once there is room
+        store.add_invite(invite_id, invite)
+        return jsonify({'error': str(e)}), 503
 
     # Save redirect for the invite sender (A) so they get notified
-    pending_redirects[host_id] = {
-        'room_code': room_code,
-        'timestamp': time.time()
-    }
+    store.set_redirect(host_id, room_code)
+    store.publish('redirect', {'redirect': f'/game/room/{room_code}'}, [host_id])
 
     return jsonify({
         'ok': True,
@@ -237,10 +419,10 @@ def decline_invite(invite_id):
     """Decline an invite."""
     user_id = session.get('user_id')
 
-    if invite_id in pending_invites:
-        invite = pending_invites[invite_id]
-        if invite['to_user_id'] == user_id:
-            del pending_invites[invite_id]
+    store = get_store()
+    invite = store.get_invite(invite_id)
+    if invite and invite['to_user_id'] == user_id:
+        store.remove_invite(invite_id)
 
     return jsonify({'ok': True})
 
@@ -254,7 +436,7 @@ def create_room():
     if not user_id:
         return jsonify({'error': 'Not logged in'}), 401
 
-    user = UserService.get_by_id(user_id)
+    user = UserService.get_profile(user_id)
     if not user:
         return jsonify({'error': 'User not found'}), 404
 
@@ -263,28 +445,25 @@ def create_room():
     if best_of not in [1, 3, 5]:
         best_of = 3
 
-    cleanup()
-
-    room_code = generate_code()
-    while room_code in game_rooms:
-        room_code = generate_code()
-
-    game_rooms[room_code] = {
-        'host_id': user_id,
-        'host_username': user.username,
-        'guest_id': None,
-        'guest_username': None,
-        'best_of': best_of,
-        'host_score': 0,
-        'guest_score': 0,
-        'current_round': 0,
-        'host_choice': None,
-        'guest_choice': None,
-        'status': 'waiting',
-        'created_at': time.time(),
-        'rounds': [],
-        'last_update': time.time()
-    }
+    try:
+        room_code = add_room({
+            'host_id': user_id,
+            'host_username': user['username'],
+            'guest_id': None,
+            'guest_username': None,
+            'best_of': best_of,
+            'host_score': 0,
+            'guest_score': 0,
+            'current_round': 0,
+            'host_choice': None,
+            'guest_choice': None,
+            'status': 'waiting',
+            'created_at': time.time(),
+            'rounds': [],
+            'last_update': time.time()
+        })
+    except LobbyFull as e:
+        return jsonify({'error': str(e)}), 503
 
     return jsonify({
         'ok': True,
@@ -302,29 +481,36 @@ def join_room(room_code):
 
     room_code = room_code.upper()
 
-    if room_code not in game_rooms:
+    store = get_store()
+    if not store.has_room(room_code):
         return jsonify({'error': 'Room not found'}), 404
 
-    room = game_rooms[room_code]
+    user = UserService.get_profile(user_id)
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
 
-    if room['status'] != 'waiting':
-        return jsonify({'error': 'Room is not available'}), 400
+    def join(room):
+        if room['status'] != 'waiting':
+            raise LobbyError('Room is not available')
 
-    if room['host_id'] == user_id:
-        return jsonify({'error': 'Cannot join your own room'}), 400
+        if room['host_id'] == user_id:
+            raise LobbyError('Cannot join your own room')
 
-    if room['guest_id']:
-        return jsonify({'error': 'Room is full'}), 400
+        if room['guest_id']:
+            raise LobbyError('Room is full')
 
-    user = UserService.get_by_id(user_id)
-    if not user:
-        return jsonify({'error': 'User not found'}), 404
+        room['guest_id'] = user_id
+        room['guest_username'] = user['username']
+        room['status'] = 'playing'
+        room['current_round'] = 1
+        room['last_update'] = time.time()
 
-    room['guest_id'] = user_id
-    room['guest_username'] = user.username
-    room['status'] = 'playing'
-    room['current_round'] = 1
-    room['last_update'] = time.time()
+    try:
+        update_room(room_code, join)
+    except KeyError:
+        return jsonify({'error': 'Room not found'}), 404
+    except LobbyError as e:
+        return jsonify({'error': e.message}), e.status_code
 
     return jsonify({
         'ok': True,
@@ -335,15 +521,25 @@ def join_room(room_code):
 
 @bp.route('/room/<room_code>/state', methods=['GET'])
 def get_room_state(room_code):
-    """Get current room state (poll this every 1-2 seconds during game)."""
+    """
+    Get current room state.
+
+    Plain requests return at once. With ?since=<last_update>&wait=<seconds>
+    the request is held until the room changes (or wait runs out, answered
+    with 304), so clients can re-poll immediately instead of every 1-2 s.
+
+    ?after_seq=<seq> works the same way but answers with a delta: the
+    changed fields and the rounds added since that seq. Clients further
+    behind than the kept change history get a full snapshot (delta=false).
+    """
     user_id = session.get('user_id')
     room_code = room_code.upper()
 
-    if room_code not in game_rooms:
+    store = get_store()
+    room = store.get_room(room_code)
+    if room is None:
         return jsonify({'error': 'Room not found'}), 404
 
-    room = game_rooms[room_code]
-
     # Check if user is in this room
     is_host = room['host_id'] == user_id
     is_guest = room['guest_id'] == user_id
@@ -351,30 +547,36 @@ def get_room_state(room_code):
     if not is_host and not is_guest:
         return jsonify({'error': 'Not in this room'}), 403
 
-    # Don't reveal choices until both have chosen
-    host_ready = room['host_choice'] is not None
-    guest_ready = room['guest_choice'] is not None
-
-    return jsonify({
-        'room_code': room_code,
-        'status': room['status'],
-        'best_of': room['best_of'],
-        'current_round': room['current_round'],
-        'host': {
-            'id': room['host_id'],
-            'username': room['host_username'],
-            'score': room['host_score'],
-            'ready': host_ready
-        },
-        'guest': {
-            'id': room['guest_id'],
-            'username': room['guest_username'],
-            'score': room['guest_score'],
-            'ready': guest_ready
-        } if room['guest_id'] else None,
-        'rounds': room['rounds'],
-        'last_update': room['last_update']
-    })
+    after_seq = request.args.get('after_seq', type=int)
+    since = request.args.get('since', type=float)
+    if after_seq is not None:
+        field, known = 'seq', after_seq
+    elif since is not None:
+        field, known = 'last_update', since
+    else:
+        field = None
+
+    if field:
+        wait = min(max(request.args.get('wait', 0, type=float), 0), LONGPOLL_MAX_WAIT)
+        if wait and room[field] == known:
+            room = store.wait_for_room_change(room_code, known, wait, field)
+            if room is None:
+                return jsonify({'error': 'Room not found'}), 404
+        if room[field] == known:
+            return '', 304
+
+    if after_seq is not None:
+        delta = room_delta(room, after_seq)
+        if delta is not None:
+            return jsonify(delta)
+
+    return jsonify(dict(
+        room_view(room),
+        room_code=room_code,
+        seq=room['seq'],
+        delta=False,
+        rounds=room['rounds']
+    ))
 
 
 @bp.route('/room/<room_code>/choice', methods=['POST'])
@@ -386,47 +588,54 @@ def make_choice(room_code):
 
     room_code = room_code.upper()
 
-    if room_code not in game_rooms:
-        return jsonify({'error': 'Room not found'}), 404
+    data = request.get_json() or {}
+    choice = data.get('choice', '').lower()
 
-    room = game_rooms[room_code]
+    def choose(room):
+        if room['status'] != 'playing':
+            raise LobbyError('Game not in progress')
 
-    if room['status'] != 'playing':
-        return jsonify({'error': 'Game not in progress'}), 400
+        if choice not in VALID_CHOICES:
+            raise LobbyError('Invalid choice')
 
-    data = request.get_json() or {}
-    choice = data.get('choice', '').lower()
+        is_host = room['host_id'] == user_id
+        is_guest = room['guest_id'] == user_id
 
-    if choice not in VALID_CHOICES:
-        return jsonify({'error': 'Invalid choice'}), 400
+        if not is_host and not is_guest:
+            raise LobbyError('Not in this room', 403)
 
-    is_host = room['host_id'] == user_id
-    is_guest = room['guest_id'] == user_id
+        if is_host:
+            if room['host_choice']:
+                raise LobbyError('Already chosen')
+            room['host_choice'] = choice
+        else:
+            if room['guest_choice']:
+                raise LobbyError('Already chosen')
+            room['guest_choice'] = choice
 
-    if not is_host and not is_guest:
-        return jsonify({'error': 'Not in this room'}), 403
+        room['last_update'] = time.time()
 
-    if is_host:
-        if room['host_choice']:
-            return jsonify({'error': 'Already chosen'}), 400
-        room['host_choice'] = choice
-    else:
-        if room['guest_choice']:
-            return jsonify({'error': 'Already chosen'}), 400
-        room['guest_choice'] = choice
+        # Check if round complete
+        if room['host_choice'] and room['guest_choice']:
+            resolve_round(room)
 
-    room['last_update'] = time.time()
+        return dict(room) if room['status'] == 'finished' else None
 
-    # Check if round complete
-    if room['host_choice'] and room['guest_choice']:
-        resolve_round(room_code)
+    try:
+        finished = update_room(room_code, choose)
+    except KeyError:
+        return jsonify({'error': 'Room not found'}), 404
+    except LobbyError as e:
+        return jsonify({'error': e.message}), e.status_code
+
+    if finished:
+        save_match_result(finished)
 
     return jsonify({'ok': True})
 
 
-def resolve_round(room_code):
-    """Resolve the current round."""
-    room = game_rooms[room_code]
+def resolve_round(room):
+    """Resolve the current round of a room (called inside a room update)."""
     host_choice = room['host_choice']
     guest_choice = room['guest_choice']
 
@@ -452,11 +661,9 @@ def resolve_round(room_code):
     if room['host_score'] >= wins_needed:
         room['status'] = 'finished'
         room['winner_id'] = room['host_id']
-        save_match_result(room)
     elif room['guest_score'] >= wins_needed:
         room['status'] = 'finished'
         room['winner_id'] = room['guest_id']
-        save_match_result(room)
     else:
         # Next round
         room['current_round'] += 1
@@ -467,34 +674,8 @@ def resolve_round(room_code):
 
 
 def save_match_result(room):
-    """Save match result to database."""
-    try:
-        import json
-        from app.extensions import db
-        from app.models import GameMatch
-
-        match = GameMatch(
-            player1_id=room['host_id'],
-            player2_id=room['guest_id'],
-            winner_id=room['winner_id'],
-            player1_score=room['host_score'],
-            player2_score=room['guest_score'],
-            rounds_data=json.dumps(room['rounds'])
-        )
-        db.session.add(match)
-
-        if room['winner_id'] == room['host_id']:
-            UserService.update_stats(room['host_id'], 'win')
-            UserService.update_stats(room['guest_id'], 'loss')
-        else:
-            UserService.update_stats(room['guest_id'], 'win')
-            UserService.update_stats(room['host_id'], 'loss')
-
-        db.session.commit()
-    except Exception as e:
-        print(f"Error saving match: {e}")
-        from app.extensions import db
-        db.session.rollback()
+    """Queue a finished match; the background MatchWriter saves it and updates stats."""
+    current_app.extensions['match_writer'].submit(room)
 
 
 @bp.route('/room/<room_code>/leave', methods=['POST'])
@@ -503,13 +684,10 @@ def leave_room(room_code):
     user_id = session.get('user_id')
     room_code = room_code.upper()
 
-    if room_code not in game_rooms:
-        return jsonify({'ok': True})
-
-    room = game_rooms[room_code]
+    def forfeit(room):
+        if room['status'] != 'playing':
+            return None
 
-    if room['status'] == 'playing':
-        # Forfeit
         if room['host_id'] == user_id:
             room['winner_id'] = room['guest_id']
         elif room['guest_id'] == user_id:
@@ -517,6 +695,16 @@ def leave_room(room_code):
 
         if room.get('winner_id'):
             room['status'] = 'finished'
-            save_match_result(room)
+            room['last_update'] = time.time()
+            return dict(room)
+        return None
+
+    try:
+        finished = update_room(room_code, forfeit)
+    except KeyError:
+        return jsonify({'ok': True})
+
+    if finished:
+        save_match_result(finished)
 
     return jsonify({'ok': True})
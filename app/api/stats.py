@@ -2,27 +2,70 @@
 Statistics API routes.
 """
 
-from flask import Blueprint
+from datetime import datetime, timedelta
+from flask import Blueprint, request
 from app.services import StatsService
 from app.utils import data_response, error_response
 
 bp = Blueprint('stats', __name__)
 
+PARTICIPATIONS_PAGE_SIZE = 50
+PARTICIPATIONS_PAGE_MAX = 200
+
+
+def parse_date_arg(key, end=False):
+    """
+    Parse an ISO date/datetime query param. A bare date as the end of a
+    range covers that whole day. Raises ValueError if malformed.
+    """
+    value = request.args.get(key)
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
 
 @bp.route('', methods=['GET'])
 def get_stats():
-    """Get overall statistics."""
-    stats = StatsService.get_overall_stats()
+    """
+    Get overall statistics.
+
+    Query params:
+        from: Start date (YYYY-MM-DD or ISO datetime), inclusive
+        to: End date, inclusive for a bare date
+        name: Only expenses paid by this person
+    """
+    try:
+        date_from = parse_date_arg('from')
+        date_to = parse_date_arg('to', end=True)
+    except ValueError:
+        return error_response('Ngày không hợp lệ', 400)
+
+    stats = StatsService.get_overall_stats(date_from, date_to, request.args.get('name'))
     return data_response(stats)
 
 
 @bp.route('/people', methods=['GET'])
 def get_people_stats():
-    """Get statistics per person."""
-    stats = StatsService.get_people_stats()
+    """
+    Get statistics per person (name, total, count, share, expenses).
+
+    Query params:
+        exclude: "expenses" to leave out each person's payments
+    """
+    include_expenses = 'expenses' not in request.args.get('exclude', '').split(',')
+    stats = StatsService.get_people_stats(include_expenses)
     return data_response(stats)
 
 
+@bp.route('/settlement', methods=['GET'])
+def get_settlement():
+    """Get the transfers (from, to, amount) that settle everyone's balance."""
+    return data_response(StatsService.get_settlement())
+
+
 @bp.route('/people/<name>', methods=['GET'])
 def get_person_stats(name):
     """Get statistics for a specific person."""
@@ -32,3 +75,23 @@ def get_person_stats(name):
         return error_response('Không tìm thấy người này', 404)
 
     return data_response(stats)
+
+
+@bp.route('/people/<name>/participations', methods=['GET'])
+def get_person_participations(name):
+    """
+    Get the expenses a person is listed as participant of, newest first.
+
+    Query params:
+        limit: Page size (default 50, max 200)
+        before: next_before of the previous page
+    """
+    limit = min(max(request.args.get('limit', PARTICIPATIONS_PAGE_SIZE, type=int), 1), PARTICIPATIONS_PAGE_MAX)
+    before = None
+    if request.args.get('before'):
+        try:
+            before = int(request.args['before'])
+        except ValueError:
+            return error_response('Tham số before không hợp lệ', 400)
+
+    return data_response(StatsService.get_participations(name, limit, before))
@@ -3,10 +3,16 @@ Models package - Database models.
 """
 
 from app.models.expense import Expense
+from app.models.expense_participant import ExpenseParticipant
 from app.models.history import History
 from app.models.archive import Archive
 from app.models.user import User, GameUser  # GameUser is alias for backward compatibility
 from app.models.game_room import GameRoom, GameRound
 from app.models.game_match import GameMatch
+from app.models.counter import Counter
+from app.models.player_stats import PlayerStats, HeadToHead
+from app.models.scheduled_job import ScheduledJob
+from app.models.person_balance import PersonBalance, BalanceSummary
 
-__all__ = ['Expense', 'History', 'Archive', 'User', 'GameUser', 'GameRoom', 'GameRound', 'GameMatch']
+__all__ = ['Expense', 'ExpenseParticipant', 'History', 'Archive', 'User', 'GameUser', 'GameRoom', 'GameRound',
+           'GameMatch', 'Counter', 'PlayerStats', 'HeadToHead', 'ScheduledJob', 'PersonBalance', 'BalanceSummary']
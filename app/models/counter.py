@@ -0,0 +1,45 @@
+"""
+Counter model - named counters handed out in blocks.
+"""
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+
+
+class Counter(db.Model):
+    """Model for named monotonic counters (e.g. room code allocation)."""
+
+    __tablename__ = 'counter'
+
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<Counter {self.name}={self.value}>'
+
+    @staticmethod
+    def reserve(name, count):
+        """
+        Reserve count consecutive values of a counter.
+        Runs in its own transaction on a separate connection, so it neither
+        commits nor waits on the caller's session.
+        Returns:
+            The first reserved value
+        """
+        table = Counter.__table__
+        for _ in range(2):
+            with db.engine.begin() as conn:
+                updated = conn.execute(
+                    update(table).where(table.c.name == name).values(value=table.c.value + count)
+                ).rowcount
+                if updated:
+                    value = conn.execute(select(table.c.value).where(table.c.name == name)).scalar_one()
+                    return value - count
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(table.insert().values(name=name, value=count))
+                return 0
+            except IntegrityError:
+                continue  # Another process created it first; reserve again
+        raise RuntimeError(f'Could not reserve counter {name}')
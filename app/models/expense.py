@@ -5,12 +5,21 @@ Expense model - represents a spending record.
 import json
 from datetime import datetime
 from app.extensions import db
+from app.models.expense_participant import ExpenseParticipant
 
 
 class Expense(db.Model):
     """Model for expense/spending records."""
 
     __tablename__ = 'expense'
+    __table_args__ = (
+        # Date range filters of /api/stats, alone or per payer; amount makes
+        # them covering, so the aggregates never touch the table
+        db.Index('ix_expense_date', 'date', 'amount'),
+        db.Index('ix_expense_name_date', 'name', 'date', 'amount'),
+        # Per-(payer, participant set) sums of the balance engine, index only
+        db.Index('ix_expense_balance', 'name', 'participants', 'amount'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -18,26 +27,29 @@ class Expense(db.Model):
     purpose = db.Column(db.String(200), nullable=False)
     date = db.Column(db.DateTime, default=datetime.utcnow)
     last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    participants = db.Column(db.Text, nullable=True)  # JSON list, null = all members
+    # JSON copy of the participant list, null = all members. Kept as the
+    # participant set key of the balance queries; lookups use participant_rows
+    participants = db.Column(db.Text, nullable=True)
+
+    participant_rows = db.relationship(
+        ExpenseParticipant, order_by=ExpenseParticipant.position, lazy='selectin',
+        cascade='all, delete-orphan', passive_deletes=True)
 
     def __repr__(self):
         return f'<Expense {self.id}: {self.name} - {self.amount}>'
 
     def get_participants(self):
-        """Parse and return participants list."""
-        if not self.participants:
-            return None
-        try:
-            return json.loads(self.participants)
-        except (json.JSONDecodeError, TypeError):
-            return None
+        """Return participants list, or None for all members."""
+        return [row.member for row in self.participant_rows] or None
 
     def set_participants(self, participants_list):
-        """Set participants from a list."""
-        if participants_list and len(participants_list) > 0:
-            self.participants = json.dumps(participants_list)
-        else:
-            self.participants = None
+        """Set participants from a list (duplicates dropped)."""
+        members = list(dict.fromkeys(participants_list or []))
+        existing = {row.member: row for row in self.participant_rows}
+        self.participant_rows = [existing.get(member) or ExpenseParticipant(member=member) for member in members]
+        for position, row in enumerate(self.participant_rows):
+            row.position = position
+        self.participants = json.dumps(members) if members else None
 
     def to_dict(self):
         """Convert model to dictionary."""
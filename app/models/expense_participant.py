@@ -0,0 +1,22 @@
+"""
+Expense participant model - one row per member an expense is split among.
+"""
+
+from app.extensions import db
+
+
+class ExpenseParticipant(db.Model):
+    """Model for an explicit participant of an expense (none = all members)."""
+
+    __tablename__ = 'expense_participant'
+    __table_args__ = (
+        # Participations of a member (the primary key covers expense_id)
+        db.Index('ix_expense_participant_member', 'member', 'expense_id'),
+    )
+
+    expense_id = db.Column(db.Integer, db.ForeignKey('expense.id', ondelete='CASCADE'), primary_key=True)
+    member = db.Column(db.String(100), primary_key=True)
+    position = db.Column(db.Integer, nullable=False, default=0)  # Order in the participants list
+
+    def __repr__(self):
+        return f'<ExpenseParticipant {self.expense_id}: {self.member}>'
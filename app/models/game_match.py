@@ -11,6 +11,13 @@ class GameMatch(db.Model):
     """Model for completed match history."""
 
     __tablename__ = 'game_match'
+    __table_args__ = (
+        # Keyset pagination of a player's history: (player, ended_at, id) range scans
+        db.Index('ix_game_match_player1_ended', 'player1_id', 'ended_at', 'id'),
+        db.Index('ix_game_match_player2_ended', 'player2_id', 'ended_at', 'id'),
+        # Chronological replay of all matches (rating recompute)
+        db.Index('ix_game_match_ended', 'ended_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -37,15 +44,17 @@ class GameMatch(db.Model):
     player2 = db.relationship('User', foreign_keys=[player2_id])
     winner = db.relationship('User', foreign_keys=[winner_id])
 
-    def to_dict(self):
-        return {
+    def to_dict(self, include_rounds=True):
+        data = {
             'id': self.id,
             'player1': self.player1.to_dict(include_stats=False) if self.player1 else None,
             'player2': self.player2.to_dict(include_stats=False) if self.player2 else None,
             'winner_id': self.winner_id,
             'player1_score': self.player1_score,
             'player2_score': self.player2_score,
-            'rounds': json.loads(self.rounds_data) if self.rounds_data else [],
             'started_at': self.started_at.isoformat() if self.started_at else None,
             'ended_at': self.ended_at.isoformat() if self.ended_at else None
         }
+        if include_rounds:
+            data['rounds'] = json.loads(self.rounds_data) if self.rounds_data else []
+        return data
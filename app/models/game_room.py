@@ -2,8 +2,8 @@
 GameRoom and GameRound models - Game room/lobby for matchmaking.
 """
 
-import secrets
 from datetime import datetime
+from flask import current_app
 from app.extensions import db
 
 
@@ -11,6 +11,10 @@ class GameRoom(db.Model):
     """Model for game rooms/lobbies."""
 
     __tablename__ = 'game_room'
+    __table_args__ = (
+        # Oldest-first scans of the stale room reaper
+        db.Index('ix_game_room_created', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     room_code = db.Column(db.String(6), unique=True, nullable=False, index=True)
@@ -39,11 +43,12 @@ class GameRoom(db.Model):
 
     @staticmethod
     def generate_room_code():
-        """Generate a unique 6-character room code."""
-        while True:
-            code = secrets.token_hex(3).upper()
-            if not GameRoom.query.filter_by(room_code=code).first():
-                return code
+        """
+        Generate a 6-character room code from the app's allocator (no query;
+        see app.utils.room_codes). Unique unless the counter wraps or the key
+        changes, so inserts still retry on the unique constraint.
+        """
+        return current_app.extensions['room_codes'].next_code()
 
     @property
     def is_full(self):
@@ -80,6 +85,10 @@ class GameRound(db.Model):
     """Model for individual game rounds within a room."""
 
     __tablename__ = 'game_round'
+    __table_args__ = (
+        # A room's rounds: current round lookups and reaper deletes
+        db.Index('ix_game_round_room', 'room_id', 'round_number'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     room_id = db.Column(db.Integer, db.ForeignKey('game_room.id'), nullable=False)
@@ -0,0 +1,48 @@
+"""
+Person balance models - Per-person expense totals kept up to date on write.
+"""
+
+from app.extensions import db
+
+
+class PersonBalance(db.Model):
+    """Model for one member's running totals over all current expenses."""
+
+    __tablename__ = 'person_balance'
+    __table_args__ = (
+        # /api/stats/people lists members by total paid
+        db.Index('ix_person_balance_total', 'total', 'name'),
+    )
+
+    name = db.Column(db.String(100), primary_key=True)
+    total = db.Column(db.Float, nullable=False, default=0)  # Amount paid
+    count = db.Column(db.Integer, nullable=False, default=0)  # Expenses paid
+    # Share of the expenses that list their participants; the "all members"
+    # part depends on the member count and is added on read
+    share = db.Column(db.Float, nullable=False, default=0)
+    # Expenses naming this person as payer or participant; at 0 they are no
+    # longer a member and the row is deleted
+    refs = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def empty(cls, name):
+        """A zeroed row (column defaults only apply on insert)."""
+        return cls(name=name, total=0.0, count=0, share=0.0, refs=0)
+
+    def __repr__(self):
+        return f'<PersonBalance {self.name}: {self.total}/{self.share}>'
+
+
+class BalanceSummary(db.Model):
+    """Model for the single row of totals shared by all members (id = 1)."""
+
+    __tablename__ = 'balance_summary'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Sum of the null-participant expenses, split evenly among all members
+    all_members_amount = db.Column(db.Float, nullable=False, default=0)
+    # Bumped by every change to the expenses; also serializes the writers
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<BalanceSummary v{self.version}: {self.all_members_amount}>'
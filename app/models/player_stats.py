@@ -0,0 +1,81 @@
+"""
+Player stats rollups - Per-player aggregates derived from game matches.
+"""
+
+from datetime import datetime
+from app.extensions import db
+
+CHOICES = ('rock', 'paper', 'scissors')
+
+
+class PlayerStats(db.Model):
+    """Model for a player's streaks and choice counts over all matches."""
+
+    __tablename__ = 'game_player_stats'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('game_user.id'), primary_key=True)
+
+    # Consecutive results up to the latest match: > 0 wins, < 0 losses
+    current_streak = db.Column(db.Integer, nullable=False, default=0)
+    longest_win_streak = db.Column(db.Integer, nullable=False, default=0)
+    longest_loss_streak = db.Column(db.Integer, nullable=False, default=0)
+
+    # Choices thrown, over all rounds
+    rock_count = db.Column(db.Integer, nullable=False, default=0)
+    paper_count = db.Column(db.Integer, nullable=False, default=0)
+    scissors_count = db.Column(db.Integer, nullable=False, default=0)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @classmethod
+    def empty(cls, user_id):
+        """A zeroed row (column defaults only apply on insert)."""
+        return cls(user_id=user_id, current_streak=0, longest_win_streak=0, longest_loss_streak=0,
+                   rock_count=0, paper_count=0, scissors_count=0)
+
+    def record_result(self, won):
+        """Extend or restart the current streak. won: True, False or None (no winner)."""
+        if won is None:
+            self.current_streak = 0
+        elif won:
+            self.current_streak = self.current_streak + 1 if self.current_streak > 0 else 1
+            self.longest_win_streak = max(self.longest_win_streak, self.current_streak)
+        else:
+            self.current_streak = self.current_streak - 1 if self.current_streak < 0 else -1
+            self.longest_loss_streak = max(self.longest_loss_streak, -self.current_streak)
+
+    def record_choice(self, choice):
+        if choice in CHOICES:
+            setattr(self, f'{choice}_count', getattr(self, f'{choice}_count') + 1)
+
+    def to_dict(self):
+        return {
+            'current_streak': abs(self.current_streak),
+            'current_streak_type': 'win' if self.current_streak > 0 else 'loss' if self.current_streak < 0 else None,
+            'longest_win_streak': self.longest_win_streak,
+            'longest_loss_streak': self.longest_loss_streak,
+            'choices': {choice: getattr(self, f'{choice}_count') for choice in CHOICES}
+        }
+
+
+class HeadToHead(db.Model):
+    """Model for a player's record against one opponent (one row per direction)."""
+
+    __tablename__ = 'game_head_to_head'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('game_user.id'), primary_key=True)
+    opponent_id = db.Column(db.Integer, db.ForeignKey('game_user.id'), primary_key=True)
+    wins = db.Column(db.Integer, nullable=False, default=0)
+    losses = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def empty(cls, user_id, opponent_id):
+        return cls(user_id=user_id, opponent_id=opponent_id, wins=0, losses=0)
+
+    def to_dict(self):
+        return {
+            'opponent_id': self.opponent_id,
+            'wins': self.wins,
+            'losses': self.losses,
+            'matches': self.wins + self.losses
+        }
@@ -0,0 +1,47 @@
+"""
+ScheduledJob model - Lease and run history of periodic background jobs.
+"""
+
+from app.extensions import db
+
+
+class ScheduledJob(db.Model):
+    """
+    Model for one periodic job (app.services.scheduler). Whoever moves
+    next_run_at forward first runs the job, so several workers can share
+    one schedule; the rest of the row is the latest run's outcome.
+    """
+
+    __tablename__ = 'scheduled_job'
+
+    name = db.Column(db.String(50), primary_key=True)
+    next_run_at = db.Column(db.DateTime, nullable=False)
+
+    # Latest run
+    owner = db.Column(db.String(100), nullable=True)  # host:pid of the worker
+    last_started_at = db.Column(db.DateTime, nullable=True)
+    last_duration_ms = db.Column(db.Float, nullable=True)
+    last_rows = db.Column(db.Integer, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+
+    # Totals
+    runs = db.Column(db.Integer, nullable=False, default=0)
+    failures = db.Column(db.Integer, nullable=False, default=0)
+    total_rows = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ScheduledJob {self.name}>'
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'next_run_at': self.next_run_at.isoformat() if self.next_run_at else None,
+            'owner': self.owner,
+            'last_started_at': self.last_started_at.isoformat() if self.last_started_at else None,
+            'last_duration_ms': round(self.last_duration_ms, 2) if self.last_duration_ms is not None else None,
+            'last_rows': self.last_rows,
+            'last_error': self.last_error,
+            'runs': self.runs,
+            'failures': self.failures,
+            'total_rows': self.total_rows
+        }
@@ -25,6 +25,17 @@ class User(db.Model):
     total_losses = db.Column(db.Integer, default=0)
     total_draws = db.Column(db.Integer, default=0)
 
+    # Elo rating (app.services.rating)
+    rating = db.Column(db.Float, default=1500.0, nullable=False)
+
+    __table_args__ = (
+        # Leaderboard orders; loading the in-memory leaderboard scans only these
+        db.Index('ix_game_user_leaderboard', total_wins.desc(), total_losses, id),
+        db.Index('ix_game_user_rating', rating.desc(), id),
+        # Players whose stats changed since the leaderboard's last resync
+        db.Index('ix_game_user_last_active', last_active),
+    )
+
     def set_password(self, password):
         self.password_hash = generate_password_hash(password, method='pbkdf2:sha256')
 
@@ -54,7 +65,8 @@ class User(db.Model):
                 'total_losses': self.total_losses,
                 'total_draws': self.total_draws,
                 'total_matches': self.total_matches,
-                'win_rate': round(self.win_rate, 1)
+                'win_rate': round(self.win_rate, 1),
+                'rating': round(self.rating) if self.rating is not None else None
             })
         return data
 
@@ -67,7 +79,8 @@ class User(db.Model):
             'total_wins': self.total_wins,
             'total_losses': self.total_losses,
             'total_draws': self.total_draws,
-            'win_rate': round(self.win_rate, 1)
+            'win_rate': round(self.win_rate, 1),
+            'rating': round(self.rating) if self.rating is not None else None
         }
 
 
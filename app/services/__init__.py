@@ -8,6 +8,9 @@ from app.services.stats_service import StatsService
 from app.services.archive_service import ArchiveService
 from app.services.user_service import UserService, GameUserService  # GameUserService is alias
 from app.services.game_room_service import GameRoomService
+from app.services.rating import RatingService
+from app.services.game_stats_service import GameStatsService
+from app.services.balance_service import BalanceService
 
 __all__ = [
     'ExpenseService',
@@ -16,5 +19,8 @@ __all__ = [
     'ArchiveService',
     'UserService',
     'GameUserService',
-    'GameRoomService'
+    'GameRoomService',
+    'RatingService',
+    'GameStatsService',
+    'BalanceService'
 ]
@@ -4,8 +4,9 @@ Archive service - Business logic for archiving data.
 
 import json
 from app.extensions import db
-from app.models import Expense, Archive
+from app.models import Expense, ExpenseParticipant, Archive
 from app.services.history_service import HistoryService
+from app.services.balance_service import BalanceService
 
 
 class ArchiveService:
@@ -35,7 +36,9 @@ class ArchiveService:
 
         # Clear current expenses
         count = len(expenses)
+        ExpenseParticipant.query.delete()
         Expense.query.delete()
+        BalanceService.reset()
 
         db.session.commit()
 
@@ -0,0 +1,69 @@
+"""
+Balance engine - Per-person totals and shares of a set of expenses.
+
+Works on plain rows instead of Expense objects: (payer, participants
+JSON, amount, count), one per expense or already summed per (payer,
+participants) by the database. Each distinct participants value is
+decoded once; expenses with the same participant set form a group, so
+each group's amount is split among its members once:
+
+    share = sum over the member's groups of group_amount / group_size
+
+plus an even split of the null-participant ("all members") total.
+"""
+
+import json
+
+
+def decode_participants(participants):
+    """Participant list of an expense, or None for "all members" (as Expense.get_participants)."""
+    if not participants:
+        return None
+    try:
+        return json.loads(participants) or None
+    except (ValueError, TypeError):
+        return None
+
+
+def compute_balances(rows):
+    """
+    Args:
+        rows: iterable of (payer, participants JSON or None, amount, count)
+    Returns:
+        [{'name', 'total', 'count', 'share'}] for every payer and
+        participant, sorted by total paid (descending), then name
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+
+    # Decode each distinct participants value once; None = all members
+    groups = {raw: decode_participants(raw) for _, raw, _, _ in rows}
+    members = {name for name, _, _, _ in rows}
+    for group in groups.values():
+        if group:
+            members.update(group)
+    members = sorted(members)
+
+    totals = dict.fromkeys(members, 0.0)
+    counts = dict.fromkeys(members, 0)
+    group_amount = dict.fromkeys(groups, 0.0)
+    for name, raw, amount, count in rows:
+        totals[name] += amount
+        counts[name] += count
+        group_amount[raw] += amount
+
+    all_members_amount = sum(a for raw, a in group_amount.items() if groups[raw] is None)
+    shares = dict.fromkeys(members, all_members_amount / len(members))
+    for raw, amount in group_amount.items():
+        group = groups[raw]
+        if group is not None:
+            for p in group:
+                shares[p] += amount / len(group)
+
+    result = [
+        {'name': name, 'total': float(totals[name]), 'count': int(counts[name]), 'share': float(shares[name])}
+        for name in members
+    ]
+    result.sort(key=lambda x: x['total'], reverse=True)
+    return result
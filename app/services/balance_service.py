@@ -0,0 +1,191 @@
+"""
+BalanceService - Per-person balances kept up to date as expenses change.
+
+person_balance holds each member's total paid, payment count and share of
+the expenses that list their participants; balance_summary holds the sum
+of the null-participant ("all members") expenses. ExpenseService and
+ArchiveService fold every change into them in the same transaction, so
+/api/stats/people reads a few dozen rows instead of every expense:
+
+    share = person.share + all_members_amount / number of members
+
+A member is anyone named as payer or participant of a current expense, so
+when a new member appears everyone's part of the "all members" sum drops
+on the next read without rewriting any row. rebuild() recomputes both
+tables from the expenses and reports where they had drifted:
+
+    python rebuild_balances.py
+"""
+
+import time
+from sqlalchemy import func
+from app.extensions import db
+from app.models import Expense, PersonBalance, BalanceSummary
+from app.services.balance_engine import compute_balances, decode_participants
+
+
+def _fold(rows, sign, deltas):
+    """
+    Add (sign 1) or subtract (sign -1) expenses into deltas,
+    {name: [total, count, share, refs]}.
+    Args:
+        rows: [(payer, participants JSON, amount, count)], as for compute_balances
+    Returns:
+        Change of the "all members" amount
+    """
+    all_members = 0.0
+    for name, participants, amount, count in rows:
+        payer = deltas.setdefault(name, [0.0, 0, 0.0, 0])
+        payer[0] += sign * amount
+        payer[1] += sign * count
+        payer[3] += sign * count
+        group = decode_participants(participants)
+        if group is None:
+            all_members += sign * amount
+            continue
+        per_head = amount / len(group)
+        for p in group:
+            person = deltas.setdefault(p, [0.0, 0, 0.0, 0])
+            person[2] += sign * per_head
+            person[3] += sign * count
+    return all_members
+
+
+class BalanceService:
+    """Service class for the materialized per-person balances."""
+
+    TOLERANCE = 1e-6  # Relative difference rebuild() still counts as equal
+
+    @staticmethod
+    def snapshot(expense):
+        """What apply() needs of an expense, taken before it changes."""
+        return expense.name, expense.participants, expense.amount
+
+    @staticmethod
+    def _lock_summary():
+        """The summary row, locked: expense writers update balances one at a time."""
+        summary = BalanceSummary.query.filter_by(id=1).with_for_update().first()
+        if summary is None:
+            summary = BalanceSummary(id=1, all_members_amount=0.0, version=0)
+            db.session.add(summary)
+        return summary
+
+    @staticmethod
+    def apply(removed=(), added=()):
+        """
+        Fold an expense change into the balances. Part of the caller's
+        transaction (no commit).
+        Args:
+            removed: snapshots of the expenses as they were (update, delete)
+            added: snapshots of the expenses as they are now (create, update)
+        """
+        summary = BalanceService._lock_summary()
+        deltas = {}
+        all_members = _fold([(*s, 1) for s in removed], -1, deltas)
+        all_members += _fold([(*s, 1) for s in added], 1, deltas)
+        summary.all_members_amount += all_members
+        summary.version += 1
+
+        names = sorted(deltas)
+        people = {p.name: p for p in PersonBalance.query.filter(PersonBalance.name.in_(names))}
+        for name in names:
+            total, count, share, refs = deltas[name]
+            person = people.get(name)
+            if person is None:
+                if refs <= 0:
+                    continue  # Nothing to take from; rebuild() repairs the drift
+                person = PersonBalance.empty(name)
+                db.session.add(person)
+            person.total += total
+            person.count += count
+            person.share += share
+            person.refs += refs
+            if person.refs <= 0 and name in people:
+                db.session.delete(person)  # No longer a member
+
+    @staticmethod
+    def reset():
+        """Forget all balances (every expense was removed). No commit."""
+        summary = BalanceService._lock_summary()
+        PersonBalance.query.delete()
+        summary.all_members_amount = 0.0
+        summary.version += 1
+
+    @staticmethod
+    def version():
+        """Expense data version: changes with every expense write."""
+        return db.session.query(BalanceSummary.version).filter_by(id=1).scalar() or 0
+
+    @staticmethod
+    def get_balances():
+        """
+        Returns:
+            [{'name', 'total', 'count', 'share'}] of every member, sorted by
+            total paid (descending), then name, as compute_balances()
+        """
+        summary = db.session.get(BalanceSummary, 1)
+        people = PersonBalance.query.order_by(PersonBalance.total.desc(), PersonBalance.name).all()
+        all_members_share = summary.all_members_amount / len(people) if summary and people else 0.0
+        return [
+            {'name': p.name, 'total': p.total, 'count': p.count, 'share': p.share + all_members_share}
+            for p in people
+        ]
+
+    @staticmethod
+    def _grouped_rows():
+        return db.session.query(
+            Expense.name, Expense.participants, func.sum(Expense.amount), func.count(Expense.id)
+        ).group_by(Expense.name, Expense.participants).all()
+
+    @staticmethod
+    def recompute():
+        """Balances computed from scratch from all expenses (the slow path)."""
+        return compute_balances(BalanceService._grouped_rows())
+
+    @staticmethod
+    def _differs(expected, current):
+        if expected is None or current is None or expected['count'] != current['count']:
+            return True
+        return any(abs(expected[key] - current[key]) > BalanceService.TOLERANCE * max(1.0, abs(expected[key]))
+                   for key in ('total', 'share'))
+
+    @staticmethod
+    def rebuild(write=True):
+        """
+        Recompute the balances from all expenses and compare them with the
+        tables; with write, replace the tables' contents and commit.
+        Returns:
+            dict with members, expenses, mismatches (names whose stored
+            balance differed) and seconds
+        """
+        start = time.perf_counter()
+        summary = BalanceService._lock_summary()
+        rows = BalanceService._grouped_rows()
+        expected = {p['name']: p for p in compute_balances(rows)}
+        current = {p['name']: p for p in BalanceService.get_balances()}
+        mismatches = [name for name in sorted(expected.keys() | current.keys())
+                      if BalanceService._differs(expected.get(name), current.get(name))]
+
+        if write:
+            deltas = {}
+            summary.all_members_amount = _fold(rows, 1, deltas)
+            summary.version += 1
+            PersonBalance.query.delete()
+            db.session.add_all(PersonBalance(name=name, total=total, count=count, share=share, refs=refs)
+                               for name, (total, count, share, refs) in deltas.items())
+            db.session.commit()
+        else:
+            db.session.rollback()
+
+        return {
+            'members': len(expected),
+            'expenses': sum(row[3] for row in rows),
+            'mismatches': mismatches,
+            'seconds': round(time.perf_counter() - start, 3)
+        }
+
+    @staticmethod
+    def ensure_built():
+        """Fill the tables from the existing expenses the first time they are used."""
+        if db.session.get(BalanceSummary, 1) is None:
+            BalanceService.rebuild()
@@ -3,14 +3,19 @@ Expense service - Business logic for expense operations.
 """
 
 from datetime import datetime
+from sqlalchemy import exists
 from app.extensions import db
-from app.models import Expense
+from app.models import Expense, ExpenseParticipant
+from app.services.balance_engine import decode_participants
 from app.services.history_service import HistoryService
+from app.services.balance_service import BalanceService
 
 
 class ExpenseService:
     """Service class for expense operations."""
 
+    BACKFILL_BATCH = 5000  # Expenses read per query in backfill_participants()
+
     @staticmethod
     def get_all():
         """Get all expenses."""
@@ -46,6 +51,7 @@ class ExpenseService:
         expense.set_participants(participants)
 
         db.session.add(expense)
+        BalanceService.apply(added=[BalanceService.snapshot(expense)])
         db.session.commit()
 
         # Log to history
@@ -65,6 +71,7 @@ class ExpenseService:
         """
         expense = Expense.query.get_or_404(expense_id)
         old_data = expense.to_dict()
+        old_balance = BalanceService.snapshot(expense)
 
         expense.name = data['name']
         expense.amount = float(data['amount'])
@@ -75,6 +82,7 @@ class ExpenseService:
         participants = data.get('participants')
         expense.set_participants(participants)
 
+        BalanceService.apply(removed=[old_balance], added=[BalanceService.snapshot(expense)])
         db.session.commit()
 
         # Log to history
@@ -94,6 +102,7 @@ class ExpenseService:
         expense = Expense.query.get_or_404(expense_id)
         deleted_data = expense.to_dict()
 
+        BalanceService.apply(removed=[BalanceService.snapshot(expense)])
         db.session.delete(expense)
         db.session.commit()
 
@@ -101,3 +110,36 @@ class ExpenseService:
         HistoryService.add('DELETE', deleted_data)
 
         return True
+
+    @staticmethod
+    def backfill_participants(batch_size=None):
+        """
+        Fill expense_participant from the participants JSON of expenses that
+        have no rows there yet (those from before the table existed).
+        Safe to run again; commits once per batch.
+        Returns:
+            dict with expenses and rows added
+        """
+        batch_size = batch_size or ExpenseService.BACKFILL_BATCH
+        has_rows = exists().where(ExpenseParticipant.expense_id == Expense.id)
+        last_id, expenses, rows = 0, 0, 0
+        while True:
+            batch = db.session.query(Expense.id, Expense.participants).filter(
+                Expense.id > last_id, Expense.participants.isnot(None), ~has_rows
+            ).order_by(Expense.id).limit(batch_size).all()
+            if not batch:
+                break
+            last_id = batch[-1][0]
+
+            values = []
+            for expense_id, participants in batch:
+                members = dict.fromkeys(decode_participants(participants) or [])
+                values.extend({'expense_id': expense_id, 'member': member, 'position': position}
+                              for position, member in enumerate(members))
+            if values:
+                db.session.execute(ExpenseParticipant.__table__.insert(), values)
+            db.session.commit()
+            expenses += len(batch)
+            rows += len(values)
+
+        return {'expenses': expenses, 'rows': rows}
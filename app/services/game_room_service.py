@@ -3,9 +3,14 @@ GameRoomService - Business logic for game room operations.
 """
 
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy import delete, exists, or_, select, tuple_, union_all, update
+from sqlalchemy.orm import joinedload
+from sqlalchemy.exc import IntegrityError
 from app.extensions import db
 from app.models import GameRoom, GameRound, GameMatch
+from app.services.game_stats_service import GameStatsService
+from app.services.rating import RatingService
 from app.services.user_service import UserService
 from app.utils.decorators import db_retry
 
@@ -19,19 +24,27 @@ class GameRoomService:
         'paper': 'rock',
         'scissors': 'paper'
     }
+    ROOM_CODE_RETRIES = 5
 
     @staticmethod
     @db_retry(max_retries=3)
     def create_room(host_id, best_of=3):
         """Create a new game room."""
-        room = GameRoom(
-            room_code=GameRoom.generate_room_code(),
-            host_id=host_id,
-            best_of=best_of
-        )
-        db.session.add(room)
-        db.session.commit()
-        return room
+        for attempt in range(GameRoomService.ROOM_CODE_RETRIES):
+            room = GameRoom(
+                room_code=GameRoom.generate_room_code(),
+                host_id=host_id,
+                best_of=best_of
+            )
+            db.session.add(room)
+            try:
+                db.session.commit()
+                return room
+            except IntegrityError:
+                # Code already taken (key changed or counter wrapped): take the next one
+                db.session.rollback()
+                if attempt == GameRoomService.ROOM_CODE_RETRIES - 1:
+                    raise
 
     @staticmethod
     @db_retry(max_retries=3)
@@ -61,10 +74,15 @@ class GameRoomService:
     @db_retry(max_retries=3)
     def leave_room(room_id, user_id):
         """Leave a room (forfeit if game in progress)."""
-        room = GameRoom.query.get(room_id)
+        room = GameRoomService._lock_room(room_id)
         if not room:
+            db.session.rollback()
             return
 
+        # Both players' stats change on a forfeit; read them before the
+        # guest is cleared or the room deleted
+        players = [room.host_id, room.guest_id]
+        finished = None
         if room.status == 'playing':
             # Forfeit - other player wins
             if user_id == room.host_id:
@@ -73,7 +91,7 @@ class GameRoomService:
                 winner_id = room.host_id
 
             if winner_id:
-                GameRoomService.end_match(room, winner_id)
+                finished = GameRoomService.end_match(room, winner_id)
 
         # Delete room if host leaves or game not started
         if room.status == 'waiting' or user_id == room.host_id:
@@ -83,6 +101,8 @@ class GameRoomService:
             room.status = 'waiting'
 
         db.session.commit()
+        if finished:
+            UserService.invalidate_profiles(players)
 
     @staticmethod
     @db_retry(max_retries=3)
@@ -92,15 +112,37 @@ class GameRoomService:
         if not room:
             return None
 
+        round_obj = GameRoomService._next_round(room)
+        db.session.commit()
+        return round_obj
+
+    @staticmethod
+    def _next_round(room):
+        """Advance the room to a new round (no commit)."""
         room.current_round += 1
         round_obj = GameRound(
-            room_id=room_id,
+            room_id=room.id,
             round_number=room.current_round
         )
         db.session.add(round_obj)
-        db.session.commit()
         return round_obj
 
+    @staticmethod
+    def _lock_room(room_id):
+        """
+        Load a room for update, locking its row until the transaction ends.
+        PostgreSQL takes the row lock with SELECT ... FOR UPDATE. SQLite has
+        no row locks (FOR UPDATE is dropped) and starts transactions lazily,
+        so a no-op UPDATE first takes the database write lock; every read
+        after it sees the latest committed state.
+        """
+        if db.session.get_bind().dialect.name == 'sqlite':
+            db.session.execute(
+                update(GameRoom).where(GameRoom.id == room_id).values(id=GameRoom.id)
+            )
+        return GameRoom.query.filter_by(id=room_id) \
+            .with_for_update().populate_existing().first()
+
     @staticmethod
     @db_retry(max_retries=3)
     def get_current_round(room_id):
@@ -115,47 +157,76 @@ class GameRoomService:
         ).first()
 
     @staticmethod
+    @db_retry(max_retries=3)
     def make_choice(room_id, user_id, choice):
-        """Player makes a choice for current round."""
+        """
+        Player makes a choice for current round.
+
+        Runs as a single transaction: the room and round rows are locked,
+        the choice is stored and, once both players have chosen, the round
+        is resolved and the next round created or the match recorded, with
+        one commit at the end. Concurrent submissions for the same room
+        queue on the room lock instead of racing.
+        """
         choice = choice.lower()
         if choice not in GameRoomService.VALID_CHOICES:
             raise ValueError('Lựa chọn không hợp lệ')
 
-        room = GameRoom.query.get(room_id)
-        if not room or room.status != 'playing':
-            raise ValueError('Trò chơi chưa bắt đầu')
-
-        # Get current round
-        current_round = GameRound.query.filter_by(
-            room_id=room_id,
-            round_number=room.current_round
-        ).first()
-
-        if not current_round:
-            raise ValueError('Không có lượt đang hoạt động')
+        try:
+            room = GameRoomService._lock_room(room_id)
+            if not room or room.status != 'playing':
+                raise ValueError('Trò chơi chưa bắt đầu')
+
+            # Get current round
+            current_round = GameRound.query.filter_by(
+                room_id=room_id,
+                round_number=room.current_round
+            ).with_for_update().populate_existing().first()
+
+            if not current_round:
+                raise ValueError('Không có lượt đang hoạt động')
+            players = [room.host_id, room.guest_id]
+
+            # Set choice
+            is_host = user_id == room.host_id
+            if is_host:
+                if current_round.host_choice:
+                    raise ValueError('Bạn đã chọn rồi')
+                current_round.host_choice = choice
+            else:
+                if current_round.guest_choice:
+                    raise ValueError('Bạn đã chọn rồi')
+                current_round.guest_choice = choice
 
-        # Set choice
-        is_host = user_id == room.host_id
-        if is_host:
-            if current_round.host_choice:
-                raise ValueError('Bạn đã chọn rồi')
-            current_round.host_choice = choice
-        else:
-            if current_round.guest_choice:
-                raise ValueError('Bạn đã chọn rồi')
-            current_round.guest_choice = choice
+            # Check if round is complete
+            if current_round.host_choice and current_round.guest_choice:
+                result = GameRoomService.resolve_round(room, current_round)
+            else:
+                result = {'status': 'waiting'}
 
-        db.session.commit()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
 
-        # Check if round is complete
-        if current_round.host_choice and current_round.guest_choice:
-            return GameRoomService.resolve_round(room, current_round)
+        if result['status'] == 'match_complete':
+            UserService.invalidate_profiles(players)
 
-        return {'status': 'waiting', 'round': current_round.to_dict()}
+        # Serialize after the commit so ids and defaults are loaded
+        if result['status'] == 'waiting':
+            return {'status': 'waiting', 'round': current_round.to_dict()}
+        result['round'] = current_round.to_dict(reveal=True)
+        result['room'] = room.to_dict()
+        if result['status'] == 'match_complete':
+            result['match_id'] = result.pop('match').id
+        return result
 
     @staticmethod
     def resolve_round(room, round_obj):
-        """Resolve a round and determine winner."""
+        """
+        Resolve a round and determine winner, then advance to the next round
+        or end the match. Part of the caller's transaction (no commit).
+        """
         host_choice = round_obj.host_choice
         guest_choice = round_obj.guest_choice
 
@@ -169,7 +240,6 @@ class GameRoomService:
             room.guest_score += 1
 
         round_obj.completed_at = datetime.utcnow()
-        db.session.commit()
 
         # Check if match is over
         wins_needed = (room.best_of // 2) + 1
@@ -179,17 +249,17 @@ class GameRoomService:
             return GameRoomService.end_match(room, room.guest_id)
 
         # Create next round
-        GameRoomService.create_round(room.id)
+        GameRoomService._next_round(room)
 
-        return {
-            'status': 'round_complete',
-            'round': round_obj.to_dict(reveal=True),
-            'room': room.to_dict()
-        }
+        return {'status': 'round_complete'}
 
     @staticmethod
     def end_match(room, winner_id):
-        """End the match and save to history."""
+        """
+        End the match: record it and update both players' stats, ratings and
+        rollups. Part of the caller's transaction (no commit); the caller
+        invalidates the players' cached profiles after committing.
+        """
         room.status = 'finished'
 
         # Collect round data
@@ -209,21 +279,16 @@ class GameRoomService:
         )
         db.session.add(match)
 
-        # Update user stats
-        if winner_id == room.host_id:
-            UserService.update_stats(room.host_id, 'win')
-            UserService.update_stats(room.guest_id, 'loss')
-        else:
-            UserService.update_stats(room.guest_id, 'win')
-            UserService.update_stats(room.host_id, 'loss')
-
-        db.session.commit()
+        # Update ratings and user stats
+        loser_id = room.guest_id if winner_id == room.host_id else room.host_id
+        rating_changes = RatingService.rate_matches([(room.host_id, room.guest_id, winner_id)])
+        GameStatsService.record_matches([(room.host_id, room.guest_id, winner_id, rounds_data)])
+        UserService.record_result(winner_id, loser_id, commit=False, rating_changes=rating_changes)
 
         return {
             'status': 'match_complete',
             'winner_id': winner_id,
-            'room': room.to_dict(),
-            'match_id': match.id
+            'match': match
         }
 
     @staticmethod
@@ -235,12 +300,69 @@ class GameRoomService:
         return GameRoom.query.get(room_id)
 
     @staticmethod
-    def get_user_match_history(user_id, limit=20):
-        """Get match history for a user."""
-        from sqlalchemy import or_
-        return GameMatch.query.filter(
-            or_(
-                GameMatch.player1_id == user_id,
-                GameMatch.player2_id == user_id
-            )
-        ).order_by(GameMatch.ended_at.desc()).limit(limit).all()
+    def get_user_match_history(user_id, limit=20, before=None):
+        """
+        Get a page of match history for a user, newest first.
+        Args:
+            user_id: Player
+            limit: Page size
+            before: (ended_at, id) of the last match of the previous page
+        Returns:
+            List of GameMatch with player1 and player2 loaded
+
+        Keyset pagination: each side of the OR is its own range scan on the
+        (player, ended_at, id) index, capped at limit, so a page costs the
+        same however deep it is. Players are joined in the same query.
+        """
+        sides = []
+        for column in (GameMatch.player1_id, GameMatch.player2_id):
+            side = select(GameMatch.id, GameMatch.ended_at).where(column == user_id)
+            if before:
+                side = side.where(tuple_(GameMatch.ended_at, GameMatch.id) < tuple_(*before))
+            side = side.order_by(GameMatch.ended_at.desc(), GameMatch.id.desc()).limit(limit).subquery()
+            sides.append(select(side.c.id))
+
+        return GameMatch.query.options(
+            joinedload(GameMatch.player1),
+            joinedload(GameMatch.player2)
+        ).filter(
+            GameMatch.id.in_(union_all(*sides))
+        ).order_by(GameMatch.ended_at.desc(), GameMatch.id.desc()).limit(limit).all()
+
+    @staticmethod
+    def reap_stale_rooms(max_age, batch_size=500, max_batches=20):
+        """
+        Delete rooms (and their rounds) that nobody will come back to:
+        created more than max_age seconds ago and either waiting, finished
+        (the match is kept in game_match) or playing without a round created
+        or completed within max_age. Works in batches of batch_size rooms,
+        one commit each, and stops after max_batches so a backlog is
+        cleared over several runs.
+        Returns:
+            Number of rows deleted (rooms + rounds)
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=max_age)
+        recent_round = exists().where(
+            GameRound.room_id == GameRoom.id,
+            or_(GameRound.created_at >= cutoff, GameRound.completed_at >= cutoff)
+        )
+        stale = select(GameRoom.id).where(
+            GameRoom.created_at < cutoff,
+            or_(GameRoom.status != 'playing', ~recent_round)
+        ).order_by(GameRoom.created_at).limit(batch_size)
+
+        deleted = 0
+        for _ in range(max_batches):
+            room_ids = db.session.execute(stale).scalars().all()
+            if not room_ids:
+                break
+            deleted += db.session.execute(
+                delete(GameRound).where(GameRound.room_id.in_(room_ids))
+                .execution_options(synchronize_session=False)).rowcount
+            deleted += db.session.execute(
+                delete(GameRoom).where(GameRoom.id.in_(room_ids))
+                .execution_options(synchronize_session=False)).rowcount
+            db.session.commit()
+            if len(room_ids) < batch_size:
+                break
+        return deleted
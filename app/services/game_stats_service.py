@@ -0,0 +1,150 @@
+"""
+GameStatsService - Per-player rollups of match history.
+
+Streaks, head-to-head records and choice counts are kept in
+game_player_stats / game_head_to_head and updated in the transaction that
+records each match, so reading them never touches game_match or parses
+rounds_data. backfill() rebuilds them from the existing matches:
+
+    python backfill_game_stats.py
+"""
+
+import json
+import time
+from sqlalchemy import delete, select, tuple_
+from app.extensions import db
+from app.models import GameMatch, User, PlayerStats, HeadToHead
+
+
+class GameStatsService:
+    """Service class for derived game statistics."""
+
+    BACKFILL_BATCH = 5000  # Matches read per query in backfill()
+    HEAD_TO_HEAD_LIMIT = 10  # Most frequent opponents in get_user_stats()
+
+    @staticmethod
+    def _apply(stats, pairs, match):
+        """
+        Fold one match into the rollups.
+        Args:
+            stats: {user_id: PlayerStats} of both players
+            pairs: {(user_id, opponent_id): HeadToHead} for both directions
+            match: (player1_id, player2_id, winner_id, rounds); rounds as in
+                rounds_data (host = player1)
+        """
+        player1_id, player2_id, winner_id, rounds = match
+        for user_id, opponent_id, side in ((player1_id, player2_id, 'host'), (player2_id, player1_id, 'guest')):
+            won = None if winner_id is None else winner_id == user_id
+            player = stats[user_id]
+            player.record_result(won)
+            for r in rounds:
+                player.record_choice(r.get(f'{side}_choice'))
+            if won is not None:
+                pair = pairs[(user_id, opponent_id)]
+                if won:
+                    pair.wins += 1
+                else:
+                    pair.losses += 1
+
+    @staticmethod
+    def record_matches(matches):
+        """
+        Update the rollups for finished matches, in order. Part of the
+        caller's transaction (no commit). Call it after
+        RatingService.rate_matches, whose row locks on the players also
+        serialize concurrent updates of their rollups.
+        Args:
+            matches: [(player1_id, player2_id, winner_id, rounds)]
+        """
+        user_ids = {uid for p1, p2, _, _ in matches for uid in (p1, p2)}
+        keys = {key for p1, p2, _, _ in matches for key in ((p1, p2), (p2, p1))}
+
+        stats = {s.user_id: s for s in PlayerStats.query.filter(PlayerStats.user_id.in_(user_ids))}
+        pairs = {(h.user_id, h.opponent_id): h for h in HeadToHead.query.filter(
+            tuple_(HeadToHead.user_id, HeadToHead.opponent_id).in_(keys))}
+        for user_id in user_ids - stats.keys():
+            stats[user_id] = PlayerStats.empty(user_id)
+            db.session.add(stats[user_id])
+        for key in keys - pairs.keys():
+            pairs[key] = HeadToHead.empty(*key)
+            db.session.add(pairs[key])
+
+        for match in matches:
+            GameStatsService._apply(stats, pairs, match)
+
+    @staticmethod
+    def get_user_stats(user_id, opponent_id=None):
+        """
+        Streaks, choice counts and head-to-head records of a player, read
+        by primary key from the rollup tables.
+        Returns:
+            dict, with 'versus' (record against opponent_id) if given
+        """
+        stats = db.session.get(PlayerStats, user_id) or PlayerStats.empty(user_id)
+        data = stats.to_dict()
+
+        opponents = db.session.query(HeadToHead, User.username).join(
+            User, User.id == HeadToHead.opponent_id
+        ).filter(HeadToHead.user_id == user_id).order_by(
+            (HeadToHead.wins + HeadToHead.losses).desc(), HeadToHead.opponent_id
+        ).limit(GameStatsService.HEAD_TO_HEAD_LIMIT)
+        data['head_to_head'] = [dict(h.to_dict(), opponent_username=username) for h, username in opponents]
+
+        if opponent_id is not None:
+            pair = db.session.get(HeadToHead, (user_id, opponent_id)) or HeadToHead.empty(user_id, opponent_id)
+            data['versus'] = pair.to_dict()
+        return data
+
+    @staticmethod
+    def backfill(batch_size=None):
+        """
+        Rebuild the rollups from all matches in (ended_at, id) order, reading
+        batch_size matches per query, and replace the tables in one commit.
+        Matches recorded while it runs are lost, so run it when the game is
+        quiet.
+        Returns:
+            dict with counts and timing
+        """
+        batch_size = batch_size or GameStatsService.BACKFILL_BATCH
+        start = time.perf_counter()
+        stats, pairs = {}, {}
+        matches = batches = 0
+        after = None
+
+        while True:
+            query = select(
+                GameMatch.id, GameMatch.ended_at, GameMatch.player1_id, GameMatch.player2_id,
+                GameMatch.winner_id, GameMatch.rounds_data
+            ).order_by(GameMatch.ended_at, GameMatch.id).limit(batch_size)
+            if after is not None:
+                query = query.where(tuple_(GameMatch.ended_at, GameMatch.id) > tuple_(*after))
+            rows = db.session.execute(query).all()
+            if not rows:
+                break
+
+            for _, _, player1_id, player2_id, winner_id, rounds_data in rows:
+                for user_id, opponent_id in ((player1_id, player2_id), (player2_id, player1_id)):
+                    if user_id not in stats:
+                        stats[user_id] = PlayerStats.empty(user_id)
+                    if (user_id, opponent_id) not in pairs:
+                        pairs[(user_id, opponent_id)] = HeadToHead.empty(user_id, opponent_id)
+                rounds = json.loads(rounds_data) if rounds_data else []
+                GameStatsService._apply(stats, pairs, (player1_id, player2_id, winner_id, rounds))
+
+            matches += len(rows)
+            batches += 1
+            after = (rows[-1].ended_at, rows[-1].id)
+
+        db.session.execute(delete(HeadToHead))
+        db.session.execute(delete(PlayerStats))
+        db.session.add_all(stats.values())
+        db.session.add_all(pairs.values())
+        db.session.commit()
+
+        return {
+            'matches': matches,
+            'batches': batches,
+            'players': len(stats),
+            'head_to_head_rows': len(pairs),
+            'seconds': round(time.perf_counter() - start, 3)
+        }
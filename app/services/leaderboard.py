@@ -0,0 +1,194 @@
+"""
+Leaderboard - In-memory ranking of players, kept in step with their stats.
+
+Players are kept in one RankIndex per order (ORDERS: by wins, by rating),
+so top-K, rank-of-user and page-around-user are O(log n) with no table
+scan. The indexes are loaded from the database at startup (scans of
+ix_game_user_leaderboard and ix_game_user_rating) and updated after every
+commit that changes a player's stats or rating: UserService and
+RatingService record the new values in the session, and an after_commit
+hook applies them.
+
+Each gunicorn worker has its own copy and only sees its own commits
+directly. Every LEADERBOARD_RESYNC seconds the scheduler's per-worker
+'resync_leaderboard' job reads back the players whose last_active moved
+since the previous sync (ix_game_user_last_active; every stats update sets
+it) to pick up the other workers' matches. Requests never reload.
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event
+from app.extensions import db
+from app.utils.ranking import RankIndex
+
+PENDING_KEY = 'leaderboard_pending'
+
+# Order name -> key of a player's (user_id, wins, losses, rating); smaller ranks higher
+ORDERS = {
+    'wins': lambda user_id, wins, losses, rating: (-(wins or 0), losses or 0, user_id),
+    'rating': lambda user_id, wins, losses, rating: (-(rating or 0), user_id),
+}
+DEFAULT_ORDER = 'wins'
+
+# Resyncs re-read this far before the previous one started, so a commit
+# stamped before that sync but committed after it is still picked up
+RESYNC_OVERLAP = timedelta(seconds=30)
+
+
+class Leaderboard:
+    """Rank indexes of all players for one app (see module docstring)."""
+
+    def __init__(self, resync_interval=60):
+        self.resync_interval = resync_interval
+        self._indexes = {order: RankIndex() for order in ORDERS}
+        self._keys = {order: {} for order in ORDERS}  # {order: {user_id: key}}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()  # One load or resync at a time
+        self._loaded_at = None
+        self._synced_since = None  # last_active from which the next resync reads
+        self.loads = 0
+        self.updates = 0
+        self.resyncs = 0
+        self.resynced_players = 0
+        self.last_load_ms = None
+        self.last_resync_ms = None
+
+    def load(self):
+        """(Re)build the indexes from the database. Needs an app context."""
+        from app.models import User
+
+        with self._load_lock:
+            start = time.perf_counter()
+            synced_since = datetime.utcnow() - RESYNC_OVERLAP
+            # Each query reads its order's index front to back, so keys arrive sorted
+            by_wins = db.session.query(User.id, User.total_wins, User.total_losses).order_by(
+                User.total_wins.desc(), User.total_losses, User.id)
+            by_rating = db.session.query(User.id, User.rating).order_by(User.rating.desc(), User.id)
+            keys = {
+                'wins': {uid: ORDERS['wins'](uid, wins, losses, None) for uid, wins, losses in by_wins},
+                'rating': {uid: ORDERS['rating'](uid, None, None, rating) for uid, rating in by_rating},
+            }
+            indexes = {order: RankIndex(keys[order].values()) for order in ORDERS}
+            with self._lock:
+                self._indexes, self._keys = indexes, keys
+                self._loaded_at = time.monotonic()
+                self.loads += 1
+                self.last_load_ms = (time.perf_counter() - start) * 1000
+            self._synced_since = synced_since
+
+    def resync(self):
+        """
+        Apply the current totals and rating of players active since the
+        previous load or resync, e.g. after other workers' matches. Runs
+        from the scheduler; readers keep using the indexes meanwhile.
+        Returns:
+            Number of players read back
+        """
+        from app.models import User
+
+        if self._synced_since is None:
+            self.load()
+            return len(self._keys[DEFAULT_ORDER])
+
+        with self._load_lock:
+            start = time.perf_counter()
+            synced_since = datetime.utcnow() - RESYNC_OVERLAP
+            rows = db.session.query(User.id, User.total_wins, User.total_losses, User.rating).filter(
+                User.last_active >= self._synced_since).all()
+            for row in rows:
+                self.update(*row, count=False)
+            self._synced_since = synced_since
+            self.resyncs += 1
+            self.resynced_players += len(rows)
+            self.last_resync_ms = (time.perf_counter() - start) * 1000
+        return len(rows)
+
+    def update(self, user_id, wins, losses, rating, count=True):
+        """Move a player to the positions of their new totals and rating."""
+        with self._lock:
+            for order, key_of in ORDERS.items():
+                key, keys = key_of(user_id, wins, losses, rating), self._keys[order]
+                old = keys.get(user_id)
+                if old == key:
+                    continue
+                if old is not None:
+                    self._indexes[order].discard(old)
+                self._indexes[order].add(key)
+                keys[user_id] = key
+            if count:
+                self.updates += 1
+
+    def top(self, limit, offset=0, order=DEFAULT_ORDER):
+        """User ids ranked offset+1 .. offset+limit."""
+        with self._lock:
+            return [key[-1] for key in self._indexes[order].slice(offset, offset + limit)]
+
+    def rank(self, user_id, order=DEFAULT_ORDER):
+        """1-based rank of a player, or None if unknown."""
+        with self._lock:
+            key = self._keys[order].get(user_id)
+            return self._indexes[order].rank(key) + 1 if key is not None else None
+
+    def around(self, user_id, limit, order=DEFAULT_ORDER):
+        """
+        A page of limit players with user_id as close to the middle as the
+        ends of the ranking allow.
+        Returns:
+            (offset of the page, [user_id]) or (None, []) if unknown
+        """
+        with self._lock:
+            key = self._keys[order].get(user_id)
+            if key is None:
+                return None, []
+            index = self._indexes[order]
+            offset = max(0, min(index.rank(key) - limit // 2, len(index) - limit))
+            return offset, [k[-1] for k in index.slice(offset, offset + limit)]
+
+    def count(self):
+        with self._lock:
+            return len(self._keys[DEFAULT_ORDER])
+
+    def stats(self):
+        with self._lock:
+            return {
+                'players': len(self._keys[DEFAULT_ORDER]),
+                'orders': list(ORDERS),
+                'loads': self.loads,
+                'updates': self.updates,
+                'resyncs': self.resyncs,
+                'resynced_players': self.resynced_players,
+                'last_load_ms': round(self.last_load_ms, 2) if self.last_load_ms is not None else None,
+                'last_resync_ms': round(self.last_resync_ms, 2) if self.last_resync_ms is not None else None,
+                'age_seconds': round(time.monotonic() - self._loaded_at, 1) if self._loaded_at else None,
+                'resync_interval': self.resync_interval
+            }
+
+
+def record_stats(user):
+    """Queue a player's current totals and rating for the leaderboard at the next commit."""
+    record_values(user.id, user.total_wins, user.total_losses, user.rating)
+
+
+def record_values(user_id, wins, losses, rating):
+    """record_stats() for values read without loading the User (e.g. UPDATE ... RETURNING)."""
+    db.session.info.setdefault(PENDING_KEY, {})[user_id] = (wins, losses, rating)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_pending(session):
+    pending = session.info.pop(PENDING_KEY, None)
+    if not pending:
+        return
+    leaderboard = current_app.extensions.get('leaderboard')
+    if leaderboard is None:
+        return
+    for user_id, values in pending.items():
+        leaderboard.update(user_id, *values)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _drop_pending(session):
+    session.info.pop(PENDING_KEY, None)
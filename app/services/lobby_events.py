@@ -0,0 +1,128 @@
+"""
+Lobby events - Fan-out of the lobby event log to open /events streams.
+
+One dispatcher thread per process follows the store's event log (woken at
+once by this process's publishes, re-reading it every poll_interval for
+the other workers') and queues each event on the streams of its
+recipients. A stream only waits on its own queue, so an idle stream costs
+a queue plus, under the gevent workers of gunicorn.conf.py, a greenlet
+rather than a request thread. Streams are capped per process by
+LOBBY_EVENTS_MAX_STREAMS, separately from the room long polls.
+"""
+
+import collections
+import threading
+import time
+from app.services.lobby_store import EVENT_LOG_SIZE
+
+
+class EventStream:
+    """Queue of events for one open /events connection."""
+
+    def __init__(self, user_id, after_seq):
+        self.user_id = user_id
+        self.after_seq = after_seq  # Last event queued
+        # A client that stops reading loses its oldest events, as the log would
+        self._events = collections.deque(maxlen=EVENT_LOG_SIZE)
+        self._cond = threading.Condition()
+
+    def push(self, seq, event_type, data):
+        with self._cond:
+            if seq > self.after_seq:
+                self.after_seq = seq
+                self._events.append((seq, event_type, data))
+                self._cond.notify()
+
+    def wait(self, timeout):
+        """Take the queued events, waiting up to timeout for one. [] on timeout."""
+        with self._cond:
+            if not self._events:
+                self._cond.wait(timeout)
+            events = list(self._events)
+            self._events.clear()
+            return events
+
+
+class EventHub:
+    """The open event streams of one process and their dispatcher thread."""
+
+    WAIT = 5.0  # Longest single wait of the dispatcher on the store's log
+
+    def __init__(self, store, max_streams=500):
+        self.store = store
+        self.max_streams = max_streams
+        self._lock = threading.Lock()
+        self._streams = {}  # {user_id: {EventStream}}
+        self._count = 0
+        self._cursor = None  # Last event seq dispatched
+        self._thread = None
+        self.dispatched = 0
+
+    def subscribe(self, user_id, after_seq):
+        """
+        Open a stream of user_id's events newer than after_seq.
+        Returns:
+            EventStream, or None if max_streams are already open
+        """
+        with self._lock:
+            if self._count >= self.max_streams:
+                return None
+            if self._cursor is None:
+                self._cursor = self.store.last_event_seq()
+
+            stream = EventStream(user_id, after_seq)
+            if after_seq < self._cursor:
+                # Catch up (Last-Event-ID) to where the dispatcher takes over
+                _, missed = self.store.get_events(after_seq, user_id)
+                for seq, event_type, data in missed:
+                    if seq <= self._cursor:
+                        stream.push(seq, event_type, data)
+
+            self._streams.setdefault(user_id, set()).add(stream)
+            self._count += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='lobby-events', daemon=True)
+                self._thread.start()
+            return stream
+
+    def unsubscribe(self, stream):
+        """Close a stream (safe to call twice)."""
+        with self._lock:
+            streams = self._streams.get(stream.user_id)
+            if streams and stream in streams:
+                streams.discard(stream)
+                self._count -= 1
+                if not streams:
+                    del self._streams[stream.user_id]
+
+    def dispatch(self, timeout):
+        """Queue the log's new events on their streams, waiting up to timeout for some."""
+        last_seq, events = self.store.wait_for_event_log(self._cursor, timeout)
+        with self._lock:
+            for seq, targets, event_type, data in events:
+                if targets is None:
+                    recipients = self._streams.values()
+                else:
+                    recipients = [self._streams[uid] for uid in targets if uid in self._streams]
+                for streams in recipients:
+                    for stream in streams:
+                        stream.push(seq, event_type, data)
+            self._cursor = max(self._cursor, last_seq)
+            self.dispatched += len(events)
+
+    def _run(self):
+        while True:
+            try:
+                self.dispatch(self.WAIT)
+            except Exception as e:
+                print(f"Lobby event dispatch failed: {e}")
+                time.sleep(self.WAIT)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'streams': self._count,
+                'max_streams': self.max_streams,
+                'users': len(self._streams),
+                'dispatched': self.dispatched
+            }
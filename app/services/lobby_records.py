@@ -0,0 +1,168 @@
+"""
+Lobby records - Compact in-memory representations of lobby entries.
+
+MemoryLobbyStore keeps slotted records instead of dicts of dicts: choices,
+results and statuses are small enums and a room's rounds are packed one
+byte per round. The store API still speaks dicts; records convert at the
+boundary (from_dict / to_dict), so the lobby routes and the SQLite store
+are unaffected.
+"""
+
+from array import array
+from dataclasses import dataclass, field
+from enum import IntEnum
+
+# Distinct sets of changed field names; identical sets share one tuple
+_FIELD_SETS = {}
+
+
+class Choice(IntEnum):
+    NONE = 0
+    ROCK = 1
+    PAPER = 2
+    SCISSORS = 3
+
+
+class RoundResult(IntEnum):
+    DRAW = 0
+    HOST = 1
+    GUEST = 2
+
+
+class RoomStatus(IntEnum):
+    WAITING = 0
+    PLAYING = 1
+    FINISHED = 2
+
+
+def _encode(enum, name):
+    return enum[name.upper()] if name else enum(0)
+
+
+def _decode(value):
+    return value.name.lower() if value else None
+
+
+def _field_set(names):
+    names = tuple(names)
+    return _FIELD_SETS.setdefault(names, names)
+
+
+@dataclass(slots=True)
+class PresenceRecord:
+    username: str
+    avatar_url: str
+    last_seen: float
+
+
+@dataclass(slots=True)
+class RedirectRecord:
+    room_code: str
+    timestamp: float
+
+    def to_dict(self):
+        return {'room_code': self.room_code, 'timestamp': self.timestamp}
+
+
+@dataclass(slots=True)
+class InviteRecord:
+    from_user_id: int
+    from_username: str
+    from_avatar: str
+    to_user_id: int
+    best_of: int
+    timestamp: float
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['from_user_id'], data['from_username'], data.get('from_avatar'),
+                   data['to_user_id'], data['best_of'], data['timestamp'])
+
+    def to_dict(self):
+        return {
+            'from_user_id': self.from_user_id,
+            'from_username': self.from_username,
+            'from_avatar': self.from_avatar,
+            'to_user_id': self.to_user_id,
+            'best_of': self.best_of,
+            'timestamp': self.timestamp
+        }
+
+
+@dataclass(slots=True)
+class RoomRecord:
+    """
+    A game room. Rounds are numbered 1..n in play order, so each one is
+    stored as a single byte: host choice << 4 | guest choice << 2 | result.
+    changes holds (seq, field names, rounds_from) tuples for ?after_seq=
+    deltas; the field-name tuples are shared between rooms.
+    """
+    room_code: str
+    host_id: int
+    host_username: str
+    guest_id: int
+    guest_username: str
+    best_of: int
+    host_score: int
+    guest_score: int
+    current_round: int
+    host_choice: Choice
+    guest_choice: Choice
+    status: RoomStatus
+    created_at: float
+    last_update: float
+    winner_id: int = None
+    seq: int = 0
+    rounds: array = field(default_factory=lambda: array('B'))
+    changes: list = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data):
+        rounds = array('B', (
+            _encode(Choice, r['host_choice']) << 4
+            | _encode(Choice, r['guest_choice']) << 2
+            | _encode(RoundResult, r['result'])
+            for r in data['rounds']
+        ))
+        return cls(
+            data.get('room_code'), data['host_id'], data['host_username'],
+            data['guest_id'], data['guest_username'], data['best_of'],
+            data['host_score'], data['guest_score'], data['current_round'],
+            _encode(Choice, data['host_choice']), _encode(Choice, data['guest_choice']),
+            _encode(RoomStatus, data['status']), data['created_at'], data['last_update'],
+            data.get('winner_id'), data.get('seq', 0), rounds,
+            [(c['seq'], _field_set(c['fields']), c['rounds_from']) for c in data.get('changes', ())]
+        )
+
+    def to_dict(self):
+        return {
+            'room_code': self.room_code,
+            'host_id': self.host_id,
+            'host_username': self.host_username,
+            'guest_id': self.guest_id,
+            'guest_username': self.guest_username,
+            'best_of': self.best_of,
+            'host_score': self.host_score,
+            'guest_score': self.guest_score,
+            'current_round': self.current_round,
+            'host_choice': _decode(self.host_choice),
+            'guest_choice': _decode(self.guest_choice),
+            'status': self.status.name.lower(),
+            'created_at': self.created_at,
+            'last_update': self.last_update,
+            'winner_id': self.winner_id,
+            'seq': self.seq,
+            'rounds': [
+                {
+                    'round': number,
+                    'host_choice': _decode(Choice(packed >> 4)),
+                    'guest_choice': _decode(Choice(packed >> 2 & 3)),
+                    'result': RoundResult(packed & 3).name.lower()
+                }
+                for number, packed in enumerate(self.rounds, 1)
+            ],
+            'changes': [
+                {'seq': seq, 'fields': list(fields), 'rounds_from': rounds_from}
+                for seq, fields, rounds_from in self.changes
+            ]
+        }
@@ -0,0 +1,1207 @@
+"""
+Lobby store - Shared state backend for the polling lobby.
+
+The lobby keeps presence, invites, accepted-invite redirects and game rooms
+outside the main database. Gunicorn runs several worker processes, so every
+lobby route goes through a LobbyStore instead of module-level dicts:
+
+- MemoryLobbyStore: compact records in the current process (single worker,
+  tests), with an optional memory budget.
+- SQLiteLobbyStore: a SQLite file in WAL mode on local disk, shared by all
+  workers on the same host.
+"""
+
+import collections
+import heapq
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from app.services.lobby_records import (
+    PresenceRecord, RedirectRecord, InviteRecord, RoomRecord, RoomStatus
+)
+
+# Constants
+ONLINE_TIMEOUT = 30  # seconds - user considered offline after this
+INVITE_TIMEOUT = 60  # seconds
+REDIRECT_TIMEOUT = 60  # seconds an unclaimed redirect is kept
+ROOM_TIMEOUT = 3600  # 1 hour
+LONGPOLL_MAX_WAIT = 25  # seconds a room state request may be held
+MAX_INVITES_PER_SENDER = 5  # outstanding invites one user may have sent
+EVENT_LOG_SIZE = 1000  # events kept for /events streams catching up
+EVENT_TIMEOUT = 120  # seconds an event stays in the log
+PRESENCE_LOG_SIZE = 256  # presence changes kept for /online?since_version= diffs
+
+
+class LobbyFull(Exception):
+    """Raised when the store's memory budget has no room for another entry."""
+
+
+class TooManyInvites(Exception):
+    """Raised when the sender already has the most pending invites allowed."""
+
+
+def _deep_size(obj, seen):
+    """sys.getsizeof of obj plus everything it references, each object once."""
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(key, seen) + _deep_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, collections.deque)):
+        size += sum(_deep_size(item, seen) for item in obj)
+    else:
+        for name in getattr(type(obj), '__slots__', ()):
+            if hasattr(obj, name):
+                size += _deep_size(getattr(obj, name), seen)
+    return size
+
+
+class LobbyStore:
+    """Interface for lobby state. All lobby routes go through these methods."""
+
+    # Seconds between re-reads while a long poll waits. Changes made by this
+    # process wake waiters at once; this bounds the delay for other workers.
+    poll_interval = 1.0
+
+    def __init__(self, max_waiters=12):
+        # Room long polls hold a request (a thread, or a greenlet under
+        # gevent), so only this many may wait at once. /events streams have
+        # their own cap (EventHub)
+        self._waiter_slots = threading.BoundedSemaphore(max_waiters)
+        self._conditions = {}
+        self._conditions_lock = threading.Lock()
+        self._events_cond = threading.Condition()
+
+    def acquire_waiter(self):
+        """Reserve a waiter slot without blocking. Returns False if none is free."""
+        return self._waiter_slots.acquire(blocking=False)
+
+    def release_waiter(self):
+        self._waiter_slots.release()
+
+    def _room_condition(self, room_code):
+        """Get (or create) the condition signalled when a room changes."""
+        with self._conditions_lock:
+            cond = self._conditions.get(room_code)
+            if cond is None:
+                cond = self._conditions[room_code] = threading.Condition()
+            return cond
+
+    def _notify_room(self, room_code, removed=False):
+        """Wake requests waiting on a room."""
+        with self._conditions_lock:
+            cond = self._conditions.pop(room_code, None) if removed \
+                else self._conditions.get(room_code)
+        if cond is not None:
+            with cond:
+                cond.notify_all()
+
+    def _prune_conditions(self):
+        """
+        Drop the conditions of rooms that no longer exist. A room deleted by
+        another worker's sweep is never _notify_room(removed=True)'d here.
+        """
+        with self._conditions_lock:
+            codes = list(self._conditions)
+        for room_code in codes:
+            if self.get_room(room_code) is None:
+                self._notify_room(room_code, removed=True)
+
+    def wait_for_room_change(self, room_code, since, timeout, field='last_update'):
+        """
+        Block until the room's field (last_update or seq) differs from since.
+        Args:
+            room_code: Room to watch
+            since: Value of field the client already has
+            timeout: Maximum seconds to wait
+            field: Room field to compare
+        Returns:
+            The room (changed or not once timeout passes), or None if it is gone
+        """
+        if not self.acquire_waiter():
+            # Every waiter slot is busy: answer now, the client polls again
+            return self.get_room(room_code)
+
+        try:
+            deadline = time.monotonic() + timeout
+            cond = self._room_condition(room_code)
+            with cond:
+                while True:
+                    room = self.get_room(room_code)
+                    if room is None:
+                        with self._conditions_lock:
+                            if self._conditions.get(room_code) is cond:
+                                del self._conditions[room_code]
+                        return None
+                    if room[field] != since:
+                        return room
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return room
+                    cond.wait(min(remaining, self.poll_interval))
+        finally:
+            self.release_waiter()
+
+    def _notify_events(self):
+        with self._events_cond:
+            self._events_cond.notify_all()
+
+    def wait_for_event_log(self, after_seq, timeout):
+        """
+        Block until the event log has events newer than after_seq, for any
+        recipient (the EventHub dispatcher follows the log with this).
+        Returns:
+            (last_seq, events) as for get_event_log; events is empty on timeout
+        """
+        deadline = time.monotonic() + timeout
+        with self._events_cond:
+            while True:
+                last_seq, events = self.get_event_log(after_seq)
+                remaining = deadline - time.monotonic()
+                if events or remaining <= 0:
+                    return last_seq, events
+                after_seq = last_seq
+                self._events_cond.wait(min(remaining, self.poll_interval))
+
+    # ---- Events ----
+
+    def publish(self, event_type, data, user_ids=None):
+        """
+        Append an event to the lobby event log.
+        Args:
+            event_type: 'online', 'offline', 'invite', 'redirect', 'room', ...
+            data: JSON-serializable payload
+            user_ids: Recipients, or None to broadcast to everyone
+        """
+        raise NotImplementedError
+
+    def get_events(self, after_seq, user_id):
+        """
+        Return (last_seq, events) where events is a list of
+        (seq, event_type, data) newer than after_seq visible to user_id.
+        """
+        raise NotImplementedError
+
+    def get_event_log(self, after_seq):
+        """
+        Return (last_seq, events) where events is a list of
+        (seq, targets, event_type, data) newer than after_seq, for all
+        recipients; targets is a set of user ids or None (everyone).
+        """
+        raise NotImplementedError
+
+    def last_event_seq(self):
+        raise NotImplementedError
+
+    # ---- Presence ----
+
+    def touch_user(self, user_id, username, avatar_url):
+        """Mark a user as online (or refresh their last_seen). Publishes 'online'."""
+        raise NotImplementedError
+
+    def remove_user(self, user_id):
+        """Mark a user as offline. Publishes 'offline'."""
+        raise NotImplementedError
+
+    def is_online(self, user_id):
+        raise NotImplementedError
+
+    def get_online_users(self, after_id=None, limit=None):
+        """
+        Return a list of {id, username, avatar_url} for online users.
+        Args:
+            after_id: Only users with a larger id (pagination cursor)
+            limit: Maximum number of users; with either argument the list
+                is ordered by id
+        """
+        raise NotImplementedError
+
+    def count_online(self):
+        raise NotImplementedError
+
+    def presence_version(self):
+        """Counter bumped every time a user comes online or goes offline."""
+        raise NotImplementedError
+
+    def get_presence_changes(self, since_version):
+        """
+        Presence changes after since_version.
+        Returns:
+            (version, changes) where changes is a list of (user_id, user)
+            in order, user being {id, username, avatar_url} when the user
+            came online and None when they went offline. changes is None if
+            the log no longer reaches back to since_version.
+        """
+        raise NotImplementedError
+
+    # ---- Invites ----
+
+    def add_invite(self, invite_id, invite, max_per_sender=None):
+        """
+        Store an invite. Returns False if the id is already taken.
+        Args:
+            max_per_sender: Pending invites the sender may have, checked
+                atomically with the insert (None = no limit)
+        Raises:
+            LobbyFull if the invite budget is used up
+            TooManyInvites if the sender is at max_per_sender
+        """
+        raise NotImplementedError
+
+    def get_invite(self, invite_id):
+        raise NotImplementedError
+
+    def remove_invite(self, invite_id):
+        raise NotImplementedError
+
+    def take_invite(self, invite_id):
+        """Atomically remove and return an invite; None if already gone."""
+        raise NotImplementedError
+
+    def get_invites_for(self, user_id):
+        """Return a list of (invite_id, invite) addressed to user_id."""
+        raise NotImplementedError
+
+    def count_invites_from(self, user_id):
+        """Number of outstanding invites sent by user_id."""
+        raise NotImplementedError
+
+    # ---- Redirects (invite sender is sent into the room) ----
+
+    def set_redirect(self, user_id, room_code):
+        raise NotImplementedError
+
+    def pop_redirect(self, user_id):
+        """Return and remove the pending redirect for user_id, or None."""
+        raise NotImplementedError
+
+    # ---- Rooms ----
+
+    def add_room(self, room_code, room):
+        """
+        Store a new room. Returns False if the code is already taken.
+        Raises:
+            LobbyFull if the room budget is used up
+        """
+        raise NotImplementedError
+
+    def get_room(self, room_code):
+        """Return a snapshot of the room dict or None."""
+        raise NotImplementedError
+
+    def has_room(self, room_code):
+        return self.get_room(room_code) is not None
+
+    def update_room(self, room_code, mutate):
+        """
+        Apply mutate(room) and persist the result.
+        Args:
+            room_code: Room to update
+            mutate: callable receiving the room dict, may raise to abort.
+                It runs atomically with respect to other updates of the room.
+        Returns:
+            Whatever mutate returns
+        Raises:
+            KeyError if the room does not exist
+        """
+        raise NotImplementedError
+
+    def reserve_ids(self, count):
+        """
+        Reserve count consecutive values of the room code counter (see
+        app.utils.room_codes), unique across processes sharing the store.
+        Returns:
+            The first reserved value
+        """
+        raise NotImplementedError
+
+    # ---- Maintenance ----
+
+    def stats(self):
+        """Entry counts and budget usage, for the admin endpoint."""
+        return {'backend': type(self).__name__}
+
+    def entry_sizes(self, samples):
+        """
+        Approximate bytes per room, online user and invite held in memory,
+        for the admin endpoint. None when entries live outside the process.
+        """
+        return None
+
+    def cleanup(self, now=None):
+        """Remove users, invites, redirects and rooms whose deadline has passed."""
+        raise NotImplementedError
+
+    def start_sweeper(self, interval):
+        """Run cleanup() every interval seconds in a daemon thread."""
+        self._sweeper_stop = threading.Event()
+
+        def sweep():
+            while not self._sweeper_stop.wait(interval):
+                try:
+                    self.cleanup()
+                except Exception as e:
+                    print(f"Lobby sweep failed: {e}")
+
+        thread = threading.Thread(target=sweep, name='lobby-sweeper', daemon=True)
+        thread.start()
+        return thread
+
+    def stop_sweeper(self):
+        stop = getattr(self, '_sweeper_stop', None)
+        if stop is not None:
+            stop.set()
+
+
+class MemoryLobbyStore(LobbyStore):
+    """
+    In-process store. Only consistent within a single worker process.
+
+    Locking is fine-grained so polls of different rooms never wait on each
+    other: rooms are guarded by ROOM_LOCK_STRIPES striped locks (by room
+    code), presence and redirects by one lock, invites and their indexes by
+    another. Room reads return a snapshot taken under the stripe lock.
+
+    Expiry uses a min-heap of (deadline, kind, key) with one entry per live
+    key. A sweep pops only entries whose deadline has passed; if the key was
+    refreshed meanwhile (a heartbeat moved last_seen) it is pushed back with
+    its new deadline, and if it is already gone the entry is dropped.
+
+    Entries are slotted records (see app.services.lobby_records). With
+    max_rooms set, adding a room to a full store evicts the least recently
+    used finished room, or raises LobbyFull if every room is still in play;
+    max_invites caps pending invites the same way. Lock order is budget lock
+    before a room stripe lock, never the reverse.
+    """
+
+    ROOM_LOCK_STRIPES = 64
+
+    def __init__(self, max_waiters=12, max_rooms=None, max_invites=None):
+        super().__init__(max_waiters)
+        self.max_rooms = max_rooms
+        self.max_invites = max_invites
+
+        # Online users: {user_id: PresenceRecord}
+        self.online_users = {}
+
+        # Presence changes: (version, user_id, PresenceRecord or None when offline)
+        self.presence_log = collections.deque(maxlen=PRESENCE_LOG_SIZE)
+        self._presence_version = 0
+
+        # Game rooms: {room_code: RoomRecord}
+        self.game_rooms = {}
+
+        # Finished rooms in LRU order (oldest first), the eviction candidates
+        self._finished = collections.OrderedDict()
+        self._budget_lock = threading.Lock()
+        self.evicted_rooms = 0
+
+        # Room code counter
+        self._next_id = 0
+        self._id_lock = threading.Lock()
+
+        # Pending invites: {invite_id: InviteRecord}
+        self.pending_invites = {}
+
+        # Invite indexes: {user_id: {invite_id, ...}} by recipient and by sender
+        self.invites_to = {}
+        self.invites_from = {}
+
+        # Pending redirects for invite senders: {user_id: RedirectRecord}
+        self.pending_redirects = {}
+
+        # Event log: (seq, user_ids or None, event_type, data, timestamp)
+        self.events = collections.deque(maxlen=EVENT_LOG_SIZE)
+        self.event_seq = 0
+
+        # Expiry heap: [(deadline, kind, key)] and the (kind, key) pairs in it
+        self._expiry = []
+        self._scheduled = set()
+        self._expiry_lock = threading.Lock()
+
+        self._room_locks = [threading.Lock() for _ in range(self.ROOM_LOCK_STRIPES)]
+        self._presence_lock = threading.Lock()
+        self._invite_lock = threading.Lock()
+
+    def _room_lock(self, room_code):
+        return self._room_locks[hash(room_code) % self.ROOM_LOCK_STRIPES]
+
+    def _schedule(self, deadline, kind, key):
+        with self._expiry_lock:
+            if (kind, key) not in self._scheduled:
+                self._scheduled.add((kind, key))
+                heapq.heappush(self._expiry, (deadline, kind, key))
+
+    def _expire_if_due(self, kind, key, now):
+        """
+        Remove a key if its deadline has passed.
+        Returns:
+            The key's later deadline if it was refreshed, else None
+        """
+        if kind == 'user':
+            with self._presence_lock:
+                data = self.online_users.get(key)
+                if data is None:
+                    return None
+                if data.last_seen + ONLINE_TIMEOUT >= now:
+                    return data.last_seen + ONLINE_TIMEOUT
+                del self.online_users[key]
+                self._presence_changed(key, None)
+        elif kind == 'redirect':
+            with self._presence_lock:
+                data = self.pending_redirects.get(key)
+                if data is None:
+                    return None
+                if data.timestamp + REDIRECT_TIMEOUT >= now:
+                    return data.timestamp + REDIRECT_TIMEOUT
+                del self.pending_redirects[key]
+        elif kind == 'invite':
+            with self._invite_lock:
+                data = self.pending_invites.get(key)
+                if data is None:
+                    return None
+                if data.timestamp + INVITE_TIMEOUT >= now:
+                    return data.timestamp + INVITE_TIMEOUT
+                self._remove_invite(key)
+        else:
+            with self._room_lock(key):
+                data = self.game_rooms.get(key)
+                if data is None:
+                    return None
+                if data.created_at + ROOM_TIMEOUT >= now:
+                    return data.created_at + ROOM_TIMEOUT
+                del self.game_rooms[key]
+            with self._budget_lock:
+                self._finished.pop(key, None)
+            self._notify_room(key, removed=True)
+        return None
+
+    def touch_user(self, user_id, username, avatar_url):
+        now = time.time()
+        with self._presence_lock:
+            is_new = user_id not in self.online_users
+            record = self.online_users[user_id] = PresenceRecord(username, avatar_url, now)
+            if is_new:
+                self._presence_changed(user_id, record)
+        self._schedule(now + ONLINE_TIMEOUT, 'user', user_id)
+
+    def remove_user(self, user_id):
+        with self._presence_lock:
+            if self.online_users.pop(user_id, None) is not None:
+                self._presence_changed(user_id, None)
+
+    def _presence_changed(self, user_id, record):
+        """Log and publish a presence change. Caller holds _presence_lock."""
+        self._presence_version += 1
+        self.presence_log.append((self._presence_version, user_id, record))
+        if record is None:
+            self.publish('offline', {'id': user_id})
+        else:
+            self.publish('online', {'id': user_id, 'username': record.username,
+                                    'avatar_url': record.avatar_url})
+
+    def is_online(self, user_id):
+        return user_id in self.online_users
+
+    def get_online_users(self, after_id=None, limit=None):
+        with self._presence_lock:
+            users = list(self.online_users.items())
+        if after_id is not None:
+            users = [u for u in users if u[0] > after_id]
+        if limit is not None:
+            users = heapq.nsmallest(limit, users, key=lambda u: u[0])
+        elif after_id is not None:
+            users.sort(key=lambda u: u[0])
+        return [
+            {'id': uid, 'username': data.username, 'avatar_url': data.avatar_url}
+            for uid, data in users
+        ]
+
+    def count_online(self):
+        return len(self.online_users)
+
+    def presence_version(self):
+        return self._presence_version
+
+    def get_presence_changes(self, since_version):
+        with self._presence_lock:
+            version = self._presence_version
+            # Versions are contiguous, so the log reaches back far enough
+            # exactly when it holds every version after since_version
+            new_count = version - since_version
+            if new_count < 0 or new_count > len(self.presence_log):
+                return version, None
+            tail = list(itertools.islice(self.presence_log, len(self.presence_log) - new_count, None))
+        return version, [
+            (uid, {'id': uid, 'username': record.username, 'avatar_url': record.avatar_url}
+             if record else None)
+            for _, uid, record in tail
+        ]
+
+    def add_invite(self, invite_id, invite, max_per_sender=None):
+        record = InviteRecord.from_dict(invite)
+        with self._invite_lock:
+            if invite_id in self.pending_invites:
+                return False
+            if max_per_sender is not None and \
+                    len(self.invites_from.get(record.from_user_id, ())) >= max_per_sender:
+                raise TooManyInvites('Too many pending invites')
+            if self.max_invites and len(self.pending_invites) >= self.max_invites:
+                raise LobbyFull('Too many pending invites')
+            self.pending_invites[invite_id] = record
+            self.invites_to.setdefault(record.to_user_id, set()).add(invite_id)
+            self.invites_from.setdefault(record.from_user_id, set()).add(invite_id)
+        self._schedule(record.timestamp + INVITE_TIMEOUT, 'invite', invite_id)
+        return True
+
+    def get_invite(self, invite_id):
+        record = self.pending_invites.get(invite_id)
+        return record.to_dict() if record else None
+
+    def _remove_invite(self, invite_id):
+        """Remove an invite and its index entries. Caller holds _invite_lock."""
+        invite = self.pending_invites.pop(invite_id, None)
+        if invite is None:
+            return None
+        for index, user_id in ((self.invites_to, invite.to_user_id),
+                               (self.invites_from, invite.from_user_id)):
+            ids = index.get(user_id)
+            if ids is not None:
+                ids.discard(invite_id)
+                if not ids:
+                    del index[user_id]
+        return invite
+
+    def remove_invite(self, invite_id):
+        with self._invite_lock:
+            self._remove_invite(invite_id)
+
+    def take_invite(self, invite_id):
+        with self._invite_lock:
+            record = self._remove_invite(invite_id)
+        return record.to_dict() if record else None
+
+    def get_invites_for(self, user_id):
+        with self._invite_lock:
+            records = [(iid, self.pending_invites[iid]) for iid in self.invites_to.get(user_id, ())]
+        return [(iid, record.to_dict()) for iid, record in records]
+
+    def count_invites_from(self, user_id):
+        with self._invite_lock:
+            return len(self.invites_from.get(user_id, ()))
+
+    def set_redirect(self, user_id, room_code):
+        now = time.time()
+        with self._presence_lock:
+            self.pending_redirects[user_id] = RedirectRecord(room_code, now)
+        self._schedule(now + REDIRECT_TIMEOUT, 'redirect', user_id)
+
+    def pop_redirect(self, user_id):
+        with self._presence_lock:
+            record = self.pending_redirects.pop(user_id, None)
+        return record.to_dict() if record else None
+
+    def add_room(self, room_code, room):
+        record = RoomRecord.from_dict(room)
+        record.room_code = room_code
+        evicted = None
+        with self._budget_lock:
+            # Rooms are only added under _budget_lock, so a duplicate code
+            # can't appear between this check and the insert below; check
+            # first so a rejected code doesn't cost a finished room
+            if room_code in self.game_rooms:
+                return False
+            if self.max_rooms and len(self.game_rooms) >= self.max_rooms:
+                if not self._finished:
+                    raise LobbyFull('Too many active rooms')
+                evicted, _ = self._finished.popitem(last=False)
+                with self._room_lock(evicted):
+                    self.game_rooms.pop(evicted, None)
+                self.evicted_rooms += 1
+            with self._room_lock(room_code):
+                self.game_rooms[room_code] = record
+        if evicted:
+            self._notify_room(evicted, removed=True)
+        self._schedule(record.created_at + ROOM_TIMEOUT, 'room', room_code)
+        return True
+
+    def get_room(self, room_code):
+        with self._room_lock(room_code):
+            record = self.game_rooms.get(room_code)
+            if record is None:
+                return None
+            room = record.to_dict()
+        if record.status == RoomStatus.FINISHED:
+            self._touch_finished(room_code)
+        return room
+
+    def has_room(self, room_code):
+        return room_code in self.game_rooms
+
+    def update_room(self, room_code, mutate):
+        with self._room_lock(room_code):
+            record = self.game_rooms.get(room_code)
+            if record is None:
+                raise KeyError(room_code)
+            room = record.to_dict()
+            result = mutate(room)
+            record = self.game_rooms[room_code] = RoomRecord.from_dict(room)
+        if record.status == RoomStatus.FINISHED:
+            self._touch_finished(room_code)
+        self._notify_room(room_code)
+        return result
+
+    def reserve_ids(self, count):
+        with self._id_lock:
+            first = self._next_id
+            self._next_id += count
+        return first
+
+    def _touch_finished(self, room_code):
+        """Mark a finished room as most recently used."""
+        with self._budget_lock:
+            if room_code in self.game_rooms:
+                self._finished[room_code] = None
+                self._finished.move_to_end(room_code)
+
+    def stats(self):
+        with self._budget_lock:
+            finished = len(self._finished)
+        return {
+            'backend': type(self).__name__,
+            'rooms': len(self.game_rooms),
+            'finished_rooms': finished,
+            'max_rooms': self.max_rooms,
+            'evicted_rooms': self.evicted_rooms,
+            'invites': len(self.pending_invites),
+            'max_invites': self.max_invites,
+            'online_users': len(self.online_users)
+        }
+
+    def entry_sizes(self, samples):
+        """
+        sys.getsizeof of up to samples live entries of each kind (key,
+        record and what it references), plus each entry's share of the
+        dicts, indexes and expiry heap holding it. Objects shared between
+        entries (field-name tuples, small ints, interned strings) are
+        counted in each; benchmarks/lobby_memory.py measures the real cost
+        with tracemalloc.
+        """
+        # list() copies a dict or list without releasing the GIL
+        expiry = list(self._expiry)
+        # A (deadline, kind, key) heap slot and its (kind, key) pair in _scheduled
+        per_deadline = ((sys.getsizeof(expiry) + sys.getsizeof(self._scheduled)) / len(expiry)
+                        + sys.getsizeof((0.0, '', 0)) + sys.getsizeof(0.0) + sys.getsizeof(('', 0))
+                        if expiry else 0)
+
+        def average(entries, *indexes):
+            if not entries:
+                return None
+            sampled = entries[:samples]
+            size = 0
+            for key, record in sampled:
+                seen = set()
+                size += _deep_size(key, seen) + _deep_size(record, seen)
+            size /= len(sampled)
+            for index in indexes:
+                size += sum(sys.getsizeof(item) for item in index) / len(entries)
+            return round(size + per_deadline)
+
+        rooms = list(self.game_rooms.items())
+        users = list(self.online_users.items())
+        invites = list(self.pending_invites.items())
+        per_room = average(rooms, [self.game_rooms])
+        per_user = average(users, [self.online_users])
+        # Each sender and recipient also has a set of invite ids
+        per_invite = average(invites, [self.pending_invites, self.invites_to, self.invites_from],
+                             list(self.invites_to.values()) + list(self.invites_from.values()))
+        budget = 256 * 1024 * 1024
+        return {
+            'samples': samples,
+            'bytes_per_room': per_room,
+            'bytes_per_user': per_user,
+            'bytes_per_invite': per_invite,
+            'rooms_per_256mb': budget // per_room if per_room else None,
+            'users_per_256mb': budget // per_user if per_user else None
+        }
+
+    def cleanup(self, now=None):
+        now = now or time.time()
+        while True:
+            with self._expiry_lock:
+                if not self._expiry or self._expiry[0][0] >= now:
+                    return
+                _, kind, key = heapq.heappop(self._expiry)
+                self._scheduled.discard((kind, key))
+
+            deadline = self._expire_if_due(kind, key, now)
+            if deadline is not None:
+                self._schedule(deadline, kind, key)  # Refreshed since scheduled
+
+    def publish(self, event_type, data, user_ids=None):
+        targets = frozenset(user_ids) if user_ids is not None else None
+        with self._events_cond:
+            self.event_seq += 1
+            self.events.append((self.event_seq, targets, event_type, data, time.time()))
+            self._events_cond.notify_all()
+
+    def _event_tail(self, after_seq):
+        """(event_seq, log entries newer than after_seq), read together under the log's lock."""
+        with self._events_cond:
+            last_seq = self.event_seq
+            # Sequence numbers are contiguous, so skip straight to the new tail
+            new_count = min(last_seq - after_seq, len(self.events))
+            if new_count <= 0:
+                return last_seq, []
+            return last_seq, list(itertools.islice(self.events, len(self.events) - new_count, None))
+
+    def get_events(self, after_seq, user_id):
+        last_seq, tail = self._event_tail(after_seq)
+        events = [(seq, event_type, data) for seq, targets, event_type, data, _ in tail
+                  if targets is None or user_id in targets]
+        return last_seq, events
+
+    def get_event_log(self, after_seq):
+        last_seq, tail = self._event_tail(after_seq)
+        return last_seq, [(seq, targets, event_type, data) for seq, targets, event_type, data, _ in tail]
+
+    def last_event_seq(self):
+        return self.event_seq
+
+
+class SQLiteLobbyStore(LobbyStore):
+    """
+    Cross-process store backed by a SQLite file in WAL mode.
+
+    Every worker opens the same file, so presence, invites and rooms look the
+    same whichever worker serves a request. Store calls borrow a connection
+    from a small per-process pool; writes run inside BEGIN IMMEDIATE so
+    concurrent read-modify-write cycles from different workers are
+    serialized.
+    """
+
+    # Bump when SCHEMA changes: lobby state is transient, so an old file is
+    # simply dropped and recreated
+    SCHEMA_VERSION = 5
+    TABLES = ('lobby_presence', 'lobby_presence_log', 'lobby_invite', 'lobby_redirect',
+              'lobby_room', 'lobby_event', 'lobby_counter')
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS lobby_presence ('
+        ' user_id INTEGER PRIMARY KEY, username TEXT, avatar_url TEXT,'
+        ' last_seen REAL NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS ix_lobby_presence_seen ON lobby_presence (last_seen)',
+        # One row per online/offline change; version is the presence version
+        'CREATE TABLE IF NOT EXISTS lobby_presence_log ('
+        ' version INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL,'
+        ' username TEXT, avatar_url TEXT, online INTEGER NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS lobby_invite ('
+        ' invite_id TEXT PRIMARY KEY, from_user_id INTEGER NOT NULL,'
+        ' to_user_id INTEGER NOT NULL, data TEXT NOT NULL, timestamp REAL NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS ix_lobby_invite_to ON lobby_invite (to_user_id)',
+        'CREATE INDEX IF NOT EXISTS ix_lobby_invite_from ON lobby_invite (from_user_id)',
+        'CREATE INDEX IF NOT EXISTS ix_lobby_invite_time ON lobby_invite (timestamp)',
+        'CREATE TABLE IF NOT EXISTS lobby_redirect ('
+        ' user_id INTEGER PRIMARY KEY, room_code TEXT NOT NULL,'
+        ' timestamp REAL NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS ix_lobby_redirect_time ON lobby_redirect (timestamp)',
+        'CREATE TABLE IF NOT EXISTS lobby_room ('
+        ' room_code TEXT PRIMARY KEY, data TEXT NOT NULL,'
+        ' created_at REAL NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS ix_lobby_room_created ON lobby_room (created_at)',
+        'CREATE TABLE IF NOT EXISTS lobby_counter ('
+        ' name TEXT PRIMARY KEY, value INTEGER NOT NULL)',
+        # user_id NULL = broadcast; targeted events get one row per recipient
+        'CREATE TABLE IF NOT EXISTS lobby_event ('
+        ' seq INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER,'
+        ' event_type TEXT NOT NULL, data TEXT NOT NULL, timestamp REAL NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS ix_lobby_event_time ON lobby_event (timestamp)',
+    )
+
+    poll_interval = 0.25
+
+    POOL_SIZE = 8  # Connections per process; each store call borrows one
+    BUSY_TIMEOUT = 10.0  # Seconds a writer waits for the write lock
+
+    def __init__(self, path, max_waiters=12):
+        super().__init__(max_waiters)
+        self.path = path
+        self._idle = collections.deque()  # Open connections not lent out
+        self._pool_slots = threading.BoundedSemaphore(self.POOL_SIZE)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connection() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+        with self._transaction() as conn:
+            if conn.execute('PRAGMA user_version').fetchone()[0] != self.SCHEMA_VERSION:
+                for table in self.TABLES:
+                    conn.execute(f'DROP TABLE IF EXISTS {table}')
+                conn.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def _open(self):
+        # isolation_level=None: autocommit, transactions are explicit.
+        # timeout=0: no sqlite busy handler, whose sleep would stall every
+        # greenlet of a gevent worker; _begin() waits for the write lock
+        # instead. WAL readers do not wait for writers
+        conn = sqlite3.connect(self.path, timeout=0, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        """
+        Borrow a connection for one store call. At most POOL_SIZE are open
+        per process and callers beyond that wait for one to come back, so
+        don't borrow a second one while holding one.
+        """
+        self._pool_slots.acquire()
+        try:
+            try:
+                conn = self._idle.pop()
+            except IndexError:
+                conn = self._open()
+            try:
+                yield conn
+            finally:
+                self._idle.append(conn)
+        finally:
+            self._pool_slots.release()
+
+    def _begin(self, conn):
+        """BEGIN IMMEDIATE, retrying with time.sleep (a greenlet switch under gevent) while locked."""
+        deadline = time.monotonic() + self.BUSY_TIMEOUT
+        delay = 0.001
+        while True:
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                return
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e) or time.monotonic() >= deadline:
+                    raise
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction; BEGIN IMMEDIATE serializes writers across workers."""
+        with self._connection() as conn:
+            self._begin(conn)
+            try:
+                yield conn
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+
+    def _fetchone(self, query, params=()):
+        with self._connection() as conn:
+            return conn.execute(query, params).fetchone()
+
+    def _fetchall(self, query, params=()):
+        with self._connection() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def touch_user(self, user_id, username, avatar_url):
+        # One transaction: of two racing requests for a new user, only the
+        # first inserts, so 'online' is logged and published once
+        with self._transaction() as conn:
+            updated = conn.execute(
+                'UPDATE lobby_presence SET username = ?, avatar_url = ?, last_seen = ? '
+                'WHERE user_id = ?',
+                (username, avatar_url, time.time(), user_id)
+            ).rowcount
+            if not updated:
+                conn.execute(
+                    'INSERT INTO lobby_presence (user_id, username, avatar_url, last_seen) '
+                    'VALUES (?, ?, ?, ?)',
+                    (user_id, username, avatar_url, time.time())
+                )
+                self._log_presence(conn, user_id, username, avatar_url)
+                self._insert_events(conn, 'online',
+                                    {'id': user_id, 'username': username, 'avatar_url': avatar_url})
+        if not updated:
+            self._notify_events()
+
+    def remove_user(self, user_id):
+        with self._transaction() as conn:
+            removed = conn.execute(
+                'DELETE FROM lobby_presence WHERE user_id = ?', (user_id,)
+            ).rowcount
+            if removed:
+                self._log_presence(conn, user_id)
+                self._insert_events(conn, 'offline', {'id': user_id})
+        if removed:
+            self._notify_events()
+
+    @staticmethod
+    def _log_presence(conn, user_id, username=None, avatar_url=None):
+        """Record a presence change (offline when username is None)."""
+        conn.execute(
+            'INSERT INTO lobby_presence_log (user_id, username, avatar_url, online) '
+            'VALUES (?, ?, ?, ?)',
+            (user_id, username, avatar_url, int(username is not None))
+        )
+
+    def is_online(self, user_id):
+        row = self._fetchone('SELECT 1 FROM lobby_presence WHERE user_id = ?', (user_id,))
+        return row is not None
+
+    def get_online_users(self, after_id=None, limit=None):
+        query = 'SELECT user_id, username, avatar_url FROM lobby_presence'
+        params = []
+        if after_id is not None:
+            query += ' WHERE user_id > ?'
+            params.append(after_id)
+        if after_id is not None or limit is not None:
+            query += ' ORDER BY user_id'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+        rows = self._fetchall(query, params)
+        return [{'id': uid, 'username': username, 'avatar_url': avatar_url}
+                for uid, username, avatar_url in rows]
+
+    def count_online(self):
+        return self._fetchone('SELECT COUNT(*) FROM lobby_presence')[0]
+
+    def presence_version(self):
+        row = self._fetchone('SELECT MAX(version) FROM lobby_presence_log')
+        return row[0] or 0
+
+    def get_presence_changes(self, since_version):
+        with self._connection() as conn:
+            # Read the bounds first; rows are then capped at version so a change
+            # committed meanwhile is left for the next request
+            oldest, version = conn.execute(
+                'SELECT MIN(version), MAX(version) FROM lobby_presence_log'
+            ).fetchone()
+            version = version or 0
+            if since_version > version or (version > since_version and oldest > since_version + 1):
+                return version, None
+            rows = conn.execute(
+                'SELECT user_id, username, avatar_url, online FROM lobby_presence_log '
+                'WHERE version > ? AND version <= ? ORDER BY version',
+                (since_version, version)
+            ).fetchall()
+        return version, [
+            (uid, {'id': uid, 'username': username, 'avatar_url': avatar_url} if online else None)
+            for uid, username, avatar_url, online in rows
+        ]
+
+    def add_invite(self, invite_id, invite, max_per_sender=None):
+        # One statement: the sender's count is read in the inserting transaction
+        limit = -1 if max_per_sender is None else max_per_sender
+        try:
+            with self._transaction() as conn:
+                inserted = conn.execute(
+                    'INSERT INTO lobby_invite (invite_id, from_user_id, to_user_id, data, timestamp) '
+                    'SELECT ?, ?, ?, ?, ? '
+                    'WHERE ? < 0 OR (SELECT COUNT(*) FROM lobby_invite WHERE from_user_id = ?) < ?',
+                    (invite_id, invite['from_user_id'], invite['to_user_id'], json.dumps(invite),
+                     invite['timestamp'], limit, invite['from_user_id'], limit)
+                ).rowcount
+        except sqlite3.IntegrityError:
+            return False
+        if not inserted:
+            raise TooManyInvites('Too many pending invites')
+        return True
+
+    def get_invite(self, invite_id):
+        row = self._fetchone('SELECT data FROM lobby_invite WHERE invite_id = ?', (invite_id,))
+        return json.loads(row[0]) if row else None
+
+    def remove_invite(self, invite_id):
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM lobby_invite WHERE invite_id = ?', (invite_id,))
+
+    def take_invite(self, invite_id):
+        with self._transaction() as conn:
+            row = conn.execute(
+                'SELECT data FROM lobby_invite WHERE invite_id = ?', (invite_id,)
+            ).fetchone()
+            if row:
+                conn.execute('DELETE FROM lobby_invite WHERE invite_id = ?', (invite_id,))
+        return json.loads(row[0]) if row else None
+
+    def get_invites_for(self, user_id):
+        rows = self._fetchall(
+            'SELECT invite_id, data FROM lobby_invite WHERE to_user_id = ?', (user_id,)
+        )
+        return [(iid, json.loads(data)) for iid, data in rows]
+
+    def count_invites_from(self, user_id):
+        row = self._fetchone(
+            'SELECT COUNT(*) FROM lobby_invite WHERE from_user_id = ?', (user_id,)
+        )
+        return row[0]
+
+    def set_redirect(self, user_id, room_code):
+        with self._transaction() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO lobby_redirect (user_id, room_code, timestamp) '
+                'VALUES (?, ?, ?)',
+                (user_id, room_code, time.time())
+            )
+
+    def pop_redirect(self, user_id):
+        with self._transaction() as conn:
+            row = conn.execute(
+                'SELECT room_code, timestamp FROM lobby_redirect WHERE user_id = ?', (user_id,)
+            ).fetchone()
+            if row:
+                conn.execute('DELETE FROM lobby_redirect WHERE user_id = ?', (user_id,))
+        if not row:
+            return None
+        return {'room_code': row[0], 'timestamp': row[1]}
+
+    def add_room(self, room_code, room):
+        try:
+            with self._transaction() as conn:
+                conn.execute(
+                    'INSERT INTO lobby_room (room_code, data, created_at) VALUES (?, ?, ?)',
+                    (room_code, json.dumps(room), room['created_at'])
+                )
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def get_room(self, room_code):
+        row = self._fetchone('SELECT data FROM lobby_room WHERE room_code = ?', (room_code,))
+        return json.loads(row[0]) if row else None
+
+    def update_room(self, room_code, mutate):
+        with self._transaction() as conn:
+            row = conn.execute(
+                'SELECT data FROM lobby_room WHERE room_code = ?', (room_code,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(room_code)
+            room = json.loads(row[0])
+            result = mutate(room)
+            conn.execute('UPDATE lobby_room SET data = ? WHERE room_code = ?',
+                         (json.dumps(room), room_code))
+        self._notify_room(room_code)
+        return result
+
+    def reserve_ids(self, count):
+        with self._transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO lobby_counter (name, value) VALUES ('room_code', 0)")
+            conn.execute("UPDATE lobby_counter SET value = value + ? WHERE name = 'room_code'", (count,))
+            value = conn.execute("SELECT value FROM lobby_counter WHERE name = 'room_code'").fetchone()[0]
+        return value - count
+
+    def publish(self, event_type, data, user_ids=None):
+        with self._transaction() as conn:
+            self._insert_events(conn, event_type, data, user_ids)
+        self._notify_events()
+
+    @staticmethod
+    def _insert_events(conn, event_type, data, user_ids=None):
+        """Append an event to the log in the caller's transaction (publish() without the wake-up)."""
+        payload = json.dumps(data)
+        now = time.time()
+        targets = [None] if user_ids is None else list(user_ids)
+        conn.executemany(
+            'INSERT INTO lobby_event (user_id, event_type, data, timestamp) VALUES (?, ?, ?, ?)',
+            [(uid, event_type, payload, now) for uid in targets]
+        )
+
+    def get_events(self, after_seq, user_id):
+        with self._connection() as conn:
+            last_seq = conn.execute('SELECT MAX(seq) FROM lobby_event').fetchone()[0] or 0
+            rows = conn.execute(
+                'SELECT seq, event_type, data FROM lobby_event '
+                'WHERE seq > ? AND seq <= ? AND (user_id IS NULL OR user_id = ?) ORDER BY seq',
+                (after_seq, last_seq, user_id)
+            ).fetchall()
+        return last_seq, [(seq, event_type, json.loads(data)) for seq, event_type, data in rows]
+
+    def get_event_log(self, after_seq):
+        # publish() stores one row per recipient, each with its own seq
+        with self._connection() as conn:
+            last_seq = conn.execute('SELECT MAX(seq) FROM lobby_event').fetchone()[0] or 0
+            rows = conn.execute(
+                'SELECT seq, user_id, event_type, data FROM lobby_event WHERE seq > ? AND seq <= ? ORDER BY seq',
+                (after_seq, last_seq)
+            ).fetchall()
+        return last_seq, [(seq, None if uid is None else {uid}, event_type, json.loads(data))
+                          for seq, uid, event_type, data in rows]
+
+    def last_event_seq(self):
+        row = self._fetchone('SELECT MAX(seq) FROM lobby_event')
+        return row[0] or 0
+
+    def cleanup(self, now=None):
+        # Every delete is a range scan on a deadline index, so a pass only
+        # touches rows that have actually expired
+        now = now or time.time()
+        offline = self._fetchall(
+            'SELECT user_id FROM lobby_presence WHERE last_seen < ?', (now - ONLINE_TIMEOUT,)
+        )
+        for (uid,) in offline:
+            with self._transaction() as conn:
+                removed = conn.execute(
+                    'DELETE FROM lobby_presence WHERE user_id = ? AND last_seen < ?',
+                    (uid, now - ONLINE_TIMEOUT)
+                ).rowcount
+                if removed:
+                    self._log_presence(conn, uid)
+                    self._insert_events(conn, 'offline', {'id': uid})
+            if removed:
+                self._notify_events()
+        with self._transaction() as conn:
+            conn.execute(
+                'DELETE FROM lobby_presence_log WHERE version <= '
+                '(SELECT MAX(version) FROM lobby_presence_log) - ?', (PRESENCE_LOG_SIZE,)
+            )
+            conn.execute('DELETE FROM lobby_invite WHERE timestamp < ?', (now - INVITE_TIMEOUT,))
+            conn.execute('DELETE FROM lobby_redirect WHERE timestamp < ?', (now - REDIRECT_TIMEOUT,))
+            expired_rooms = conn.execute(
+                'SELECT room_code FROM lobby_room WHERE created_at < ?', (now - ROOM_TIMEOUT,)
+            ).fetchall()
+            conn.execute('DELETE FROM lobby_room WHERE created_at < ?', (now - ROOM_TIMEOUT,))
+            conn.execute('DELETE FROM lobby_event WHERE timestamp < ?', (now - EVENT_TIMEOUT,))
+        for (code,) in expired_rooms:
+            self._notify_room(code, removed=True)
+        self._prune_conditions()
+
+
+def create_lobby_store(app):
+    """
+    Build the lobby store configured for this app.
+    Config:
+        LOBBY_STORE: 'memory' or 'sqlite'
+        LOBBY_STORE_PATH: SQLite file (defaults to <instance>/lobby.db)
+        LOBBY_LONGPOLL_MAX_WAITERS: Long polls allowed to wait at once per process
+        LOBBY_SWEEP_INTERVAL: Seconds between background expiry sweeps (0 = off)
+        LOBBY_MAX_ROOMS, LOBBY_MAX_INVITES: Memory budget of the memory store
+    """
+    backend = app.config.get('LOBBY_STORE', 'memory')
+    max_waiters = app.config.get('LOBBY_LONGPOLL_MAX_WAITERS', 12)
+
+    if backend == 'memory':
+        store = MemoryLobbyStore(max_waiters, app.config.get('LOBBY_MAX_ROOMS'),
+                                 app.config.get('LOBBY_MAX_INVITES'))
+    elif backend == 'sqlite':
+        path = app.config.get('LOBBY_STORE_PATH') or os.path.join(app.instance_path, 'lobby.db')
+        store = SQLiteLobbyStore(path, max_waiters)
+    else:
+        raise ValueError(f'Unknown LOBBY_STORE: {backend}')
+
+    interval = app.config.get('LOBBY_SWEEP_INTERVAL', 1.0)
+    if interval:
+        store.start_sweeper(interval)
+
+    return store
+
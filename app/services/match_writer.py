@@ -0,0 +1,203 @@
+"""
+Match writer - Write-behind persistence of finished lobby matches.
+
+Finishing a match used to insert the GameMatch and commit both players'
+stats inside the request that submitted the final choice. The lobby now
+queues the finished room here; a background thread drains the queue and
+writes each batch of matches plus their stat increments in one
+transaction.
+"""
+
+import atexit
+import json
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy.exc import OperationalError, DisconnectionError
+from app.extensions import db
+
+_STOP = object()
+
+
+class MatchWriter:
+    """Background writer with a bounded queue."""
+
+    QUEUE_SIZE = 1000      # Finished matches waiting to be written
+    BATCH_SIZE = 50        # Matches per transaction
+    MAX_RETRIES = 3        # Attempts per batch on connection errors
+    RETRY_DELAY = 0.5      # Seconds, multiplied by the attempt number
+    STOP_TIMEOUT = 10      # Seconds to drain the queue on shutdown
+
+    def __init__(self, app):
+        self.app = app
+        self.queue = queue.Queue(self.QUEUE_SIZE)
+        self._stats_lock = threading.Lock()
+
+        # Metrics
+        self.submitted = 0
+        self.written = 0
+        self.failed = 0
+        self.retries = 0
+        self.flushes = 0
+        self.sync_writes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+        self._thread = threading.Thread(target=self._run, name='match-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    @staticmethod
+    def to_record(room):
+        """Snapshot of the fields of a finished lobby room that get persisted."""
+        return {
+            'player1_id': room['host_id'],
+            'player2_id': room['guest_id'],
+            'winner_id': room['winner_id'],
+            'player1_score': room['host_score'],
+            'player2_score': room['guest_score'],
+            'rounds_data': json.dumps(room['rounds']),
+            'started_at': datetime.utcfromtimestamp(room['created_at']),
+            'ended_at': datetime.utcfromtimestamp(room['last_update'])
+        }
+
+    def submit(self, room):
+        """Queue a finished room. Writes in the caller's thread if the queue is full."""
+        record = self.to_record(room)
+        with self._stats_lock:
+            self.submitted += 1
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._stats_lock:
+                self.sync_writes += 1
+            self._flush([record])
+
+    def flush(self):
+        """Block until everything queued so far has been written."""
+        self.queue.join()
+
+    def stop(self):
+        """Drain the queue and stop the worker (registered with atexit)."""
+        if not self._thread.is_alive():
+            return
+        self.queue.put(_STOP)
+        self._thread.join(self.STOP_TIMEOUT)
+
+    def metrics(self):
+        with self._stats_lock:
+            return {
+                'queue_depth': self.queue.qsize(),
+                'queue_size': self.QUEUE_SIZE,
+                'submitted': self.submitted,
+                'written': self.written,
+                'failed': self.failed,
+                'retries': self.retries,
+                'sync_writes': self.sync_writes,
+                'flushes': self.flushes,
+                'last_flush_ms': round(self.last_flush_ms, 2),
+                'max_flush_ms': round(self.max_flush_ms, 2),
+                'avg_flush_ms': round(self.total_flush_ms / self.flushes, 2) if self.flushes else 0.0
+            }
+
+    def _run(self):
+        while True:
+            record = self.queue.get()
+            if record is _STOP:
+                self.queue.task_done()
+                return
+
+            # Take whatever else is already waiting, up to a batch
+            batch = [record]
+            stop = False
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    stop = True
+                    self.queue.task_done()
+                    break
+                batch.append(record)
+
+            try:
+                self._flush(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+            if stop:
+                return
+
+    def _flush(self, batch):
+        """Write a batch, retrying on connection errors."""
+        start = time.perf_counter()
+        with self.app.app_context():
+            for attempt in range(self.MAX_RETRIES):
+                try:
+                    self._write(batch)
+                    break
+                except (OperationalError, DisconnectionError) as e:
+                    self._reset_session()
+                    if attempt == self.MAX_RETRIES - 1:
+                        print(f"Error saving {len(batch)} matches after {self.MAX_RETRIES} retries: {e}")
+                        self._count_failed(len(batch))
+                        return
+                    with self._stats_lock:
+                        self.retries += 1
+                    time.sleep(self.RETRY_DELAY * (attempt + 1))
+                except Exception as e:
+                    self._reset_session()
+                    if len(batch) == 1:
+                        print(f"Error saving match: {e}")
+                        self._count_failed(1)
+                        return
+                    # Isolate the bad record: write the rest one by one
+                    for record in batch:
+                        self._flush([record])
+                    return
+
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self.written += len(batch)
+            self.flushes += 1
+            self.last_flush_ms = elapsed
+            self.max_flush_ms = max(self.max_flush_ms, elapsed)
+            self.total_flush_ms += elapsed
+
+    @staticmethod
+    def _write(batch):
+        """Insert the matches and apply ratings, rollups and stat increments in one commit."""
+        from app.models import GameMatch
+        from app.services.game_stats_service import GameStatsService
+        from app.services.rating import RatingService
+        from app.services.user_service import UserService
+
+        deltas = defaultdict(lambda: defaultdict(int))
+        for record in batch:
+            db.session.add(GameMatch(**record))
+            winner = record['winner_id']
+            loser = record['player2_id'] if winner == record['player1_id'] else record['player1_id']
+            deltas[winner]['win'] += 1
+            deltas[loser]['loss'] += 1
+
+        rating_changes = RatingService.rate_matches([(r['player1_id'], r['player2_id'], r['winner_id']) for r in batch])
+        GameStatsService.record_matches([
+            (r['player1_id'], r['player2_id'], r['winner_id'], json.loads(r['rounds_data'])) for r in batch
+        ])
+        UserService.update_stats_bulk(deltas, rating_changes=rating_changes)
+
+    def _count_failed(self, count):
+        with self._stats_lock:
+            self.failed += count
+
+    @staticmethod
+    def _reset_session():
+        try:
+            db.session.rollback()
+            db.session.remove()
+        except Exception:
+            pass
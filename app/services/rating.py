@@ -0,0 +1,168 @@
+"""
+RatingService - Elo ratings of players.
+
+Ratings are updated incrementally as matches are recorded (end_match and
+the match writer) and can be recomputed from scratch by replaying the whole
+game_match table in (ended_at, id) order, e.g. after changing K_FACTOR:
+
+    python recompute_ratings.py
+
+The replay is exact, not an approximation: matches are grouped into layers
+in which no player appears twice, with each player's matches in
+chronological layer order, so a layer's updates are independent and are
+applied as one NumPy vector operation (numpy is in requirements.txt; a
+plain loop over the matches remains for installs without it).
+"""
+
+import time
+from sqlalchemy import select, update
+from app.extensions import db
+from app.models import GameMatch, User
+
+try:
+    import numpy as np
+except ImportError:  # Declared in requirements.txt; replay() falls back to a loop
+    np = None
+
+INITIAL_RATING = 1500.0
+K_FACTOR = 32.0
+SCALE = 400.0  # Rating difference at which the stronger player is 10x as likely to win
+
+
+def expected_score(rating, opponent_rating):
+    """Probability that a player beats an opponent."""
+    return 1.0 / (1.0 + 10 ** ((opponent_rating - rating) / SCALE))
+
+
+def match_score(player1_id, player2_id, winner_id):
+    """player1's score: 1 win, 0 loss, 0.5 without a winner."""
+    if winner_id == player1_id:
+        return 1.0
+    if winner_id == player2_id:
+        return 0.0
+    return 0.5
+
+
+class RatingService:
+    """Service class for player ratings."""
+
+    REPLAY_CHUNK = 50000  # Matches fetched per round trip in recompute()
+
+    @staticmethod
+    def rate_matches(matches):
+        """
+        Elo rating changes of the players from finished matches, in order.
+        Reads the current ratings with the players' rows locked (one
+        SELECT ... FOR UPDATE, in id order) so concurrent matches of the
+        same player are rated one after the other. The caller adds the
+        changes with the stat increments, rating = rating + CASE id ... END
+        (UserService.update_stats_bulk), in the same transaction; being
+        increments, they are never lost even where FOR UPDATE is a no-op
+        (SQLite).
+        Args:
+            matches: [(player1_id, player2_id, winner_id)]
+        Returns:
+            {user_id: rating change} of every player found
+        """
+        user_ids = sorted({uid for p1, p2, _ in matches for uid in (p1, p2)})
+        ratings = {
+            uid: rating if rating is not None else INITIAL_RATING
+            for uid, rating in db.session.execute(
+                select(User.id, User.rating).where(User.id.in_(user_ids)).order_by(User.id).with_for_update())
+        }
+
+        changes = {}
+        for player1_id, player2_id, winner_id in matches:
+            if player1_id not in ratings or player2_id not in ratings:
+                continue
+            r1, r2 = ratings[player1_id], ratings[player2_id]
+            change = K_FACTOR * (match_score(player1_id, player2_id, winner_id) - expected_score(r1, r2))
+            ratings[player1_id] = r1 + change
+            ratings[player2_id] = r2 - change
+            changes[player1_id] = changes.get(player1_id, 0.0) + change
+            changes[player2_id] = changes.get(player2_id, 0.0) - change
+        return changes
+
+    @staticmethod
+    def _load_matches():
+        """All matches as (player1_ids, player2_ids, scores) in play order."""
+        rows = db.session.execute(
+            select(GameMatch.player1_id, GameMatch.player2_id, GameMatch.winner_id)
+            .order_by(GameMatch.ended_at, GameMatch.id)
+            .execution_options(yield_per=RatingService.REPLAY_CHUNK)
+        )
+        player1, player2, scores = [], [], []
+        for p1, p2, winner in rows:
+            player1.append(p1)
+            player2.append(p2)
+            scores.append(match_score(p1, p2, winner))
+        return player1, player2, scores
+
+    @staticmethod
+    def replay(player1, player2, scores):
+        """
+        Ratings after playing the matches in order from INITIAL_RATING.
+        Returns:
+            {user_id: rating} of every player with a match
+        """
+        if np is None or not player1:
+            ratings = {}
+            for a, b, score in zip(player1, player2, scores):
+                ra, rb = ratings.get(a, INITIAL_RATING), ratings.get(b, INITIAL_RATING)
+                change = K_FACTOR * (score - expected_score(ra, rb))
+                ratings[a], ratings[b] = ra + change, rb - change
+            return ratings
+
+        user_ids, players = np.unique(np.array([player1, player2], dtype=np.int64), return_inverse=True)
+        players = players.reshape(2, -1)
+        a, b = players[0], players[1]
+        scores = np.asarray(scores, dtype=np.float64)
+
+        # Layer of a match = one past the last layer of either player
+        last = [0] * len(user_ids)
+        layers = []
+        for x, y in zip(a.tolist(), b.tolist()):
+            layer = (last[x] if last[x] > last[y] else last[y]) + 1
+            last[x] = last[y] = layer
+            layers.append(layer)
+        layers = np.array(layers, dtype=np.int64)
+
+        order = np.argsort(layers, kind='stable')
+        bounds = np.flatnonzero(np.diff(layers[order])) + 1
+        ratings = np.full(len(user_ids), INITIAL_RATING)
+        for group in np.split(order, bounds):
+            ga, gb = a[group], b[group]
+            ra, rb = ratings[ga], ratings[gb]
+            change = K_FACTOR * (scores[group] - 1.0 / (1.0 + 10 ** ((rb - ra) / SCALE)))
+            ratings[ga] = ra + change
+            ratings[gb] = rb - change
+        return dict(zip(user_ids.tolist(), ratings.tolist()))
+
+    @staticmethod
+    def recompute():
+        """
+        Recompute every player's rating from the full match history and
+        commit. Matches recorded while it runs are overwritten, so run it
+        when the game is quiet.
+        Returns:
+            dict with counts and timings
+        """
+        start = time.perf_counter()
+        player1, player2, scores = RatingService._load_matches()
+        loaded = time.perf_counter()
+        ratings = RatingService.replay(player1, player2, scores)
+        replayed = time.perf_counter()
+
+        db.session.execute(update(User).values(rating=INITIAL_RATING))
+        if ratings:
+            db.session.execute(update(User), [{'id': uid, 'rating': r} for uid, r in ratings.items()])
+        db.session.commit()
+
+        return {
+            'matches': len(scores),
+            'players': len(ratings),
+            'vectorized': np is not None,
+            'load_seconds': round(loaded - start, 3),
+            'replay_seconds': round(replayed - loaded, 3),
+            'write_seconds': round(time.perf_counter() - replayed, 3)
+        }
@@ -0,0 +1,176 @@
+"""
+Scheduler - Periodic maintenance jobs shared by all workers.
+
+Every gunicorn worker runs a Scheduler thread with the same jobs. A job's
+row in scheduled_job acts as a lease: a worker runs a due job only if its
+UPDATE moves next_run_at forward first (a conditional update, so exactly
+one worker wins on any database). A worker that dies mid-run just loses
+that run; the job is due again one interval later.
+
+Jobs are functions returning the number of rows they affected; each run's
+duration, rows and error are kept in the job's row, so GET /api/admin/jobs
+shows the same history from any worker.
+
+Per-worker jobs (per_worker=True) maintain state of their own process,
+such as its copy of the leaderboard: every worker runs them on its own
+clock, without a lease, and keeps their history in memory.
+"""
+
+import atexit
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models.scheduled_job import ScheduledJob
+
+
+class Job:
+    def __init__(self, name, interval, func, per_worker=False):
+        self.name = name
+        self.interval = interval  # seconds
+        self.func = func
+        self.per_worker = per_worker
+        # Schedule and latest run of a per-worker job (shared jobs keep them in scheduled_job)
+        self.next_run = None  # time.monotonic()
+        self.history = {'name': name, 'runs': 0, 'failures': 0, 'total_rows': 0}
+
+    def to_dict(self):
+        """Latest run of a per-worker job, shaped like ScheduledJob.to_dict()."""
+        return dict(self.history)
+
+
+class Scheduler:
+    """Daemon thread that runs due jobs under a database lease."""
+
+    TICK = 5.0  # Seconds between checks for due jobs
+
+    def __init__(self, app):
+        self.app = app
+        self.jobs = {}
+        self.owner = f'{socket.gethostname()}:{os.getpid()}'
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_job(self, name, interval, func, per_worker=False):
+        """
+        Register func (no arguments, returns rows affected) to run every
+        interval seconds: by one worker at a time, or with per_worker by
+        every worker.
+        """
+        self.jobs[name] = Job(name, interval, func, per_worker)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='scheduler', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.TICK):
+            try:
+                self.run_due()
+            except Exception as e:
+                print(f"Scheduler tick failed: {e}")
+
+    def run_due(self):
+        """Run every job that is due and not claimed by another worker."""
+        ran = []
+        with self.app.app_context():
+            for job in self.jobs.values():
+                if self._due(job) if job.per_worker else self._claim(job):
+                    self._execute(job)
+                    ran.append(job.name)
+        return ran
+
+    def _claim(self, job):
+        """Take the job's lease for this run. Separate transaction, like Counter.reserve."""
+        table = ScheduledJob.__table__
+        now = datetime.utcnow()
+        next_run = now + timedelta(seconds=job.interval)
+        with db.engine.begin() as conn:
+            claimed = conn.execute(
+                update(table)
+                .where(table.c.name == job.name, table.c.next_run_at <= now)
+                .values(next_run_at=next_run, owner=self.owner, last_started_at=now)
+            ).rowcount
+            if claimed or conn.execute(select(table.c.name).where(table.c.name == job.name)).first():
+                return bool(claimed)
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(table.insert().values(
+                    name=job.name, next_run_at=next_run, owner=self.owner, last_started_at=now,
+                    runs=0, failures=0, total_rows=0))
+            return True
+        except IntegrityError:
+            return False  # Another worker registered it first and runs it
+
+    def _due(self, job):
+        """Take this worker's next run of a per-worker job if it is due."""
+        now = time.monotonic()
+        if job.next_run is None:
+            job.next_run = now + job.interval  # First run one interval after startup
+            return False
+        if now < job.next_run:
+            return False
+        job.next_run = now + job.interval
+        return True
+
+    def _execute(self, job):
+        table = ScheduledJob.__table__
+        start = time.perf_counter()
+        rows, error = 0, None
+        try:
+            rows = job.func() or 0
+        except Exception:
+            db.session.rollback()
+            error = traceback.format_exc(limit=5)
+            print(f"Job {job.name} failed: {error}")
+        finally:
+            db.session.remove()
+
+        if job.per_worker:
+            history = job.history
+            history.update(owner=self.owner, last_started_at=datetime.utcnow().isoformat(),
+                           last_duration_ms=round((time.perf_counter() - start) * 1000, 2),
+                           last_rows=rows, last_error=error)
+            history['runs'] += 1
+            history['total_rows'] += rows
+            if error:
+                history['failures'] += 1
+            return
+
+        values = {
+            'last_duration_ms': (time.perf_counter() - start) * 1000,
+            'last_rows': rows,
+            'last_error': error,
+            'runs': table.c.runs + 1,
+            'total_rows': table.c.total_rows + rows
+        }
+        if error:
+            values['failures'] = table.c.failures + 1
+        with db.engine.begin() as conn:
+            conn.execute(update(table).where(table.c.name == job.name).values(**values))
+
+    def stats(self):
+        """Latest run of every job (per-worker jobs: this worker's) plus this worker's schedule."""
+        rows = {job.name: job for job in ScheduledJob.query.filter(ScheduledJob.name.in_(list(self.jobs)))}
+        for job in self.jobs.values():
+            if job.per_worker:
+                rows[job.name] = job
+        return {
+            'worker': self.owner,
+            'running': self._thread is not None and not self._stop.is_set(),
+            'jobs': [
+                dict(rows[name].to_dict() if name in rows else {'name': name, 'runs': 0},
+                     interval=job.interval, per_worker=job.per_worker)
+                for name, job in self.jobs.items()
+            ]
+        }
@@ -0,0 +1,73 @@
+"""
+Settlement - Who pays whom to even out the balances.
+
+Each member's net balance is total paid minus share owed: creditors are
+owed money, debtors owe it. settle() pairs the largest debt with the
+largest credit, transfers the smaller of the two and puts the rest back,
+using one heap per side. Every transfer clears at least one member, so n
+members need at most n - 1 transfers, found in O(n log n). Finding the
+true minimum is NP-hard (it means splitting members into zero-sum groups);
+the greedy plan is usually at or near it.
+
+Plans only change with the expenses, so SettlementCache keeps the latest
+one per worker keyed on the expense data version (BalanceService.version).
+"""
+
+import heapq
+import threading
+
+EPSILON = 0.005  # Nets and remainders below this count as settled
+
+
+def settle(balances):
+    """
+    Args:
+        balances: [{'name', 'total', 'share'}], as BalanceService.get_balances
+    Returns:
+        [{'from', 'to', 'amount'}], largest transfers first
+    """
+    # Min-heaps: the largest credit and the largest debt come out first
+    creditors, debtors = [], []
+    for person in balances:
+        net = person['total'] - person['share']
+        if net > EPSILON:
+            creditors.append((-net, person['name']))
+        elif net < -EPSILON:
+            debtors.append((net, person['name']))
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        credit, creditor = heapq.heappop(creditors)
+        debt, debtor = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+        transfers.append({'from': debtor, 'to': creditor, 'amount': round(amount, 2)})
+        if -credit - amount > EPSILON:
+            heapq.heappush(creditors, (credit + amount, creditor))
+        if -debt - amount > EPSILON:
+            heapq.heappush(debtors, (debt + amount, debtor))
+    return transfers
+
+
+class SettlementCache:
+    """The latest settlement plan of one app, valid for one expense data version."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._transfers = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version, compute):
+        """Cached transfers for version, else compute() and keep the result."""
+        with self._lock:
+            if version == self._version:
+                self.hits += 1
+                return self._transfers
+        transfers = compute()
+        with self._lock:
+            self.misses += 1
+            self._version, self._transfers = version, transfers
+        return transfers
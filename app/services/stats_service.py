@@ -2,82 +2,75 @@
 Stats service - Business logic for statistics calculations.
 """
 
-from app.models import Expense
+from flask import current_app
+from sqlalchemy import func
+from app.extensions import db
+from app.models import Expense, ExpenseParticipant
+from app.services.balance_service import BalanceService
+from app.services.settlement import settle
 
 
 class StatsService:
     """Service class for statistics operations."""
 
     @staticmethod
-    def get_overall_stats():
-        """Get overall statistics (total, count, average)."""
-        expenses = Expense.query.all()
-
-        if not expenses:
-            return {'total_amount': 0, 'total_count': 0, 'average_amount': 0}
-
-        total = sum(exp.amount for exp in expenses)
-        count = len(expenses)
-        average = total / count if count > 0 else 0
+    def get_overall_stats(date_from=None, date_to=None, name=None):
+        """
+        Get overall statistics (total, count, average) in one aggregate query.
+        Args:
+            date_from: Only expenses on or after this datetime
+            date_to: Only expenses before this datetime
+            name: Only expenses paid by this person
+        """
+        query = db.session.query(func.coalesce(func.sum(Expense.amount), 0), func.count(Expense.id))
+        if date_from is not None:
+            query = query.filter(Expense.date >= date_from)
+        if date_to is not None:
+            query = query.filter(Expense.date < date_to)
+        if name:
+            query = query.filter(Expense.name == name)
+        total, count = query.one()
 
         return {
             'total_amount': total,
             'total_count': count,
-            'average_amount': round(average, 2)
+            'average_amount': round(total / count, 2) if count else 0
         }
 
     @staticmethod
-    def get_people_stats():
-        """Get statistics per person with balance calculations."""
-        expenses = Expense.query.all()
-
-        if not expenses:
-            return []
-
-        # Get all unique member names
-        all_members = set()
-        for expense in expenses:
-            all_members.add(expense.name)
-            participants = expense.get_participants()
-            if participants:
-                for p in participants:
-                    all_members.add(p)
-
-        # Initialize stats for all members
-        people_stats = {}
-        for name in all_members:
-            people_stats[name] = {
-                'name': name,
-                'total': 0,      # Total amount this person paid
-                'count': 0,      # Number of payments made
-                'share': 0,      # Total share this person owes
-                'expenses': []
-            }
-
-        # Calculate stats
-        for expense in expenses:
-            exp_dict = expense.to_dict()
-            name = expense.name
-
-            # Add to payer's total
-            people_stats[name]['total'] += expense.amount
-            people_stats[name]['count'] += 1
-            people_stats[name]['expenses'].append(exp_dict)
-
-            # Calculate share: if participants is null, split among all members
-            participants = expense.get_participants() or list(all_members)
-            share_per_person = expense.amount / len(participants) if participants else 0
-
-            for participant in participants:
-                if participant in people_stats:
-                    people_stats[participant]['share'] += share_per_person
-
-        # Sort by total spending (descending)
-        result = list(people_stats.values())
-        result.sort(key=lambda x: x['total'], reverse=True)
+    def get_people_stats(include_expenses=True):
+        """
+        Get statistics per person with balance calculations: total paid,
+        payment count and share owed, read from the balances maintained by
+        BalanceService.
+        Args:
+            include_expenses: Also list each person's payments ('expenses');
+                False skips the per-expense listing
+        """
+        result = BalanceService.get_balances()
+
+        if include_expenses:
+            by_payer = {}
+            for expense in Expense.query.order_by(Expense.id):
+                by_payer.setdefault(expense.name, []).append(expense.to_dict())
+            for person in result:
+                person['expenses'] = by_payer.get(person['name'], [])
 
         return result
 
+    @staticmethod
+    def get_settlement():
+        """
+        Transfers that settle all balances (app.services.settlement),
+        cached until the expenses change.
+        Returns:
+            dict with version (expense data version) and transfers
+        """
+        version = BalanceService.version()
+        transfers = current_app.extensions['settlement_cache'].get(
+            version, lambda: settle(BalanceService.get_balances()))
+        return {'version': version, 'transfers': transfers}
+
     @staticmethod
     def get_person_stats(name):
         """Get statistics for a specific person."""
@@ -94,3 +87,38 @@ class StatsService:
             'total': total,
             'count': len(expenses)
         }
+
+    @staticmethod
+    def get_participations(name, limit, before=None):
+        """
+        Expenses that list a person as participant, newest first, found
+        through the member index of expense_participant. Expenses split
+        among all members are not listed.
+        Args:
+            name: Participant name
+            limit: Page size
+            before: Only expenses with a smaller id (keyset pagination)
+        Returns:
+            dict with total (participations in all), participations
+            (expense dicts with the person's 'share') and next_before
+        """
+        by_member = ExpenseParticipant.member == name
+        total = db.session.query(func.count(ExpenseParticipant.expense_id)).filter(by_member).scalar()
+
+        query = Expense.query.join(ExpenseParticipant, ExpenseParticipant.expense_id == Expense.id).filter(by_member)
+        if before is not None:
+            query = query.filter(ExpenseParticipant.expense_id < before)
+        expenses = query.order_by(ExpenseParticipant.expense_id.desc()).limit(limit).all()
+
+        participations = []
+        for expense in expenses:
+            data = expense.to_dict()
+            data['share'] = expense.amount / len(data['participants'])
+            participations.append(data)
+
+        return {
+            'name': name,
+            'total': total,
+            'participations': participations,
+            'next_before': expenses[-1].id if len(expenses) == limit else None
+        }
@@ -3,13 +3,24 @@ UserService - Business logic for user operations.
 """
 
 from datetime import datetime
+from flask import current_app
+from sqlalchemy import case, update
 from app.extensions import db
 from app.models.user import User
+from app.services.leaderboard import DEFAULT_ORDER, record_stats, record_values
+from app.utils.cache import TTLCache
 
 
 class UserService:
     """Service class for user operations."""
 
+    # Identity snapshots (id, username, avatar_url) for hot paths such as
+    # lobby heartbeats and invites, so they don't hit the database every
+    # time. Stats and rating change with every match and are always read live
+    PROFILE_CACHE_SIZE = 1024
+    PROFILE_CACHE_TTL = 60  # seconds
+    _profile_cache = TTLCache(PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL)
+
     @staticmethod
     def create(username, password, avatar_url=None):
         """Create a new user."""
@@ -20,7 +31,10 @@ class UserService:
         user.set_password(password)
 
         db.session.add(user)
+        db.session.flush()
+        record_stats(user)
         db.session.commit()
+        UserService._profile_cache.invalidate(user.id)
         return user
 
     @staticmethod
@@ -37,34 +51,134 @@ class UserService:
     def get_by_id(user_id):
         return User.query.get(user_id)
 
+    @staticmethod
+    def get_profile(user_id):
+        """
+        Get a cached identity snapshot of a user (no stats).
+        Returns:
+            dict with id, username, avatar_url, created_at, or None if not found
+        """
+        profile = UserService._profile_cache.get(user_id)
+        if profile is None:
+            user = User.query.get(user_id)
+            if not user:
+                return None
+            profile = user.to_dict(include_stats=False)
+            UserService._profile_cache.set(user_id, profile)
+        return profile
+
+    @staticmethod
+    def profile_cache_stats():
+        """Hit/miss counters of the profile cache (this process only)."""
+        return UserService._profile_cache.stats()
+
     @staticmethod
     def get_by_username(username):
         return User.query.filter_by(username=username).first()
 
+    # Result names of update_stats() / update_stats_bulk() -> counter columns
+    STAT_COLUMNS = {'win': 'total_wins', 'loss': 'total_losses', 'draw': 'total_draws'}
+
     @staticmethod
     def update_stats(user_id, result):
         """Update user stats after a match. Result: 'win', 'loss', 'draw'"""
-        user = User.query.get(user_id)
-        if not user:
+        if result in UserService.STAT_COLUMNS:
+            UserService.update_stats_bulk({user_id: {result: 1}})
+
+    @staticmethod
+    def record_result(winner_id, loser_id, commit=True, rating_changes=None):
+        """Count a win for winner_id and a loss for loser_id in one UPDATE (see update_stats_bulk)."""
+        UserService.update_stats_bulk({winner_id: {'win': 1}, loser_id: {'loss': 1}}, commit=commit,
+                                      rating_changes=rating_changes)
+
+    @staticmethod
+    def update_stats_bulk(deltas, commit=True, rating_changes=None):
+        """
+        Apply stat increments for several users as one atomic statement:
+        UPDATE game_user SET total_wins = total_wins + CASE id ... END, ...
+        so concurrent matches never lose an increment. Rating changes
+        (RatingService.rate_matches, which reads the ratings beforehand)
+        are added by the same statement: rating = rating + CASE id ... END.
+        Args:
+            deltas: {user_id: {'win': n, 'loss': n, 'draw': n}}
+            commit: False to leave the commit to the caller's transaction;
+                the caller then calls invalidate_profiles() after committing
+            rating_changes: {user_id: rating change}, or None
+        The leaderboard picks up the new totals and ratings (read back with
+        RETURNING) when the transaction commits.
+        """
+        if not deltas and not rating_changes:
             return
 
-        if result == 'win':
-            user.total_wins += 1
-        elif result == 'loss':
-            user.total_losses += 1
-        elif result == 'draw':
-            user.total_draws += 1
+        values = {'last_active': datetime.utcnow()}
+        for result, column in UserService.STAT_COLUMNS.items():
+            increments = {user_id: d[result] for user_id, d in deltas.items() if d.get(result)}
+            if increments:
+                values[column] = getattr(User, column) + case(increments, value=User.id, else_=0)
+        if rating_changes:
+            values['rating'] = User.rating + case(rating_changes, value=User.id, else_=0.0)
+
+        user_ids = set(deltas) | set(rating_changes or ())
+        rows = db.session.execute(
+            update(User).where(User.id.in_(user_ids)).values(**values)
+            .returning(User.id, User.total_wins, User.total_losses, User.rating)
+            .execution_options(synchronize_session='fetch')
+        ).all()
+        for row in rows:
+            record_values(*row)
+
+        if commit:
+            db.session.commit()
+            UserService.invalidate_profiles(user_ids)
 
-        user.last_active = datetime.utcnow()
-        db.session.commit()
+    @staticmethod
+    def invalidate_profiles(user_ids):
+        """Drop cached profiles after their users' rows changed."""
+        for user_id in user_ids:
+            UserService._profile_cache.invalidate(user_id)
+
+    @staticmethod
+    def _leaderboard():
+        return current_app.extensions['leaderboard']
+
+    @staticmethod
+    def _users_in_order(user_ids):
+        users = {u.id: u for u in User.query.filter(User.id.in_(user_ids))} if user_ids else {}
+        return [users[user_id] for user_id in user_ids if user_id in users]
+
+    @staticmethod
+    def get_leaderboard(limit=20, offset=0, order=DEFAULT_ORDER):
+        """
+        Get players ranked offset+1 .. offset+limit.
+        Args:
+            order: 'wins' (win count) or 'rating' (leaderboard.ORDERS)
+        Returns:
+            list of (rank, User)
+        """
+        user_ids = UserService._leaderboard().top(limit, offset, order)
+        users = UserService._users_in_order(user_ids)
+        return list(enumerate(users, offset + 1))
+
+    @staticmethod
+    def get_leaderboard_around(user_id, limit=20, order=DEFAULT_ORDER):
+        """
+        Get a leaderboard page centered on a player.
+        Returns:
+            list of (rank, User), empty if the player is unknown
+        """
+        offset, user_ids = UserService._leaderboard().around(user_id, limit, order)
+        if offset is None:
+            return []
+        return list(enumerate(UserService._users_in_order(user_ids), offset + 1))
+
+    @staticmethod
+    def get_rank(user_id, order=DEFAULT_ORDER):
+        """1-based leaderboard rank of a player, or None."""
+        return UserService._leaderboard().rank(user_id, order)
 
     @staticmethod
-    def get_leaderboard(limit=20):
-        """Get top players by win count."""
-        return User.query.order_by(
-            User.total_wins.desc(),
-            User.total_losses.asc()
-        ).limit(limit).all()
+    def count_ranked():
+        return UserService._leaderboard().count()
 
     @staticmethod
     def update_profile(user_id, avatar_url=None):
@@ -77,6 +191,7 @@ class UserService:
             user.avatar_url = avatar_url
 
         db.session.commit()
+        UserService._profile_cache.invalidate(user_id)
         return user
 
 
@@ -1,29 +1,91 @@
-/* ============ MULTIPLAYER LOBBY (Polling-based, no WebSocket) ============ */
+/* ============ MULTIPLAYER LOBBY (Server-Sent Events, polling fallback) ============ */
 
 let onlinePlayers = [];
+let onlineVersion = null;
+let onlineTotal = 0;
 let pendingInviteId = null;
 let selectedBestOf = 3;
 let pollingInterval = null;
+let lobbyEvents = null;
 let isInLobby = false;
 
-// Start polling when entering games tab
+const ONLINE_PAGE_SIZE = 100;
+
+// Start listening when entering games tab
 function initLobbySocket() {
     if (isInLobby) return;
     isInLobby = true;
 
-    console.log('Starting lobby polling...');
-
     // Initial fetch
     fetchOnlinePlayers();
     sendHeartbeat();
 
-    // Poll every 3 seconds
+    if (openLobbyEvents()) {
+        // Changes are pushed; heartbeats only keep us online
+        startLobbyPolling(false);
+    } else {
+        startLobbyPolling(true);
+    }
+}
+
+// Heartbeat every 15 seconds, or heartbeat + online list every 3 seconds
+function startLobbyPolling(withOnlineList) {
+    if (pollingInterval) clearInterval(pollingInterval);
+
     pollingInterval = setInterval(() => {
         if (isInLobby) {
             sendHeartbeat();
-            fetchOnlinePlayers();
+            if (withOnlineList) fetchOnlinePlayers();
         }
-    }, 3000);
+    }, withOnlineList ? 3000 : 15000);
+}
+
+// Subscribe to /api/lobby/events. Returns false if the browser can't.
+function openLobbyEvents() {
+    if (!window.EventSource) return false;
+
+    console.log('Opening lobby event stream...');
+    lobbyEvents = new EventSource('/api/lobby/events', { withCredentials: true });
+
+    // (Re)connected: catch up on anything missed while disconnected
+    lobbyEvents.onopen = () => fetchOnlinePlayers();
+
+    lobbyEvents.onerror = () => {
+        // CLOSED means the server refused the stream: fall back to polling
+        if (lobbyEvents && lobbyEvents.readyState === EventSource.CLOSED) {
+            lobbyEvents = null;
+            if (isInLobby) startLobbyPolling(true);
+        }
+    };
+
+    lobbyEvents.addEventListener('online', (e) => {
+        const player = JSON.parse(e.data);
+        const others = onlinePlayers.filter(p => p.id !== player.id);
+        // A player already listed (e.g. replayed event) is not a new one
+        if (others.length === onlinePlayers.length) onlineTotal += 1;
+        onlinePlayers = others.concat([player]);
+        renderOnlinePlayers();
+    });
+
+    lobbyEvents.addEventListener('offline', (e) => {
+        const data = JSON.parse(e.data);
+        onlinePlayers = onlinePlayers.filter(p => p.id !== data.id);
+        onlineTotal = Math.max(0, onlineTotal - 1);
+        renderOnlinePlayers();
+    });
+
+    lobbyEvents.addEventListener('invite', (e) => {
+        const invite = JSON.parse(e.data);
+        if (invite.invite_id !== pendingInviteId) {
+            showInviteToast(invite);
+        }
+    });
+
+    lobbyEvents.addEventListener('redirect', (e) => {
+        window.location.href = JSON.parse(e.data).redirect;
+    });
+
+    return true;
 }
 
 // Stop polling when leaving games tab
@@ -33,6 +95,10 @@ function stopLobbyPolling() {
         clearInterval(pollingInterval);
         pollingInterval = null;
     }
+    if (lobbyEvents) {
+        lobbyEvents.close();
+        lobbyEvents = null;
+    }
 
     // Notify server we're leaving
     fetch('/api/lobby/leave', {
@@ -71,15 +137,24 @@ async function sendHeartbeat() {
     }
 }
 
-// Fetch online players list
+// Fetch online players: the first page once, then only who joined/left
+// since our presence version (304 when nobody did)
 async function fetchOnlinePlayers() {
     try {
-        const res = await fetch('/api/lobby/online', { credentials: 'include' });
-        if (res.ok) {
-            const data = await res.json();
+        const query = onlineVersion !== null ? `?since_version=${onlineVersion}` : `?limit=${ONLINE_PAGE_SIZE}`;
+        const res = await fetch(`/api/lobby/online${query}`, { credentials: 'include' });
+        if (res.status === 304 || !res.ok) return;
+
+        const data = await res.json();
+        if (data.delta) {
+            const changed = new Set(data.added.map(p => p.id).concat(data.removed));
+            onlinePlayers = onlinePlayers.filter(p => !changed.has(p.id)).concat(data.added);
+        } else {
             onlinePlayers = data.users || [];
-            renderOnlinePlayers();
         }
+        onlineVersion = data.version;
+        onlineTotal = data.count;
+        renderOnlinePlayers();
     } catch (e) {
         console.error('Failed to fetch online players:', e);
     }
@@ -91,7 +166,7 @@ function renderOnlinePlayers() {
 
     if (!grid || !count) return;
 
-    count.textContent = onlinePlayers.length + ' online';
+    count.textContent = Math.max(onlineTotal, onlinePlayers.length) + ' online';
 
     if (onlinePlayers.length === 0) {
         grid.innerHTML = `
@@ -291,9 +366,9 @@ async function loadLeaderboard() {
         const res = await fetch('/api/game/stats/leaderboard', { credentials: 'include' });
         const data = res.ok ? await res.json() : [];
 
-        document.getElementById('leaderboard').innerHTML = data.length ? data.map((u, i) => `
+        document.getElementById('leaderboard').innerHTML = data.length ? data.map(u => `
             <tr>
-                <td class="${i < 3 ? 'rank-' + (i+1) : ''}">${i + 1}</td>
+                <td class="${u.rank <= 3 ? 'rank-' + u.rank : ''}">${u.rank}</td>
                 <td>${u.username}</td>
                 <td>${u.total_wins}</td>
                 <td>${u.total_losses}</td>
@@ -2,12 +2,13 @@
 Utils package - Helper functions and decorators.
 """
 
-from app.utils.decorators import login_required, password_required
+from app.utils.decorators import login_required, password_required, admin_required
 from app.utils.responses import success_response, error_response, data_response
 
 __all__ = [
     'login_required',
     'password_required',
+    'admin_required',
     'success_response',
     'error_response',
     'data_response'
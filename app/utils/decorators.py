@@ -4,7 +4,7 @@ Custom decorators for route protection and database operations.
 
 import time
 from functools import wraps
-from flask import session
+from flask import current_app, session
 from sqlalchemy.exc import OperationalError, DisconnectionError
 from app.utils.responses import error_response
 
@@ -29,6 +29,22 @@ def password_required(f):
     return decorated_function
 
 
+def admin_required(f):
+    """Decorator to require a user listed in ADMIN_USERNAMES."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        user_id = session.get('user_id')
+        if not user_id:
+            return error_response('Chưa đăng nhập', 401)
+        from app.services import UserService
+
+        profile = UserService.get_profile(user_id)
+        if not profile or profile['username'] not in current_app.config['ADMIN_USERNAMES']:
+            return error_response('Không có quyền truy cập', 403)
+        return f(*args, **kwargs)
+    return decorated_function
+
+
 def db_retry(max_retries=3, delay=0.5):
     """Decorator to retry database operations on connection errors."""
     def decorator(f):
@@ -0,0 +1,123 @@
+"""
+Order-statistics index: a sorted collection with positional lookups.
+"""
+
+from bisect import bisect_left, insort
+
+
+class RankIndex:
+    """
+    Sorted set of comparable keys supporting insert, remove, rank-of-key and
+    key-at-position in O(log n) (plus a bounded list shift per bucket).
+
+    Keys live in sorted buckets of at most 2 * LOAD entries; a Fenwick tree
+    over the bucket sizes turns positions into (bucket, offset) pairs. Not
+    thread-safe: callers hold their own lock.
+    """
+
+    LOAD = 512
+
+    def __init__(self, keys=()):
+        self._build(sorted(keys))
+
+    def _build(self, keys):
+        self._buckets = [keys[i:i + self.LOAD] for i in range(0, len(keys), self.LOAD)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        self._len = len(keys)
+        self._rebuild_tree()
+
+    def _rebuild_tree(self):
+        tree = [0] + [len(bucket) for bucket in self._buckets]
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, bucket, delta):
+        i = bucket + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _tree_prefix(self, bucket):
+        """Number of keys in buckets before this one."""
+        total, i = 0, bucket
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _tree_locate(self, position):
+        """(bucket, offset) of the key at position."""
+        bucket, step = 0, 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            nxt = bucket + step
+            if nxt < len(self._tree) and self._tree[nxt] <= position:
+                bucket = nxt
+                position -= self._tree[nxt]
+            step >>= 1
+        return bucket, position
+
+    def __len__(self):
+        return self._len
+
+    def __contains__(self, key):
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            return False
+        bucket = self._buckets[i]
+        j = bisect_left(bucket, key)
+        return j < len(bucket) and bucket[j] == key
+
+    def add(self, key):
+        if not self._buckets:
+            self._build([key])
+            return
+        i = min(bisect_left(self._maxes, key), len(self._buckets) - 1)
+        bucket = self._buckets[i]
+        insort(bucket, key)
+        self._maxes[i] = bucket[-1]
+        self._len += 1
+        if len(bucket) > 2 * self.LOAD:
+            self._buckets[i:i + 1] = [bucket[:self.LOAD], bucket[self.LOAD:]]
+            self._maxes[i:i + 1] = [bucket[self.LOAD - 1], bucket[-1]]
+            self._rebuild_tree()
+        else:
+            self._tree_add(i, 1)
+
+    def discard(self, key):
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            return
+        bucket = self._buckets[i]
+        j = bisect_left(bucket, key)
+        if j == len(bucket) or bucket[j] != key:
+            return
+        del bucket[j]
+        self._len -= 1
+        if bucket:
+            self._maxes[i] = bucket[-1]
+            self._tree_add(i, -1)
+        else:
+            del self._buckets[i], self._maxes[i]
+            self._rebuild_tree()
+
+    def rank(self, key):
+        """0-based position of key (or of where it would be inserted)."""
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            return self._len
+        return self._tree_prefix(i) + bisect_left(self._buckets[i], key)
+
+    def slice(self, start, stop):
+        """Keys at positions start..stop-1."""
+        start, stop = max(start, 0), min(stop, self._len)
+        if start >= stop:
+            return []
+        bucket, offset = self._tree_locate(start)
+        keys = []
+        while len(keys) < stop - start:
+            keys.extend(self._buckets[bucket][offset:offset + stop - start - len(keys)])
+            bucket, offset = bucket + 1, 0
+        return keys
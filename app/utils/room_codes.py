@@ -0,0 +1,78 @@
+"""
+Room codes - Unique 6-character room codes without lookup queries.
+
+A code is a keyed permutation of a counter value, written in base 36.
+Counter values are never handed out twice and the permutation is a
+bijection on [0, 36^6), so two rooms only share a code if the counter
+wraps or the key changes; callers keep a unique-constraint retry for that.
+Counter values are reserved in blocks, so one reservation round trip
+covers BLOCK_SIZE rooms.
+"""
+
+import hashlib
+import string
+import threading
+
+ALPHABET = string.ascii_uppercase + string.digits
+CODE_LENGTH = 6
+CODE_SPACE = len(ALPHABET) ** CODE_LENGTH  # 2,176,782,336
+
+_HALF_BITS = 16
+_HALF_MASK = (1 << _HALF_BITS) - 1
+_ROUNDS = 4
+
+
+class RoomCodeAllocator:
+    """
+    Hands out codes from counter blocks. Thread-safe.
+    Args:
+        key: Secret for the permutation (str or bytes)
+        reserve: reserve(count) -> first value of a fresh block of count
+            counter values, unique across processes
+    """
+
+    BLOCK_SIZE = 100
+
+    def __init__(self, key, reserve, block_size=BLOCK_SIZE):
+        if isinstance(key, str):
+            key = key.encode()
+        self._key = hashlib.blake2b(key, digest_size=16).digest()
+        self._reserve = reserve
+        self._block_size = block_size
+        self._next = self._end = 0
+        self._lock = threading.Lock()
+
+    def next_code(self):
+        """Return the next room code."""
+        with self._lock:
+            if self._next >= self._end:
+                self._next = self._reserve(self._block_size)
+                self._end = self._next + self._block_size
+            value = self._next
+            self._next += 1
+        return self.code_for(value)
+
+    def code_for(self, value):
+        """Code of a counter value."""
+        n = self._permute(value % CODE_SPACE)
+        chars = []
+        for _ in range(CODE_LENGTH):
+            n, digit = divmod(n, len(ALPHABET))
+            chars.append(ALPHABET[digit])
+        return ''.join(reversed(chars))
+
+    def _round(self, i, half):
+        digest = hashlib.blake2b(bytes((i,)) + half.to_bytes(2, 'big'),
+                                 key=self._key, digest_size=2).digest()
+        return int.from_bytes(digest, 'big')
+
+    def _permute(self, n):
+        # Feistel network over 32 bits, cycle-walked until the result falls
+        # back inside [0, CODE_SPACE): a bijection on that range
+        while True:
+            left, right = n >> _HALF_BITS, n & _HALF_MASK
+            for i in range(_ROUNDS):
+                left, right = right, left ^ self._round(i, right)
+            n = (left << _HALF_BITS) | right
+            if n < CODE_SPACE:
+                return n
@@ -0,0 +1,25 @@
+"""
+Rebuild the per-player game stats rollups (streaks, head-to-head records,
+choice counts) from the existing match history.
+Run this script once after updating the codebase, or whenever the rollups
+need rebuilding.
+"""
+
+import sys
+from app import create_app
+from app.services import GameStatsService
+
+
+def backfill(batch_size=None):
+    app = create_app()
+
+    with app.app_context():
+        print('Rebuilding game stats rollups...')
+        result = GameStatsService.backfill(batch_size)
+        print(f"Processed {result['matches']} matches in {result['batches']} batches: "
+              f"{result['players']} players, {result['head_to_head_rows']} head-to-head records "
+              f"({result['seconds']} s)")
+
+
+if __name__ == '__main__':
+    backfill(int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -0,0 +1,6 @@
+"""
+Benchmarks - Standalone performance scripts.
+
+Run from the project root, e.g. `python -m benchmarks.lobby_expiry`.
+They use the 'testing' config (in-memory SQLite, in-memory lobby store).
+"""
@@ -0,0 +1,105 @@
+"""
+Latency and memory of the expense statistics endpoints vs. table size.
+
+Fills a temporary SQLite database with N random expenses (10 members,
+a third of them with one of 30 explicit participant lists) and times each
+endpoint through the Flask test client: median of --repeat calls, plus
+the peak Python memory of one call (tracemalloc). Sizes grow
+cumulatively, so one run covers e.g. 1k, 10k and 100k rows.
+
+Usage:
+    python -m benchmarks.expense_stats [--sizes 1000,10000,100000] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+os.environ.setdefault('FLASK_ENV', 'testing')
+
+from config import config, TestingConfig  # noqa: E402
+from app import create_app  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models import Expense  # noqa: E402
+
+MEMBERS = [f'member{i}' for i in range(10)]
+# Participant lists come from the member checkboxes, so they repeat in member order
+PARTICIPANT_SETS = [json.dumps(sorted(random.Random(i).sample(MEMBERS, random.Random(i).randint(2, 9))))
+                    for i in range(30)]
+START = datetime(2024, 1, 1)
+INSERT_CHUNK = 10000
+
+ENDPOINTS = [
+    '/api/stats',
+    '/api/stats?from=2024-06-01&to=2024-06-30',
+    '/api/stats?name=member3',
+]
+
+
+def build_app():
+    path = os.path.join(tempfile.mkdtemp(), 'expense-stats.db')
+    config['expense_stats'] = type('ExpenseStatsConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'
+    })
+    return create_app('expense_stats')
+
+
+def random_expense():
+    return {
+        'name': random.choice(MEMBERS),
+        'amount': round(random.uniform(10, 500), 2) * 1000,
+        'purpose': 'benchmark',
+        'date': START + timedelta(minutes=random.randrange(365 * 24 * 60)),
+        'participants': random.choice(PARTICIPANT_SETS) if random.random() < 1 / 3 else None
+    }
+
+
+def fill(app, count):
+    with app.app_context():
+        for start in range(0, count, INSERT_CHUNK):
+            db.session.execute(Expense.__table__.insert(),
+                               [random_expense() for _ in range(min(INSERT_CHUNK, count - start))])
+        db.session.commit()
+
+
+def measure(client, path, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        res = client.get(path)
+        times.append((time.perf_counter() - start) * 1000)
+        assert res.status_code == 200, f'{path}: {res.status_code}'
+
+    tracemalloc.start()
+    client.get(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(times), peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = build_app()
+    client = app.test_client()
+    rows = 0
+    print(f"{'rows':>9}  {'endpoint':<45} {'median ms':>10} {'peak MB':>8}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        fill(app, size - rows)
+        rows = size
+        for path in ENDPOINTS:
+            ms, mb = measure(client, path, args.repeat)
+            print(f'{rows:>9}  {path:<45} {ms:>10.2f} {mb:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
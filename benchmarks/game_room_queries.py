@@ -0,0 +1,160 @@
+"""
+Query and commit count of GameRoomService.make_choice, plus a race check.
+
+1. Plays one best-of-3 match and counts the SQL statements and commits of
+   each make_choice call: a plain choice, a choice that completes a round
+   and the one that completes the match. Each must commit exactly once.
+2. Plays matches where both players submit every round at the same moment
+   (two threads released by a barrier) and checks that every round was
+   resolved, scores match the rounds, and the match was recorded once with
+   stats updated once per player.
+
+Runs on a temporary SQLite file, so the threads really use separate
+connections (the in-memory test database shares one).
+
+Usage:
+    python -m benchmarks.game_room_queries [--matches 20]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+from collections import Counter
+
+os.environ.setdefault('FLASK_ENV', 'testing')
+
+from sqlalchemy import event  # noqa: E402
+from config import config, TestingConfig  # noqa: E402
+from app import create_app  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models import GameMatch, GameRound, User  # noqa: E402
+from app.services import UserService  # noqa: E402
+from app.services.game_room_service import GameRoomService  # noqa: E402
+
+CHOICES = ['rock', 'paper', 'scissors']
+
+
+def build_app():
+    path = os.path.join(tempfile.mkdtemp(), 'game-room.db')
+    config['game_room_queries'] = type('GameRoomQueriesConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'
+    })
+    return create_app('game_room_queries')
+
+
+def new_room(host_id, guest_id, best_of=3):
+    room = GameRoomService.create_room(host_id, best_of)
+    GameRoomService.join_room(room.room_code, guest_id)
+    return room.id
+
+
+class Counts:
+    def __init__(self, engine):
+        self.queries = self.commits = 0
+        event.listen(engine, 'before_cursor_execute', self.on_query)
+        event.listen(engine, 'commit', self.on_commit)
+
+    def on_query(self, *args):
+        self.queries += 1
+
+    def on_commit(self, *args):
+        self.commits += 1
+
+    def measure(self, fn, *args):
+        before = self.queries, self.commits
+        result = fn(*args)
+        return result, self.queries - before[0], self.commits - before[1]
+
+
+def count_queries(app, host_id, guest_id):
+    with app.app_context():
+        room_id = new_room(host_id, guest_id)
+        counts = Counts(db.engine)
+        print(f"{'call':<40} {'queries':>7} {'commits':>7}")
+        # host wins 2-0: (rock, scissors) twice
+        for label, user_id, choice in [
+            ('choice, waiting for opponent', host_id, 'rock'),
+            ('choice completing a round', guest_id, 'scissors'),
+            ('choice, waiting for opponent', host_id, 'rock'),
+            ('choice completing the match', guest_id, 'scissors'),
+        ]:
+            db.session.remove()  # Each call as a fresh request
+            result, queries, commits = counts.measure(GameRoomService.make_choice, room_id, user_id, choice)
+            print(f'{label:<40} {queries:>7} {commits:>7}   -> {result["status"]}')
+            assert commits == 1, f'{label}: {commits} commits'
+        assert result['status'] == 'match_complete'
+
+
+def race(app, users, matches):
+    host_id, guest_id = users
+    with app.app_context():
+        before = {u.id: (u.total_wins, u.total_losses) for u in User.query.filter(User.id.in_(users))}
+        room_ids = [new_room(host_id, guest_id, best_of=5) for _ in range(matches)]
+        db.session.remove()
+
+    errors = Counter()
+
+    def submit(barrier, room_id, user_id, choice, results):
+        barrier.wait()
+        with app.app_context():
+            try:
+                results.append(GameRoomService.make_choice(room_id, user_id, choice)['status'])
+            except ValueError as e:
+                errors[str(e)] += 1
+                results.append('error')
+
+    for room_id in room_ids:
+        while True:
+            with app.app_context():
+                room = GameRoomService.get_room_by_id(room_id)
+                if room.status != 'playing':
+                    break
+            barrier, results = threading.Barrier(2), []
+            threads = [threading.Thread(target=submit, args=(barrier, room_id, uid, choice, results))
+                       for uid, choice in ((host_id, 'rock'), (guest_id, random.choice(CHOICES)))]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            assert results.count('waiting') == 1, f'both submissions saw a waiting round: {results}'
+
+    with app.app_context():
+        wins = Counter()
+        for room_id in room_ids:
+            room = GameRoomService.get_room_by_id(room_id)
+            rounds = GameRound.query.filter_by(room_id=room_id).order_by(GameRound.round_number).all()
+            assert all(r.result for r in rounds), 'unresolved round'
+            results = Counter(r.result for r in rounds)
+            assert (results['host'], results['guest']) == (room.host_score, room.guest_score)
+            wins[room.winner_id] += 1
+
+        matches_saved = GameMatch.query.count()
+        after = {u.id: (u.total_wins, u.total_losses) for u in User.query.filter(User.id.in_(users))}
+        for uid in users:
+            gained = after[uid][0] - before[uid][0], after[uid][1] - before[uid][1]
+            assert gained == (wins[uid], matches - wins[uid]), f'stats of user {uid}: {gained}'
+
+    print(f'\n{matches} raced matches: every round resolved, {matches_saved} matches saved in total, '
+          f'stats consistent' + (f', rejected: {dict(errors)}' if errors else ''))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--matches', type=int, default=20)
+    args = parser.parse_args()
+
+    app = build_app()
+    with app.app_context():
+        users = []
+        for name in ('queries_host', 'queries_guest'):
+            user = UserService.get_by_username(name) or UserService.create(name, 'pass')
+            users.append(user.id)
+
+    count_queries(app, *users)
+    race(app, users, args.matches)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Open /api/lobby/events streams against a running server.
+
+Opens --streams SSE connections (spread over --users logged-in players)
+and keeps them open, then has one more player leave and rejoin the lobby
+--rounds times. Each rejoin is an 'online' event for every stream; the
+report shows how many streams were accepted (vs. 503), how long the
+fan-out to all of them took, and the latency of ordinary requests while
+the streams are open.
+
+Start the server the way the Procfile does, e.g.:
+    gunicorn -c gunicorn.conf.py --bind 127.0.0.1:8000 run:app
+
+Usage:
+    python -m benchmarks.lobby_events --url http://127.0.0.1:8000 [--streams 300]
+        [--users 10] [--rounds 5]
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.lobby_load import HttpTransport
+
+READ_TIMEOUT = 60
+
+
+class Listener(threading.Thread):
+    """One open event stream; records when each 'online' event arrived."""
+
+    def __init__(self, transport, watched):
+        super().__init__(daemon=True)
+        self.transport = transport
+        self.watched = watched
+        self.status = None
+        self.opened = threading.Event()
+        self.arrivals = []
+        self.lock = threading.Lock()
+
+    def run(self):
+        req = urllib.request.Request(self.transport.base_url + '/api/lobby/events')
+        try:
+            res = self.transport.opener.open(req, timeout=READ_TIMEOUT)
+        except urllib.error.HTTPError as e:
+            self.status = e.code
+            self.opened.set()
+            return
+        except OSError:
+            self.status = 0
+            self.opened.set()
+            return
+        self.status = res.status
+        self.opened.set()
+        event = None
+        with res:
+            for raw in res:
+                line = raw.decode().rstrip('\n')
+                if line.startswith('event: '):
+                    event = line[7:]
+                elif line.startswith('data: ') and event == 'online':
+                    if json.loads(line[6:]).get('id') == self.watched:
+                        with self.lock:
+                            self.arrivals.append(time.perf_counter())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', required=True, help='base URL of a running server')
+    parser.add_argument('--streams', type=int, default=300)
+    parser.add_argument('--users', type=int, default=10, help='players the streams are spread over')
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    users = [HttpTransport(args.url, f'events{i}') for i in range(args.users)]
+    actor = HttpTransport(args.url, 'events-actor')
+    actor.request('POST', '/api/lobby/leave')
+
+    listeners = [Listener(users[i % args.users], actor.user_id) for i in range(args.streams)]
+    start = time.perf_counter()
+    for listener in listeners:
+        listener.start()
+    for listener in listeners:
+        listener.opened.wait(READ_TIMEOUT)
+    accepted = [listener for listener in listeners if listener.status == 200]
+    refused = sum(1 for listener in listeners if listener.status == 503)
+    print(f'{len(accepted)}/{args.streams} streams open ({refused} refused with 503) '
+          f'in {time.perf_counter() - start:.2f} s')
+
+    fanouts, requests = [], []
+    for _ in range(args.rounds):
+        sent = time.perf_counter()
+        status, _ = users[0].request('GET', '/api/lobby/online')
+        requests.append((time.perf_counter() - sent) * 1000)
+        assert status == 200, f'/online answered {status}'
+
+        expected = len(accepted[0].arrivals) + 1 if accepted else 0
+        sent = time.perf_counter()
+        actor.request('POST', '/api/lobby/heartbeat')
+        deadline = sent + 10
+        while time.perf_counter() < deadline:
+            if all(len(listener.arrivals) >= expected for listener in accepted):
+                break
+            time.sleep(0.01)
+        arrivals = [listener.arrivals[expected - 1] for listener in accepted if len(listener.arrivals) >= expected]
+        missing = len(accepted) - len(arrivals)
+        fanouts.append((max(arrivals) - sent) * 1000 if arrivals else float('nan'))
+        print(f"'online' reached {len(arrivals)}/{len(accepted)} streams in {fanouts[-1]:.0f} ms"
+              + (f' ({missing} missed)' if missing else ''))
+        actor.request('POST', '/api/lobby/leave')
+        time.sleep(0.5)
+
+    print(f'\nfan-out to all streams: median {statistics.median(fanouts):.0f} ms; '
+          f'GET /api/lobby/online with the streams open: median {statistics.median(requests):.1f} ms')
+    assert refused == 0, 'streams were refused'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Lobby expiry benchmark.
+
+Fills the lobby store with N online users, N rooms and N/2 invites (a slice
+of each already past its deadline), then measures:
+- latency of the lobby routes that used to run cleanup() inline
+- one background sweep pass (heap / deadline index: expired entries only)
+- a full scan over every entry, i.e. what the old cleanup() paid per request
+
+Usage:
+    python -m benchmarks.lobby_expiry [--sizes 100,1000,10000] [--store memory|sqlite]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault('FLASK_ENV', 'testing')
+
+from app import create_app  # noqa: E402
+from app.services import UserService  # noqa: E402
+from app.services.lobby_store import (  # noqa: E402
+    ONLINE_TIMEOUT, INVITE_TIMEOUT, ROOM_TIMEOUT, MemoryLobbyStore, SQLiteLobbyStore
+)
+
+REQUESTS = 200
+EXPIRED_SHARE = 0.05  # fraction of entries already expired when the sweep runs
+
+
+def build_app(store, size):
+    app = create_app('testing')
+    # Sweeps are timed explicitly below
+    app.extensions['lobby_store'].stop_sweeper()
+    if store == 'sqlite':
+        path = os.path.join(tempfile.mkdtemp(), f'lobby-{size}.db')
+        app.extensions['lobby_store'] = SQLiteLobbyStore(path)
+    return app
+
+
+def fill(store, size):
+    """Add size users/rooms and size/2 invites; EXPIRED_SHARE of them stale."""
+    now = time.time()
+    stale = int(size * EXPIRED_SHARE)
+    for i in range(size):
+        store.touch_user(100000 + i, f'bench{i}', None)
+    for i in range(size):
+        created = now - ROOM_TIMEOUT - 1 if i < stale else now
+        store.add_room(f'B{i:05d}', {
+            'host_id': 100000 + i, 'host_username': f'bench{i}',
+            'guest_id': None, 'guest_username': None, 'best_of': 3,
+            'host_score': 0, 'guest_score': 0, 'current_round': 0,
+            'host_choice': None, 'guest_choice': None, 'status': 'waiting',
+            'created_at': created, 'rounds': [], 'last_update': created
+        })
+    for i in range(size // 2):
+        sent = now - INVITE_TIMEOUT - 1 if i < stale else now
+        store.add_invite(f'I{i:07d}', {
+            'from_user_id': 100000 + i, 'from_username': f'bench{i}', 'from_avatar': None,
+            'to_user_id': 100000 + (i + 1) % size, 'best_of': 3, 'timestamp': sent
+        })
+    return now
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def time_route(client, method, url, json=None):
+    samples = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        getattr(client, method)(url, json=json)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), percentile(samples, 99)
+
+
+def full_scan(store, now):
+    """The old cleanup(): walk every user, invite and room (without deleting)."""
+    start = time.perf_counter()
+    if isinstance(store, MemoryLobbyStore):
+        # Slotted records (app.services.lobby_records)
+        users = [(uid, record.last_seen) for uid, record in store.online_users.items()]
+        invites = [record.timestamp for record in store.pending_invites.values()]
+        rooms = [record.created_at for record in store.game_rooms.values()]
+    else:
+        with store._connection() as conn:
+            users = conn.execute('SELECT user_id, last_seen FROM lobby_presence').fetchall()
+            invites = [t for (t,) in conn.execute('SELECT timestamp FROM lobby_invite')]
+            rooms = [json.loads(d)['created_at'] for (d,) in conn.execute('SELECT data FROM lobby_room')]
+    [uid for uid, seen in users if now - seen > ONLINE_TIMEOUT]
+    [t for t in invites if now - t > INVITE_TIMEOUT]
+    [t for t in rooms if now - t > ROOM_TIMEOUT]
+    return (time.perf_counter() - start) * 1000
+
+
+def run(size, store_name):
+    app = build_app(store_name, size)
+    store = app.extensions['lobby_store']
+
+    with app.app_context():
+        user = UserService.get_by_username('bench') or UserService.create('bench', 'bench')
+        user_id = user.id
+
+    now = fill(store, size)
+    scan_ms = full_scan(store, now)
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+
+    heartbeat = time_route(client, 'post', '/api/lobby/heartbeat')
+    create = time_route(client, 'post', '/api/lobby/room/create', json={'best_of': 3})
+
+    start = time.perf_counter()
+    store.cleanup()
+    sweep_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    store.cleanup()
+    idle_sweep_ms = (time.perf_counter() - start) * 1000
+
+    print(f'{size:>7} | heartbeat p50 {heartbeat[0]:6.2f} p99 {heartbeat[1]:6.2f} ms'
+          f' | room/create p50 {create[0]:6.2f} p99 {create[1]:6.2f} ms'
+          f' | sweep {sweep_ms:7.2f} ms (idle {idle_sweep_ms:5.2f})'
+          f' | old full scan {scan_ms:7.2f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='100,1000,10000')
+    parser.add_argument('--store', default='memory', choices=['memory', 'sqlite'])
+    args = parser.parse_args()
+
+    print(f'store={args.store}, {REQUESTS} requests per route, '
+          f'{EXPIRED_SHARE:.0%} of entries expired at sweep time')
+    for size in (int(s) for s in args.sizes.split(',')):
+        run(size, args.store)
+
+
+if __name__ == '__main__':
+    main()
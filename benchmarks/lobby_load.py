@@ -0,0 +1,323 @@
+"""
+Lobby load test: N simulated players against the real app.
+
+Players pair up and loop through the flow of lobby.js and game_room.html
+(polling fallback, no SSE): heartbeat + online diff every 3 s, the even
+player of a pair invites the odd one, which accepts from its heartbeat;
+both then long-poll room state with ?after_seq=&wait= and submit a choice
+after a 1-3 s think time. After a match they spend 2 s on the result
+screen and go back to the lobby.
+
+The app runs in-process through the Flask test client by default, or
+against a running server with --url (e.g. a local gunicorn). Reports
+p50/p95/p99 latency per route, requests/s, finished matches and RSS.
+Long-polled state requests are reported separately, since their latency
+is mostly the wait for the other player.
+
+Usage:
+    python -m benchmarks.lobby_load [--players 20] [--duration 30] [--speed 1]
+        [--store memory|sqlite] [--url http://127.0.0.1:8000 [--pids 123,124]]
+"""
+
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import resource
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+os.environ.setdefault('FLASK_ENV', 'testing')
+
+CHOICES = ['rock', 'paper', 'scissors']
+LOBBY_INTERVAL = 3.0  # lobby.js polling interval
+THINK_TIME = (1.0, 3.0)  # seconds before picking a choice
+RESULT_TIME = 2.0  # seconds on the result screen
+LONGPOLL_WAIT = 25
+LONGPOLL_RETRY = 1.5  # game_room.html re-polls no faster than this
+PASSWORD = 'loadtest'
+
+ROUTE_PATTERNS = [
+    (re.compile(r'/room/[A-Z0-9]+/'), '/room/<code>/'),
+    (re.compile(r'/invite/[^/]+/'), '/invite/<id>/'),
+]
+
+
+class Stats:
+    """Latency samples per route label (thread-safe)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.matches = 0
+
+    def record(self, label, ms, status):
+        with self.lock:
+            self.samples[label].append(ms)
+            if status >= 400 or status == 0:
+                self.errors[label] += 1
+
+    def match_finished(self):
+        with self.lock:
+            self.matches += 1
+
+
+class TestClientTransport:
+    """Requests through the Flask test client, logged in by session."""
+
+    def __init__(self, app, user_id):
+        self.client = app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['user_id'] = user_id
+
+    def request(self, method, path, body=None):
+        res = self.client.open(path, method=method, json=body)
+        return res.status_code, res.get_json(silent=True)
+
+
+class HttpTransport:
+    """Requests to a running server, logged in through /api/register or /api/login."""
+
+    def __init__(self, base_url, username):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        credentials = {'username': username, 'password': PASSWORD}
+        status, data = self.request('POST', '/api/register', credentials)
+        if status != 200:
+            status, data = self.request('POST', '/api/login', credentials)
+        if status != 200:
+            raise RuntimeError(f'Cannot log in {username}: {data}')
+        self.user_id = data['id']
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body if body is not None else {}).encode() if method == 'POST' else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+        try:
+            with self.opener.open(req, timeout=LONGPOLL_WAIT + 10) as res:
+                status, raw = res.status, res.read()
+        except urllib.error.HTTPError as e:
+            status, raw = e.code, e.read()
+        except OSError:
+            return 0, None
+        try:
+            return status, json.loads(raw) if raw else None
+        except ValueError:
+            return status, None
+
+
+class Player:
+    def __init__(self, transport, user_id, partner_id, inviter, stats, deadline, speed):
+        self.transport = transport
+        self.user_id = user_id
+        self.partner_id = partner_id
+        self.inviter = inviter
+        self.stats = stats
+        self.deadline = deadline
+        self.speed = speed
+        self.online = set()
+        self.online_version = None
+
+    def call(self, method, path, body=None, label=None):
+        if label is None:
+            label = path.split('?')[0]
+            for pattern, replacement in ROUTE_PATTERNS:
+                label = pattern.sub(replacement, label)
+            label = f'{method} {label}'
+        start = time.perf_counter()
+        status, data = self.transport.request(method, path, body)
+        self.stats.record(label, (time.perf_counter() - start) * 1000, status)
+        return status, data
+
+    def sleep(self, seconds):
+        time.sleep(max(0, min(seconds / self.speed, self.deadline - time.monotonic())))
+
+    def running(self):
+        return time.monotonic() < self.deadline
+
+    def run(self):
+        while self.running():
+            room_code = self.find_match()
+            if room_code:
+                self.play(room_code)
+                self.sleep(RESULT_TIME)
+
+    def find_match(self):
+        """Lobby phase: returns the room code once the pair is matched."""
+        invited_at = None
+        while self.running():
+            _, beat = self.call('POST', '/api/lobby/heartbeat')
+            self.fetch_online()
+            beat = beat or {}
+
+            if beat.get('redirect'):
+                return beat['redirect'].rsplit('/', 1)[-1]
+
+            if self.inviter:
+                if self.partner_id in self.online and (invited_at is None or time.monotonic() - invited_at > 60):
+                    status, _ = self.call('POST', '/api/lobby/invite',
+                                          {'to_user_id': self.partner_id, 'best_of': 3})
+                    if status == 200:
+                        invited_at = time.monotonic()
+            else:
+                for invite in beat.get('pending_invites', []):
+                    if invite['from_user']['id'] == self.partner_id:
+                        status, data = self.call('POST', f"/api/lobby/invite/{invite['invite_id']}/accept")
+                        if status == 200:
+                            return data['room_code']
+
+            self.sleep(LOBBY_INTERVAL)
+        return None
+
+    def fetch_online(self):
+        """Online list as lobby.js keeps it: first page, then presence diffs."""
+        query = f'?since_version={self.online_version}' if self.online_version is not None else '?limit=100'
+        status, data = self.call('GET', f'/api/lobby/online{query}')
+        if status != 200 or not data:
+            return
+        if data['delta']:
+            self.online.difference_update(data['removed'])
+            self.online.update(u['id'] for u in data['added'])
+        else:
+            self.online = {u['id'] for u in data['users']}
+        self.online_version = data['version']
+
+    def play(self, room_code):
+        """Game phase: long-poll state and choose until the match ends."""
+        status, room = self.call('GET', f'/api/lobby/room/{room_code}/state')
+        if status != 200:
+            return
+
+        while self.running() and room['status'] != 'finished':
+            me = room['host'] if room['host']['id'] == self.user_id else room['guest']
+            if room['status'] == 'playing' and not me['ready']:
+                self.sleep(random.uniform(*THINK_TIME))
+                self.call('POST', f'/api/lobby/room/{room_code}/choice', {'choice': random.choice(CHOICES)})
+
+            wait = int(min(LONGPOLL_WAIT, max(1, self.deadline - time.monotonic())))
+            started = time.monotonic()
+            status, data = self.call(
+                'GET', f"/api/lobby/room/{room_code}/state?after_seq={room['seq']}&wait={wait}",
+                label='GET /api/lobby/room/<code>/state (long poll)')
+            if status == 404:
+                return
+            if status == 200 and data:
+                if data['delta']:
+                    room.update(data['changes'])
+                    room['rounds'].extend(data['rounds'])
+                    room['seq'] = data['seq']
+                else:
+                    room = data
+            elif time.monotonic() - started < LONGPOLL_RETRY:
+                time.sleep(LONGPOLL_RETRY - (time.monotonic() - started))
+
+        if room['status'] == 'finished' and self.inviter:
+            self.stats.match_finished()
+
+
+def percentile(sorted_samples, p):
+    index = min(len(sorted_samples) - 1, int(round(p / 100 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def rss_mb(pid='self'):
+    """Current resident set size from /proc, or peak RSS where /proc is missing."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if pid == 'self':
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return None
+
+
+def build_transports(args):
+    """Log in the players; returns [(transport, user_id)]."""
+    if args.url:
+        transports = [HttpTransport(args.url, f'load{i}') for i in range(args.players)]
+        return [(t, t.user_id) for t in transports]
+
+    from app import create_app
+    from app.services import UserService
+    from app.services.lobby_store import SQLiteLobbyStore
+
+    app = create_app('testing')
+    if args.store == 'sqlite':
+        app.extensions['lobby_store'].stop_sweeper()
+        path = os.path.join(tempfile.mkdtemp(), 'lobby-load.db')
+        app.extensions['lobby_store'] = SQLiteLobbyStore(path)
+        app.extensions['lobby_store'].start_sweeper(app.config['LOBBY_SWEEP_INTERVAL'])
+
+    with app.app_context():
+        ids = []
+        for i in range(args.players):
+            user = UserService.get_by_username(f'load{i}') or UserService.create(f'load{i}', PASSWORD)
+            ids.append(user.id)
+    return [(TestClientTransport(app, uid), uid) for uid in ids]
+
+
+def report(stats, elapsed, args):
+    print(f"{'route':<48} {'count':>7} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    total = 0
+    for label in sorted(stats.samples):
+        samples = sorted(stats.samples[label])
+        total += len(samples)
+        print(f'{label:<48} {len(samples):>7} {stats.errors[label]:>6} '
+              f'{percentile(samples, 50):8.1f} {percentile(samples, 95):8.1f} {percentile(samples, 99):8.1f}')
+
+    print(f'\n{total} requests in {elapsed:.1f} s = {total / elapsed:.1f} req/s, '
+          f'{stats.matches} matches finished')
+
+    if args.url:
+        for pid in filter(None, args.pids.split(',')):
+            rss = rss_mb(pid.strip())
+            print(f'RSS pid {pid}: ' + (f'{rss:.1f} MB' if rss is not None else 'unavailable'))
+    else:
+        print(f'RSS (app + simulated players): {rss_mb():.1f} MB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--players', type=int, default=20, help='even number of players')
+    parser.add_argument('--duration', type=float, default=30, help='seconds')
+    parser.add_argument('--speed', type=float, default=1.0, help='divide think/poll intervals by this')
+    parser.add_argument('--store', default='memory', choices=['memory', 'sqlite'])
+    parser.add_argument('--url', help='base URL of a running server instead of the in-process app')
+    parser.add_argument('--pids', default='', help='server process ids to report RSS for (with --url)')
+    args = parser.parse_args()
+    if args.players < 2 or args.players % 2:
+        parser.error('--players must be an even number >= 2')
+
+    transports = build_transports(args)
+    stats = Stats()
+    deadline = time.monotonic() + args.duration
+    players = []
+    for i, (transport, user_id) in enumerate(transports):
+        partner_id = transports[i ^ 1][1]
+        players.append(Player(transport, user_id, partner_id, i % 2 == 0, stats, deadline, args.speed))
+
+    where = args.url or f'in-process, store={args.store}'
+    print(f'{args.players} players for {args.duration:.0f} s at speed x{args.speed:g} ({where})\n')
+
+    threads = [threading.Thread(target=p.run, daemon=True) for p in players]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    report(stats, time.perf_counter() - start, args)
+
+
+if __name__ == '__main__':
+    main()
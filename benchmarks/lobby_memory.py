@@ -0,0 +1,112 @@
+"""
+Lobby memory per entry.
+
+Fills a scratch MemoryLobbyStore with --samples finished best-of-5 rooms
+(5 rounds, full change history), online users and invites, and measures
+with tracemalloc what each entry costs. Next to it, the sys.getsizeof
+estimate GET /api/admin/lobby/memory reports for the same entries, so the
+endpoint's figures can be read against the real ones. Size LOBBY_MAX_ROOMS
+and LOBBY_MAX_INVITES from the result.
+
+Usage:
+    python -m benchmarks.lobby_memory [--samples 10000] [--estimate-samples 100]
+"""
+
+import argparse
+import collections
+import time
+import tracemalloc
+
+from app.services.lobby_store import MemoryLobbyStore
+
+
+def measure_memory(samples=1000):
+    """
+    Measure with tracemalloc what one room, online user and invite costs
+    in a MemoryLobbyStore, using a scratch store filled with finished
+    best-of-5 rooms (5 rounds, full change history).
+    Returns:
+        (the filled store, {'bytes_per_room', 'bytes_per_user',
+         'bytes_per_invite', 'rooms_per_256mb', 'users_per_256mb'})
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        store = MemoryLobbyStore()
+        # The event log is bounded, not per entry: keep it out of the numbers
+        store.events = collections.deque(maxlen=0)
+        now = time.time()
+
+        def measure(fill):
+            before = tracemalloc.get_traced_memory()[0]
+            fill()
+            return (tracemalloc.get_traced_memory()[0] - before) / samples
+
+        def fill_rooms():
+            for i in range(samples):
+                store.add_room(f'R{i:05d}', _sample_room(i, now))
+
+        def fill_users():
+            for i in range(samples):
+                store.touch_user(i, f'player{i}', None)
+
+        def fill_invites():
+            for i in range(samples):
+                store.add_invite(f'{i}-{now}', {
+                    'from_user_id': i, 'from_username': f'player{i}', 'from_avatar': None,
+                    'to_user_id': i + 1, 'best_of': 5, 'timestamp': now
+                })
+
+        per_room = measure(fill_rooms)
+        per_user = measure(fill_users)
+        per_invite = measure(fill_invites)
+    finally:
+        if started:
+            tracemalloc.stop()
+
+    budget = 256 * 1024 * 1024
+    return store, {
+        'samples': samples,
+        'bytes_per_room': round(per_room),
+        'bytes_per_user': round(per_user),
+        'bytes_per_invite': round(per_invite),
+        'rooms_per_256mb': int(budget // per_room),
+        'users_per_256mb': int(budget // per_user)
+    }
+
+
+def _sample_room(i, now):
+    """A finished best-of-5 room shaped like the lobby routes leave it."""
+    rounds, changes = [], []
+    for n in range(1, 6):
+        rounds.append({'round': n, 'host_choice': 'rock', 'guest_choice': 'scissors' if n % 2 else 'rock',
+                       'result': 'host' if n % 2 else 'draw'})
+        for _ in range(3):
+            changes.append({'seq': len(changes) + 1, 'rounds_from': n - 1,
+                            'fields': ['host', 'last_update']})
+    return {
+        'host_id': i, 'host_username': f'player{i}', 'guest_id': i + 1,
+        'guest_username': f'player{i + 1}', 'best_of': 5, 'host_score': 3, 'guest_score': 0,
+        'current_round': 5, 'host_choice': 'rock', 'guest_choice': 'scissors',
+        'status': 'finished', 'created_at': now, 'last_update': now, 'winner_id': i,
+        'seq': len(changes), 'rounds': rounds, 'changes': changes
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--samples', type=int, default=10000)
+    parser.add_argument('--estimate-samples', type=int, default=100,
+                        help='entries the getsizeof estimate looks at, as ?samples= of the endpoint')
+    args = parser.parse_args()
+
+    store, measured = measure_memory(args.samples)
+    estimated = store.entry_sizes(args.estimate_samples)
+    print(f"{'':>16}  {'tracemalloc':>11}  {'getsizeof':>9}")
+    for key in ('bytes_per_room', 'bytes_per_user', 'bytes_per_invite', 'rooms_per_256mb', 'users_per_256mb'):
+        print(f'{key:>16}  {measured[key]:>11}  {estimated[key]:>9}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Lobby concurrency stress test.
+
+Runs T player threads (T/2 concurrent matches per batch) against the real
+lobby routes. Each player polls room state and submits choices as fast as
+it can, and also fires a duplicate submission for every choice to race the
+check-then-set in make_choice. Afterwards every room is checked:
+- rounds are numbered 1..n with no gaps or repeats
+- scores equal the number of rounds each side won
+- exactly one side reached the wins needed, and the match was saved once
+
+Throughput (requests/s) is reported per thread count. Player think time
+stands in for network latency, so throughput should grow with threads as
+long as no lock is held across requests.
+
+Usage:
+    python -m benchmarks.lobby_stress [--threads 2,4,8,16] [--matches 8] [--store memory|sqlite]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+
+os.environ.setdefault('FLASK_ENV', 'testing')
+
+from app import create_app  # noqa: E402
+from app.api import lobby  # noqa: E402
+from app.services import UserService  # noqa: E402
+from app.services.lobby_store import SQLiteLobbyStore  # noqa: E402
+
+CHOICES = ['rock', 'paper', 'scissors']
+
+
+def build_app(store):
+    app = create_app('testing')
+    if store == 'sqlite':
+        app.extensions['lobby_store'].stop_sweeper()
+        path = os.path.join(tempfile.mkdtemp(), 'lobby-stress.db')
+        app.extensions['lobby_store'] = SQLiteLobbyStore(path)
+    return app
+
+
+def client_for(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+    return client
+
+
+def play(app, user_id, room_codes, think, counter):
+    """Play every room in room_codes to the end as user_id."""
+    client = client_for(app, user_id)
+    requests = 0
+    for code in room_codes:
+        while True:
+            state = client.get(f'/api/lobby/room/{code}/state').get_json()
+            requests += 1
+            if state['status'] == 'finished':
+                break
+            me = state['host'] if state['host']['id'] == user_id else state['guest']
+            if not me['ready']:
+                choice = random.choice(CHOICES)
+                # Duplicate submissions race each other; at most one may land
+                racer = threading.Thread(target=client_for(app, user_id).post, args=(
+                    f'/api/lobby/room/{code}/choice',), kwargs={'json': {'choice': choice}})
+                racer.start()
+                client.post(f'/api/lobby/room/{code}/choice', json={'choice': choice})
+                racer.join()
+                requests += 2
+            time.sleep(think)
+    counter.append(requests)
+
+
+def check_room(room, saves):
+    wins_needed = room['best_of'] // 2 + 1
+    numbers = [r['round'] for r in room['rounds']]
+    assert numbers == list(range(1, len(numbers) + 1)), f'round numbers {numbers}'
+    results = Counter(r['result'] for r in room['rounds'])
+    assert results['host'] == room['host_score'], 'host score mismatch'
+    assert results['guest'] == room['guest_score'], 'guest score mismatch'
+    assert sorted([room['host_score'], room['guest_score']])[1] == wins_needed, 'bad final score'
+    assert min(room['host_score'], room['guest_score']) < wins_needed, 'both sides won'
+    assert saves == 1, f'match saved {saves} times'
+
+
+def run(app, threads, matches_per_pair, think):
+    store = app.extensions['lobby_store']
+    pairs = threads // 2
+
+    with app.app_context():
+        users = []
+        for i in range(threads):
+            user = UserService.get_by_username(f'stress{i}') or UserService.create(f'stress{i}', 'pass')
+            users.append(user.id)
+
+    # Set up rooms through the routes: host creates, guest joins
+    assignments = []
+    for p in range(pairs):
+        host, guest = users[2 * p], users[2 * p + 1]
+        host_client, guest_client = client_for(app, host), client_for(app, guest)
+        codes = []
+        for _ in range(matches_per_pair):
+            code = host_client.post('/api/lobby/room/create', json={'best_of': 5}).get_json()['room_code']
+            guest_client.post(f'/api/lobby/room/{code}/join')
+            codes.append(code)
+        assignments.append((host, guest, codes))
+
+    saves = Counter()
+    original_save = lobby.save_match_result
+    lobby.save_match_result = lambda room: saves.update([room['room_code']])
+
+    counter = []
+    workers = [threading.Thread(target=play, args=(app, uid, codes, think, counter))
+               for host, guest, codes in assignments for uid in (host, guest)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    lobby.save_match_result = original_save
+
+    rounds = 0
+    for _, _, codes in assignments:
+        for code in codes:
+            room = store.get_room(code)
+            check_room(room, saves[code])
+            rounds += len(room['rounds'])
+
+    total = sum(counter)
+    print(f'{threads:>3} threads | {pairs * matches_per_pair:>4} matches, {rounds:>5} rounds'
+          f' | {total:>6} requests in {elapsed:6.2f} s = {total / elapsed:8.1f} req/s | OK')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', default='2,4,8,16')
+    parser.add_argument('--matches', type=int, default=8, help='matches per pair of players')
+    parser.add_argument('--think', type=float, default=0.005, help='seconds between polls')
+    parser.add_argument('--store', default='memory', choices=['memory', 'sqlite'])
+    args = parser.parse_args()
+
+    app = build_app(args.store)
+    print(f'store={args.store}, best of 5, think time {args.think * 1000:.0f} ms')
+    for threads in (int(t) for t in args.threads.split(',')):
+        run(app, threads, args.matches, args.think)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+StatsService.get_people_stats: balance table vs. balance engine vs. the previous loop.
+
+For each table size, times (median of --repeat runs, including the query):
+- loop: the implementation the balance engine replaced, kept below as
+  legacy_people_stats (ORM objects, a dict per row, participants decoded
+  per expense)
+- engine: the full recompute, BalanceService.recompute() (grouped SQL
+  rows, each participant set split once)
+- table: get_people_stats(), reading person_balance (rebuilt after each
+  fill, since the benchmark inserts rows directly)
+and checks that all of them agree on total, count and share per person.
+
+Usage:
+    python -m benchmarks.people_stats [--sizes 1000,100000,1000000] [--repeat 3]
+        [--loop-max 1000000]
+"""
+
+import argparse
+import statistics
+import time
+
+from benchmarks.expense_stats import build_app, fill
+from sqlalchemy.orm import raiseload
+from app.models import Expense
+from app.services import BalanceService, StatsService
+from app.services.balance_engine import decode_participants
+
+
+def legacy_people_stats():
+    """
+    get_people_stats as it was before the balance engine (participants
+    still decoded from the JSON column, as get_participants and to_dict
+    did then; the benchmark's raw inserts have no participant rows).
+    """
+    expenses = Expense.query.options(raiseload(Expense.participant_rows)).all()
+
+    if not expenses:
+        return []
+
+    all_members = set()
+    for expense in expenses:
+        all_members.add(expense.name)
+        participants = decode_participants(expense.participants)
+        if participants:
+            for p in participants:
+                all_members.add(p)
+
+    people_stats = {}
+    for name in all_members:
+        people_stats[name] = {'name': name, 'total': 0, 'count': 0, 'share': 0, 'expenses': []}
+
+    for expense in expenses:
+        exp_dict = {
+            'id': expense.id,
+            'name': expense.name,
+            'amount': expense.amount,
+            'purpose': expense.purpose,
+            'date': expense.date.strftime('%Y-%m-%d %H:%M:%S'),
+            'last_updated': expense.last_updated.strftime('%Y-%m-%d %H:%M:%S') if expense.last_updated else None,
+            'participants': decode_participants(expense.participants)
+        }
+        name = expense.name
+        people_stats[name]['total'] += expense.amount
+        people_stats[name]['count'] += 1
+        people_stats[name]['expenses'].append(exp_dict)
+
+        participants = decode_participants(expense.participants) or list(all_members)
+        share_per_person = expense.amount / len(participants) if participants else 0
+        for participant in participants:
+            if participant in people_stats:
+                people_stats[participant]['share'] += share_per_person
+
+    result = list(people_stats.values())
+    result.sort(key=lambda x: x['total'], reverse=True)
+    return result
+
+
+def timed(fn, repeat):
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), result
+
+
+def check_same(reference, result, label):
+    expected = {p['name']: p for p in reference}
+    assert set(expected) == {p['name'] for p in result}, f'{label}: different people'
+    for p in result:
+        e = expected[p['name']]
+        assert p['count'] == e['count'], f"{label}: count of {p['name']}"
+        for key in ('total', 'share'):
+            assert abs(p[key] - e[key]) <= 1e-6 * max(1.0, abs(e[key])), f"{label}: {key} of {p['name']}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1000,100000,1000000')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--loop-max', type=int, default=1000000, help='skip the old loop above this size')
+    args = parser.parse_args()
+
+    app = build_app()
+    rows = 0
+    print(f"{'rows':>9}  {'loop ms':>10}  {'engine ms':>10}  {'table ms':>9}  speedup")
+    for size in (int(s) for s in args.sizes.split(',')):
+        fill(app, size - rows)
+        rows = size
+        with app.app_context():
+            BalanceService.rebuild()
+            engine_ms, engine = timed(BalanceService.recompute, args.repeat)
+            table_ms, table = timed(lambda: StatsService.get_people_stats(include_expenses=False), args.repeat)
+            check_same(engine, table, 'balance table')
+            loop = '-'
+            speedup = ''
+            if size <= args.loop_max:
+                loop_ms, legacy = timed(legacy_people_stats, 1 if size > 100000 else args.repeat)
+                check_same(legacy, engine, 'engine')
+                loop = f'{loop_ms:.1f}'
+                speedup = f'x{loop_ms / table_ms:.0f}'
+        print(f'{rows:>9}  {loop:>10}  {engine_ms:>10.1f}  {table_ms:>9.2f}  {speedup}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Settlement engine speed and plan size vs. number of members.
+
+1. settle() on random balances of --members members (median of --repeat
+   runs). Replays every plan to check it leaves no one owing or owed, and
+   compares its length with the bounds: at least max(creditors, debtors),
+   at most n - 1.
+2. GET /api/stats/settlement on a temporary SQLite database with
+   --endpoint-members members: the first call computes the plan, repeated
+   calls are served from the cache, and a new expense (new data version)
+   makes the next call compute it again.
+
+Usage:
+    python -m benchmarks.settlement [--members 1000,10000,100000] [--repeat 5]
+        [--endpoint-members 5000]
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+from collections import defaultdict
+
+from benchmarks.expense_stats import build_app
+from app.extensions import db
+from app.models import Expense
+from app.services import BalanceService, ExpenseService
+from app.services.settlement import settle, EPSILON
+
+
+def random_balances(n):
+    """Balances whose nets sum to zero, as real ones do."""
+    balances = [{'name': f'member{i}', 'total': round(random.uniform(0, 5e6), 2), 'share': 0.0}
+                for i in range(n)]
+    paid = sum(b['total'] for b in balances)
+    weights = [random.random() for _ in balances]
+    scale = paid / sum(weights)
+    for b, w in zip(balances, weights):
+        b['share'] = w * scale
+    return balances
+
+
+def check_plan(balances, transfers):
+    net = {b['name']: b['total'] - b['share'] for b in balances}
+    for t in transfers:
+        assert t['amount'] > 0, 'empty transfer'
+        net[t['from']] += t['amount']
+        net[t['to']] -= t['amount']
+    # Each transfer is rounded to cents, so a member may keep that much per transfer
+    counts = defaultdict(int)
+    for t in transfers:
+        counts[t['from']] += 1
+        counts[t['to']] += 1
+    for name, rest in net.items():
+        assert abs(rest) <= EPSILON + 0.005 * counts[name] + 1e-6, f'{name} left with {rest}'
+
+
+def bench_engine(sizes, repeat):
+    print(f"{'members':>9}  {'median ms':>10}  {'transfers':>9}  {'lower bound':>11}  {'n - 1':>7}")
+    for n in sizes:
+        balances = random_balances(n)
+        times, transfers = [], None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            transfers = settle(balances)
+            times.append((time.perf_counter() - start) * 1000)
+        check_plan(balances, transfers)
+        creditors = sum(1 for b in balances if b['total'] - b['share'] > EPSILON)
+        lower = max(creditors, sum(1 for b in balances if b['total'] - b['share'] < -EPSILON))
+        assert len(transfers) <= n - 1
+        print(f'{n:>9}  {statistics.median(times):>10.2f}  {len(transfers):>9}  {lower:>11}  {n - 1:>7}')
+
+
+def bench_endpoint(members):
+    app = build_app()
+    names = [f'member{i}' for i in range(members)]
+    with app.app_context():
+        rows = []
+        for _ in range(members * 4):
+            participants = None
+            if random.random() < 0.5:
+                participants = json.dumps(sorted(random.sample(names, random.randint(2, 8))))
+            rows.append({'name': random.choice(names), 'amount': round(random.uniform(10, 500), 2) * 1000,
+                         'purpose': 'benchmark', 'participants': participants})
+        db.session.execute(Expense.__table__.insert(), rows)
+        db.session.commit()
+        BalanceService.rebuild()
+
+    client = app.test_client()
+
+    def call():
+        start = time.perf_counter()
+        res = client.get('/api/stats/settlement')
+        assert res.status_code == 200
+        return (time.perf_counter() - start) * 1000, res.get_json()
+
+    print(f'\nGET /api/stats/settlement, {members} members, {members * 4} expenses')
+    first_ms, plan = call()
+    cached_ms = statistics.median(call()[0] for _ in range(10))
+    with app.app_context():
+        ExpenseService.create({'name': names[0], 'amount': 1000, 'purpose': 'benchmark'})
+    changed_ms, changed = call()
+    assert changed['version'] != plan['version'], 'version did not change'
+    cache = app.extensions['settlement_cache']
+    print(f"first call {first_ms:.1f} ms ({len(plan['transfers'])} transfers), cached {cached_ms:.1f} ms, "
+          f'after a new expense {changed_ms:.1f} ms; cache hits {cache.hits}, misses {cache.misses}')
+    assert cache.misses == 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--members', default='1000,10000,100000')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--endpoint-members', type=int, default=5000)
+    args = parser.parse_args()
+
+    bench_engine([int(n) for n in args.members.split(',')], args.repeat)
+    bench_endpoint(args.endpoint_members)
+
+
+if __name__ == '__main__':
+    main()
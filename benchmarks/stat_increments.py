@@ -0,0 +1,139 @@
+"""
+Concurrency check of UserService stat increments.
+
+T threads record M rated match results each (RatingService.rate_matches
+and UserService.record_result on random pairs of P players, one commit per
+result, as end_match does), all at once. Afterwards every player's wins
+and losses must equal the results counted in Python: an increment that was
+read-modified-written instead of applied atomically would show up as a
+lost update. Elo is zero-sum, so the players' ratings must still add up to
+what they did before; a lost rating update would change the sum. Also
+prints the statements one result takes, with and without the rating.
+
+Runs on a temporary SQLite file by default; pass --database-url to run
+against PostgreSQL, where the writers really interleave.
+
+Usage:
+    python -m benchmarks.stat_increments [--threads 8] [--results 200] [--players 4]
+        [--database-url postgresql://...]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+
+os.environ.setdefault('FLASK_ENV', 'testing')
+
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from config import config, TestingConfig  # noqa: E402
+from app import create_app  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models import User  # noqa: E402
+from app.services import RatingService, UserService  # noqa: E402
+
+
+def build_app(database_url):
+    if not database_url:
+        database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'stat-increments.db')
+    config['stat_increments'] = type('StatIncrementsConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'SQLALCHEMY_ENGINE_OPTIONS': {'connect_args': {'timeout': 30}} if database_url.startswith('sqlite') else {}
+    })
+    return create_app('stat_increments')
+
+
+def record_rated_result(winner, loser):
+    rating_changes = RatingService.rate_matches([(winner, loser, winner)])
+    UserService.record_result(winner, loser, rating_changes=rating_changes)
+
+
+def show_statements(app, users):
+    expected = Counter()
+    with app.app_context():
+        for label, record in (('One result', UserService.record_result),
+                              ('One rated result', record_rated_result)):
+            statements = []
+            listener = lambda conn, cursor, statement, *args: statements.append(statement.split()[0])  # noqa: E731
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            record(users[0], users[1])
+            event.remove(db.engine, 'before_cursor_execute', listener)
+            print(f"{label}: {len(statements)} statement(s): {', '.join(statements)}")
+            expected.update({(users[0], 'win'): 1, (users[1], 'loss'): 1})
+    return expected
+
+
+def hammer(app, users, results, expected, lock, retries):
+    local = Counter()
+    with app.app_context():
+        for _ in range(results):
+            winner, loser = random.sample(users, 2)
+            for attempt in range(5):
+                try:
+                    record_rated_result(winner, loser)
+                    break
+                except OperationalError:  # SQLite busy beyond its timeout
+                    db.session.rollback()
+                    with lock:
+                        retries[0] += 1
+                    time.sleep(0.05 * (attempt + 1))
+            else:
+                raise RuntimeError('record_result kept failing')
+            local[(winner, 'win')] += 1
+            local[(loser, 'loss')] += 1
+        db.session.remove()
+    with lock:
+        expected.update(local)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--results', type=int, default=200, help='results per thread')
+    parser.add_argument('--players', type=int, default=4)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    app = build_app(args.database_url)
+    with app.app_context():
+        users = []
+        for i in range(args.players):
+            user = UserService.get_by_username(f'increment{i}') or UserService.create(f'increment{i}', 'pass')
+            users.append(user.id)
+        before = {u.id: (u.total_wins, u.total_losses) for u in User.query.filter(User.id.in_(users))}
+        rating_sum = sum(u.rating for u in User.query.filter(User.id.in_(users)))
+
+    expected = show_statements(app, users)
+    lock, retries = threading.Lock(), [0]
+    threads = [threading.Thread(target=hammer, args=(app, users, args.results, expected, lock, retries))
+               for _ in range(args.threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        lost = 0
+        drift = sum(u.rating for u in User.query.filter(User.id.in_(users))) - rating_sum
+        for user in User.query.filter(User.id.in_(users)):
+            wins = user.total_wins - before[user.id][0]
+            losses = user.total_losses - before[user.id][1]
+            lost += expected[(user.id, 'win')] - wins + expected[(user.id, 'loss')] - losses
+            print(f'{user.username:<12} wins {wins:>6} (expected {expected[(user.id, "win")]:>6})'
+                  f'  losses {losses:>6} (expected {expected[(user.id, "loss")]:>6})')
+
+    total = args.threads * args.results
+    print(f'\n{total} results from {args.threads} threads in {elapsed:.2f} s = {total / elapsed:.0f}/s, '
+          f'{retries[0]} busy retries, {lost} lost increments, rating sum drift {drift:.6f}')
+    assert lost == 0, 'lost increments'
+    assert abs(drift) < 1e-6, 'lost rating updates'
+
+
+if __name__ == '__main__':
+    main()
@@ -23,6 +23,13 @@ def get_database_uri():
 class Config:
     """Base configuration."""
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
+
+    # Key of the room code permutation (app.utils.room_codes); defaults to SECRET_KEY
+    ROOM_CODE_KEY = os.environ.get('ROOM_CODE_KEY')
+
+    # Usernames allowed on admin-only routes (comma-separated)
+    ADMIN_USERNAMES = {name.strip() for name in os.environ.get('ADMIN_USERNAMES', '').split(',') if name.strip()}
+
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
     # Connection pool settings for stability
@@ -41,6 +48,40 @@ class Config:
         }
     }
 
+    # Lobby state backend: 'memory' (single process) or 'sqlite' (shared by
+    # all gunicorn workers on the host, WAL mode)
+    LOBBY_STORE = os.environ.get('LOBBY_STORE', 'sqlite')
+    LOBBY_STORE_PATH = os.environ.get('LOBBY_STORE_PATH')  # default: instance/lobby.db
+
+    # Room state long polls hold a request (a greenlet under the gevent
+    # workers of gunicorn.conf.py, a thread elsewhere); cap them per worker
+    LOBBY_LONGPOLL_MAX_WAITERS = int(os.environ.get('LOBBY_LONGPOLL_MAX_WAITERS', 100))
+    # Open /api/lobby/events streams per worker, counted apart from long polls
+    LOBBY_EVENTS_MAX_STREAMS = int(os.environ.get('LOBBY_EVENTS_MAX_STREAMS', 500))
+
+    # Seconds between background sweeps of expired lobby users/invites/rooms
+    LOBBY_SWEEP_INTERVAL = float(os.environ.get('LOBBY_SWEEP_INTERVAL', 1.0))
+
+    # Memory budget of the in-memory lobby store (0 = unlimited). A full store
+    # evicts the least recently used finished room; benchmarks/lobby_memory.py
+    # measures the bytes per room to size these
+    LOBBY_MAX_ROOMS = int(os.environ.get('LOBBY_MAX_ROOMS', 10000))
+    LOBBY_MAX_INVITES = int(os.environ.get('LOBBY_MAX_INVITES', 5000))
+
+    # Seconds between resyncs of each worker's in-memory leaderboard (a
+    # scheduler job), which is how long other workers' results can take to
+    # show up in its ranks
+    LEADERBOARD_RESYNC = float(os.environ.get('LEADERBOARD_RESYNC', 60))
+
+    # Background maintenance jobs (app.services.scheduler), shared by all
+    # workers through the scheduled_job table
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', '1') == '1'
+    # Stale game room reaper: rooms idle longer than ROOM_REAP_AGE seconds
+    ROOM_REAP_INTERVAL = float(os.environ.get('ROOM_REAP_INTERVAL', 600))
+    ROOM_REAP_AGE = int(os.environ.get('ROOM_REAP_AGE', 24 * 3600))
+    ROOM_REAP_BATCH = int(os.environ.get('ROOM_REAP_BATCH', 500))
+    ROOM_REAP_MAX_BATCHES = int(os.environ.get('ROOM_REAP_MAX_BATCHES', 20))
+
 
 class DevelopmentConfig(Config):
     """Development configuration."""
@@ -59,6 +100,9 @@ class TestingConfig(Config):
     """Testing configuration."""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_ENGINE_OPTIONS = {}  # Pool/keepalive options are PostgreSQL-only
+    LOBBY_STORE = 'memory'
+    SCHEDULER_ENABLED = False  # Jobs are run explicitly (Scheduler.run_due)
 
 
 config = {
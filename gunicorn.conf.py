@@ -0,0 +1,23 @@
+"""
+Gunicorn settings, used by the Procfile (gunicorn -c gunicorn.conf.py).
+
+gevent workers run each request in a greenlet, so the requests the lobby
+holds open (/api/lobby/events streams, room state long polls) cost a
+greenlet each instead of one of a few request threads.
+"""
+
+import os
+
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_class = 'gevent'
+worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 1000))  # Open requests per worker
+timeout = 60
+
+
+def post_worker_init(worker):
+    # psycopg2 waits for PostgreSQL inside libpq; make it yield to other greenlets
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:  # No psycopg2 (SQLite setups)
+        return
+    patch_psycopg()
@@ -1,12 +1,49 @@
 """
-Migration script to add participants column to expense table.
-Run this script once after updating the codebase.
+Migration script to add participants column to expense table, rating
+column to game_user table and the indexes added to existing tables since
+they were created.
+Run this script once after updating the codebase (the Procfile runs it as
+the release step).
 """
 
 from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
 from app import create_app
 from app.extensions import db
 
+# Tables create_all() made before some of their indexes existed
+INDEXED_MODELS = ('Expense', 'GameMatch', 'GameRoom', 'GameRound', 'User')
+
+
+def create_indexes():
+    """
+    Create the models' missing indexes. On PostgreSQL each one is built
+    CONCURRENTLY (outside a transaction) so writes to the table go on
+    meanwhile; a build that failed halfway leaves an invalid index behind,
+    which is dropped and built again.
+    """
+    import app.models as models
+
+    postgres = db.engine.dialect.name == 'postgresql'
+    indexes = [index for name in INDEXED_MODELS for index in getattr(models, name).__table__.indexes]
+
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        invalid = set()
+        if postgres:
+            invalid = set(conn.execute(text(
+                'SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid '
+                'WHERE NOT i.indisvalid')).scalars())
+
+        for index in indexes:
+            if index.name in invalid:
+                print(f'Dropping invalid index {index.name}...')
+                conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {index.name}'))
+            ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=db.engine.dialect))
+            if postgres:
+                ddl = ddl.replace(' INDEX ', ' INDEX CONCURRENTLY ', 1)
+            conn.execute(text(ddl))
+    print(f'Checked {len(indexes)} indexes.')
+
 
 def migrate():
     app = create_app()
@@ -23,6 +60,18 @@ def migrate():
         else:
             print('Column participants already exists. No migration needed.')
 
+        columns = [col['name'] for col in inspector.get_columns('game_user')]
+        if 'rating' not in columns:
+            print('Adding rating column to game_user table...')
+            db.session.execute(text(
+                'ALTER TABLE game_user ADD COLUMN rating FLOAT NOT NULL DEFAULT 1500'))
+            db.session.commit()
+            print('Run recompute_ratings.py to replay the match history into ratings.')
+        else:
+            print('Column rating already exists. No migration needed.')
+
+        create_indexes()
+
 
 if __name__ == '__main__':
     migrate()
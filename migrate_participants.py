@@ -0,0 +1,23 @@
+"""
+Migration script to fill the expense_participant table from the
+participants JSON of existing expenses.
+Run this script once after updating the codebase (the app also runs it on
+start while the table is empty); running it again only adds missing rows.
+"""
+
+import sys
+from app import create_app
+from app.services import ExpenseService
+
+
+def migrate(batch_size=None):
+    app = create_app()
+
+    with app.app_context():
+        print('Backfilling expense participants...')
+        result = ExpenseService.backfill_participants(batch_size)
+        print(f"Added {result['rows']} participant rows for {result['expenses']} expenses.")
+
+
+if __name__ == '__main__':
+    migrate(int(sys.argv[1]) if len(sys.argv) > 1 else None)
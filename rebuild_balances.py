@@ -0,0 +1,31 @@
+"""
+Rebuild the per-person balances (person_balance, balance_summary) from the
+current expenses, after checking the stored ones against the full
+recompute. With --check, only compare and exit with status 1 on a mismatch.
+"""
+
+import sys
+from app import create_app
+from app.services import BalanceService
+
+
+def rebuild(write=True):
+    app = create_app()
+
+    with app.app_context():
+        print('Checking balances against a full recompute...')
+        result = BalanceService.rebuild(write)
+        print(f"{result['expenses']} expenses, {result['members']} members ({result['seconds']} s)")
+        if result['mismatches']:
+            print(f"Stored balances differed for: {', '.join(result['mismatches'])}")
+        else:
+            print('Stored balances match the recompute.')
+        if write:
+            print('Balances rebuilt.')
+        return not result['mismatches']
+
+
+if __name__ == '__main__':
+    check_only = '--check' in sys.argv[1:]
+    if not rebuild(write=not check_only) and check_only:
+        sys.exit(1)
@@ -0,0 +1,26 @@
+"""
+Recompute every player's Elo rating from the full match history.
+Run this script after changing the rating formula (app/services/rating.py).
+The replay is vectorized with numpy (requirements.txt). Restart the
+workers afterwards: their leaderboards only resync players with new
+matches, and reload every rating at startup.
+"""
+
+from app import create_app
+from app.services import RatingService
+
+
+def recompute():
+    app = create_app()
+
+    with app.app_context():
+        print('Replaying match history...')
+        result = RatingService.recompute()
+        print(f"Rated {result['players']} players from {result['matches']} matches "
+              f"({'numpy' if result['vectorized'] else 'pure Python'}): "
+              f"load {result['load_seconds']} s, replay {result['replay_seconds']} s, "
+              f"write {result['write_seconds']} s")
+
+
+if __name__ == '__main__':
+    recompute()